@@ -0,0 +1,155 @@
+"""Background execution for the Tkinter GUI.
+
+Work is submitted to a thread pool and never touches widgets. Workers post
+progress, results, errors and cancellations to a queue, and the queue is
+drained on the Tk main loop with ``root.after``, so every callback runs on
+the Tk thread and the window keeps responding while a task runs.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_POLL_MS = 50
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task once its cancellation has been requested"""
+
+
+class BackgroundTask:
+    """Handle for a submitted task.
+
+    The task function receives this object as its first argument and may
+    call progress() to report how far it got; progress() also raises
+    TaskCancelled after cancel() was called, so long loops stop at their
+    next progress report.
+    """
+
+    def __init__(self, events, name=None, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self.name = name
+        self.future = None
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self._events = events
+        self._cancel_requested = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_requested.is_set()
+
+    def cancel(self):
+        """Request cancellation; a task that has not started yet is dropped immediately"""
+        self._cancel_requested.set()
+        if self.future is not None and self.future.cancel():
+            self._events.put(('cancelled', self, None))
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled(f"{self.name or 'Task'} was cancelled")
+
+    def progress(self, done, total=None):
+        """Report progress from the worker thread"""
+        self.check_cancelled()
+        self._events.put(('progress', self, (done, total)))
+
+
+class BackgroundTasks:
+    """Thread pool whose task callbacks are delivered on the Tk main loop.
+
+    With max_workers=1 tasks run one after another in submission order,
+    which is how the GUI queues several applications for scoring.
+    """
+
+    def __init__(self, root, max_workers=1, poll_ms=DEFAULT_POLL_MS, name="background"):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._events = queue.Queue()
+        # Only touched on the Tk thread
+        self._tasks = []
+        self._polling = False
+
+    @property
+    def pending(self):
+        """Tasks submitted and not finished yet, including the running ones"""
+        return len(self._tasks)
+
+    @property
+    def queued(self):
+        """Tasks submitted and not started yet"""
+        return sum(1 for task in self._tasks if not task.future.running() and not task.future.done())
+
+    @property
+    def tasks(self):
+        return list(self._tasks)
+
+    def submit(self, func, *args, name=None, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        """Run func(task, *args) on the pool and return its BackgroundTask.
+
+        on_done(result), on_error(exception), on_progress(done, total) and
+        on_cancel() are called on the Tk thread.
+        """
+        task = BackgroundTask(self._events, name, on_done, on_error, on_progress, on_cancel)
+        self._tasks.append(task)
+        task.future = self._executor.submit(self._run, task, func, args)
+        self._schedule_poll()
+        return task
+
+    def cancel_all(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def shutdown(self, wait=False):
+        """Cancel everything and stop the pool; no task can be submitted afterwards.
+
+        Tasks not started yet are dropped. Running tasks only stop at their
+        next progress report, so with wait=True this blocks until they have
+        returned, e.g. before closing what they write to.
+        """
+        self.cancel_all()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, task, func, args):
+        try:
+            task.check_cancelled()
+            result = func(task, *args)
+        except TaskCancelled:
+            self._events.put(('cancelled', task, None))
+        except Exception as e:
+            self._events.put(('error', task, e))
+        else:
+            self._events.put(('done', task, result))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                kind, task, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self._dispatch(kind, task, payload)
+        if self._tasks:
+            self._schedule_poll()
+
+    def _dispatch(self, kind, task, payload):
+        if kind == 'progress':
+            if task.on_progress is not None and not task.cancelled:
+                task.on_progress(*payload)
+            return
+
+        if task not in self._tasks:
+            return
+        self._tasks.remove(task)
+        if kind == 'done' and task.on_done is not None:
+            task.on_done(payload)
+        elif kind == 'error' and task.on_error is not None:
+            task.on_error(payload)
+        elif kind == 'cancelled' and task.on_cancel is not None:
+            task.on_cancel()
@@ -0,0 +1,395 @@
+"""Compiled inference for the tuned GradientBoostingClassifier.
+
+The fitted ColumnTransformer is evaluated as plain array operations and the
+fitted regression trees are flattened into contiguous NumPy node arrays
+(feature, threshold, left, right, value). For evaluation they are re-laid
+out as complete binary trees in heap order, so a row's position at the next
+level is 2 * pos + 1 + (x > threshold) and no child pointers are chased.
+
+With numba installed, larger batches run through a compiled kernel that is
+parallel over row blocks. Otherwise all trees are evaluated for a batch at
+once with NumPy: every (row, tree) pair advances one level per step, so the
+Python overhead is one loop iteration per tree level instead of one per stage.
+
+Usage:
+    python compiled_ensemble.py model.skops compiled_model.npz
+"""
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from feature_transform import fill_group_medians
+from instrumentation import stage
+
+DEFAULT_BLOCK_ROWS = 2048
+KERNEL_BLOCK_ROWS = 256
+# Below this many rows the NumPy path is as fast and avoids importing numba
+KERNEL_MIN_ROWS = 256
+
+# Bound to numba.prange when the kernel is compiled
+prange = range
+_kernel = None
+# The workqueue threading layer is not reentrant, so kernel calls are serialized
+_kernel_lock = threading.Lock()
+
+
+def _heap_tree_sum(X, heap_feature, heap_threshold, leaf_value, depth, block, out):
+    """Sum of leaf values per row; trees are walked level by level over a row block"""
+    n_rows = X.shape[0]
+    n_internal = heap_feature.shape[1]
+    n_blocks = (n_rows + block - 1) // block
+    for b in prange(n_blocks):
+        start = b * block
+        stop = min(start + block, n_rows)
+        pos = np.empty(stop - start, np.int64)
+        acc = np.zeros(stop - start)
+        for t in range(heap_feature.shape[0]):
+            feature = heap_feature[t]
+            threshold = heap_threshold[t]
+            pos[:] = 0
+            for _ in range(depth):
+                for i in range(stop - start):
+                    p = pos[i]
+                    pos[i] = 2 * p + 1 + (X[start + i, feature[p]] > threshold[p])
+            for i in range(stop - start):
+                acc[i] += leaf_value[t, pos[i] - n_internal]
+        out[start:stop] = acc
+
+
+def numba_kernel():
+    """Return the numba-compiled traversal kernel, or None if numba is not installed.
+
+    numba is imported on first use only, so loading a model does not pay for it.
+    """
+    global _kernel, prange
+    if _kernel is None:
+        try:
+            import numba
+        except ImportError:
+            _kernel = False
+        else:
+            # The OpenMP layer hangs interpreter exit once the kernel has run on a
+            # daemon thread (HTTP server, background tasks); workqueue does not
+            if 'NUMBA_THREADING_LAYER' not in os.environ:
+                numba.config.THREADING_LAYER = 'workqueue'
+            prange = numba.prange
+            _kernel = numba.njit(parallel=True, nogil=True, cache=True)(_heap_tree_sum)
+    return _kernel or None
+
+
+class CompiledEnsemble:
+    """Binary GradientBoostingClassifier flattened into node arrays.
+
+    Node arrays are global: tree t starts at roots[t] and its children point
+    into the same arrays. Leaves point to themselves so that every row can
+    take exactly max_depth steps. Node values already include the learning
+    rate, so the raw score is baseline + sum of the reached leaf values.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 baseline, n_features):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.baseline = float(baseline)
+        self.n_features = int(n_features)
+        self.classes_ = np.array([0, 1])
+
+        self._build_heap_layout()
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _build_heap_layout(self):
+        """Lay every tree out as a complete binary tree of depth max_depth.
+
+        heap_nodes[t, k] is the flat node at heap position k of tree t. Leaves
+        point to themselves, so a leaf above the last level is simply repeated
+        down to it (its threshold is +inf, so rows always step left).
+        """
+        n_positions = 2 ** (self.max_depth + 1) - 1
+        heap_nodes = np.empty((self.n_trees, n_positions), dtype=np.int32)
+        heap_nodes[:, 0] = self.roots
+        for depth in range(self.max_depth):
+            lo, hi = 2 ** depth - 1, 2 ** (depth + 1) - 1
+            parents = heap_nodes[:, lo:hi]
+            children = np.stack([self.left[parents], self.right[parents]], axis=2)
+            heap_nodes[:, hi:2 * hi + 1] = children.reshape(self.n_trees, -1)
+
+        n_internal = 2 ** self.max_depth - 1
+        self.heap_nodes = heap_nodes
+        self.heap_feature = np.ascontiguousarray(self.feature[heap_nodes[:, :n_internal]])
+        self.heap_threshold = np.ascontiguousarray(self.threshold[heap_nodes[:, :n_internal]])
+        self.leaf_value = np.ascontiguousarray(self.value[heap_nodes[:, n_internal:]])
+
+    @classmethod
+    def from_classifier(cls, clf):
+        """Flatten a fitted binary GradientBoostingClassifier"""
+        if clf.estimators_.shape[1] != 1:
+            raise ValueError("Only binary GradientBoostingClassifier models can be compiled")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in clf.estimators_[:, 0]:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int64) + offset
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            values.append(tree.value[:, 0, 0] * clf.learning_rate)
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        ensemble = cls(np.concatenate(features), np.concatenate(thresholds),
+                       np.concatenate(lefts), np.concatenate(rights), np.concatenate(values),
+                       np.array(roots), max_depth, 0.0, clf.n_features_in_)
+
+        # The initial raw prediction (log-odds of the class prior) is whatever
+        # the classifier adds on top of the trees; read it off a single row.
+        probe = np.zeros((1, clf.n_features_in_))
+        ensemble.baseline = float(clf.decision_function(probe)[0] - ensemble._tree_sum(probe)[0])
+        return ensemble
+
+    @classmethod
+    def load(cls, path):
+        """Load a compiled ensemble saved with save()"""
+        with np.load(path) as data:
+            return cls(data['feature'], data['threshold'], data['left'], data['right'],
+                       data['value'], data['roots'], data['max_depth'], data['baseline'],
+                       data['n_features'])
+
+    def save(self, path):
+        """Save the node arrays to an .npz file"""
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, value=self.value, roots=self.roots,
+                 max_depth=self.max_depth, baseline=self.baseline, n_features=self.n_features)
+
+    def _check_input(self, X):
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a 2-D array with {self.n_features} features, got shape {X.shape}")
+        return X
+
+    def apply(self, X):
+        """Return the (n_rows, n_trees) heap position of the leaf reached in every tree"""
+        X = self._check_input(X)
+        n_internal = self.heap_feature.shape[1]
+        tree_offset = (np.arange(self.n_trees) * n_internal)[None, :]
+        heap_feature = self.heap_feature.ravel()
+        heap_threshold = self.heap_threshold.ravel()
+        row_offset = (np.arange(len(X)) * self.n_features)[:, None]
+        values = X.ravel()
+
+        pos = np.zeros((len(X), self.n_trees), dtype=np.int64)
+        for _ in range(self.max_depth):
+            node = tree_offset + pos
+            go_right = values[row_offset + heap_feature[node]] > heap_threshold[node]
+            pos = 2 * pos + 1 + go_right
+        return pos
+
+    def _tree_sum(self, X, block_rows=DEFAULT_BLOCK_ROWS):
+        """Sum of the leaf values over all trees"""
+        X = self._check_input(X)
+        out = np.empty(len(X))
+        kernel = numba_kernel() if len(X) >= KERNEL_MIN_ROWS else None
+        if kernel is not None:
+            with _kernel_lock:
+                kernel(X, self.heap_feature, self.heap_threshold, self.leaf_value,
+                       self.max_depth, KERNEL_BLOCK_ROWS, out)
+            return out
+
+        # NumPy path: evaluate in row blocks to bound the (rows, trees) temporaries
+        n_internal = self.heap_feature.shape[1]
+        leaf_offset = (np.arange(self.n_trees) * self.leaf_value.shape[1] - n_internal)[None, :]
+        leaf_value = self.leaf_value.ravel()
+        for start in range(0, len(X), block_rows):
+            pos = self.apply(X[start:start + block_rows])
+            out[start:start + block_rows] = leaf_value[leaf_offset + pos].sum(axis=1)
+        return out
+
+    def decision_function(self, X, block_rows=DEFAULT_BLOCK_ROWS):
+        """Raw log-odds score, equivalent to GradientBoostingClassifier.decision_function"""
+        return self.baseline + self._tree_sum(X, block_rows)
+
+    def predict_proba(self, X, block_rows=DEFAULT_BLOCK_ROWS):
+        """Class probabilities, equivalent to GradientBoostingClassifier.predict_proba"""
+        proba = 1.0 / (1.0 + np.exp(-self.decision_function(X, block_rows)))
+        return np.column_stack([1.0 - proba, proba])
+
+
+class CompiledColumnTransformer:
+    """Fitted ColumnTransformer evaluated as plain array operations.
+
+    Supports the transformers used by the training notebook (RobustScaler,
+    OneHotEncoder, OrdinalEncoder, passthrough). Use compile_step() to fall
+    back to the sklearn object for anything else.
+    """
+
+    def __init__(self, column_transformer):
+        feature_names = list(getattr(column_transformer, 'feature_names_in_', []))
+        self.steps = []
+        for name, transformer, columns in column_transformer.transformers_:
+            if isinstance(transformer, str) and transformer == 'drop':
+                continue
+            columns = [feature_names[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+            if len(columns) == 0:
+                continue
+            if not all(isinstance(c, str) for c in columns):
+                raise TypeError(f"Unsupported column selection in '{name}'")
+            self.steps.append(self._compile_transformer(name, transformer, columns))
+
+    @staticmethod
+    def _compile_transformer(name, transformer, columns):
+        from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, RobustScaler
+
+        if isinstance(transformer, str) and transformer == 'passthrough':
+            return 'passthrough', columns, None
+        if type(transformer) is RobustScaler:
+            return 'scale', columns, (transformer.center_, transformer.scale_)
+        if type(transformer) is OneHotEncoder:
+            if getattr(transformer, 'infrequent_categories_', None) is not None and \
+                    any(c is not None for c in transformer.infrequent_categories_):
+                raise TypeError(f"Infrequent categories in '{name}' are not supported")
+            drop_idx = transformer.drop_idx_
+            if drop_idx is None:
+                drop_idx = [None] * len(columns)
+            categories = [(pd.Index(cats), drop) for cats, drop in zip(transformer.categories_, drop_idx)]
+            return 'onehot', columns, (categories, transformer.handle_unknown == 'ignore')
+        if type(transformer) is OrdinalEncoder:
+            if transformer.handle_unknown != 'error':
+                raise TypeError(f"Only handle_unknown='error' is supported in '{name}'")
+            return 'ordinal', columns, [pd.Index(cats) for cats in transformer.categories_]
+        raise TypeError(f"Transformer '{name}' ({type(transformer).__name__}) cannot be compiled")
+
+    def transform(self, X):
+        blocks = []
+        for kind, columns, params in self.steps:
+            if kind == 'passthrough':
+                blocks.append(np.column_stack([X[col].to_numpy(dtype=float) for col in columns]))
+            elif kind == 'scale':
+                center, scale = params
+                block = np.column_stack([X[col].to_numpy(dtype=float) for col in columns])
+                if center is not None:
+                    block = block - center
+                if scale is not None:
+                    block = block / scale
+                blocks.append(block)
+            elif kind == 'onehot':
+                categories, ignore_unknown = params
+                for col, (index, drop) in zip(columns, categories):
+                    codes = index.get_indexer(X[col].to_numpy(dtype=object))
+                    if not ignore_unknown and (codes < 0).any():
+                        raise ValueError(f"Found unknown categories in column {col}")
+                    block = np.zeros((len(X), len(index)))
+                    known = codes >= 0
+                    block[np.nonzero(known)[0], codes[known]] = 1.0
+                    if drop is not None:
+                        block = np.delete(block, drop, axis=1)
+                    blocks.append(block)
+            else:
+                for col, index in zip(columns, params):
+                    codes = index.get_indexer(X[col].to_numpy(dtype=object))
+                    if (codes < 0).any():
+                        raise ValueError(f"Found unknown categories in column {col}")
+                    blocks.append(codes[:, None].astype(float))
+        return np.hstack(blocks)
+
+
+class CompiledGroupMedianImputer:
+    """Fitted GroupMedianImputer (see imputation.py) without the sklearn dependency"""
+
+    def __init__(self, imputer):
+        self.group_col = imputer.group_col
+        self.imputed_features = list(imputer.columns)
+        self.groups = pd.Index(imputer.groups_)
+        # Unknown groups index -1, i.e. the overall medians in the last row
+        self.table = np.vstack([imputer.medians_, imputer.overall_medians_])
+
+    def transform(self, X):
+        return fill_group_medians(X, self.group_col, self.imputed_features, self.groups, self.table)
+
+
+def compile_step(step):
+    """Return an array-based equivalent of a fitted preprocessing step, or the step itself"""
+    from sklearn.compose import ColumnTransformer
+
+    from imputation import GroupMedianImputer
+
+    if type(step) is ColumnTransformer:
+        try:
+            return CompiledColumnTransformer(step)
+        except TypeError:
+            return step
+    if type(step) is GroupMedianImputer:
+        return CompiledGroupMedianImputer(step)
+    return step
+
+
+class CompiledPipeline:
+    """The fitted preprocessing steps followed by the compiled ensemble.
+
+    Drop-in replacement for the sklearn pipeline wherever only predict_proba
+    is needed (CreditRiskScorer, batch scoring).
+    """
+
+    def __init__(self, preprocessors, ensemble):
+        self.preprocessors = list(preprocessors)
+        self.ensemble = ensemble
+        self.classes_ = ensemble.classes_
+        # Instrumentation stage of each step: 'model.CompiledColumnTransformer', ...
+        self._stages = [f"model.{type(step).__name__}" for step in self.preprocessors]
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Compile a fitted Pipeline([(imputer), ('preprocessor', ColumnTransformer), (..., GB)])"""
+        preprocessors = [compile_step(step) for _, step in pipeline.steps[:-1]]
+        return cls(preprocessors, CompiledEnsemble.from_classifier(pipeline[-1]))
+
+    def transform(self, X):
+        """Apply the preprocessing steps only"""
+        for name, step in zip(self._stages, self.preprocessors):
+            with stage(name):
+                X = step.transform(X)
+        return X
+
+    def predict_proba(self, X):
+        X = self.transform(X)
+        with stage('model.trees'):
+            return self.ensemble.predict_proba(X)
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+
+def main(argv=None):
+    from scoring import load_model
+
+    parser = argparse.ArgumentParser(description="Flatten the model's trees into NumPy node arrays")
+    parser.add_argument('model', nargs='?', default="model.skops", help="Path to model.skops")
+    parser.add_argument('output', nargs='?', default="compiled_model.npz", help="Output .npz file")
+    args = parser.parse_args(argv)
+
+    ensemble = CompiledEnsemble.from_classifier(load_model(args.model)[-1])
+    ensemble.save(args.output)
+    print(f"Compiled {ensemble.n_trees} trees ({len(ensemble.feature):,} nodes, "
+          f"max depth {ensemble.max_depth}) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,36 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 import pandas as pd
 import numpy as np
-from scipy import stats
-import joblib
-import skops.io as sio
 import os
 from datetime import datetime
 
+from feature_transform import FeatureTransform
+from model_cache import load_model_artifacts
+from scoring import CreditRiskScorer, load_threshold, threshold_path_for
+from prediction_store import PredictionStore, make_record
+from drift_monitor import load_reference
+from report_export import export_predictions
+from background_tasks import BackgroundTasks
+from explain import top_factors
+from result_cache import shared_cache
+from instrumentation import configure_from_env, stage
+
+# Factors shown with each prediction
+TOP_FACTORS = 5
+FEATURE_LABELS = {
+    'person_age': 'Age',
+    'person_income': 'Income',
+    'person_emp_length': 'Employment Length',
+    'loan_amnt': 'Loan Amount',
+    'loan_int_rate': 'Interest Rate',
+    'loan_percent_income': 'Loan-to-Income Ratio',
+    'cb_person_cred_hist_length': 'Credit History Length',
+    'person_home_ownership': 'Home Ownership',
+    'loan_intent': 'Loan Purpose',
+    'loan_grade': 'Loan Grade',
+    'cb_person_default_on_file': 'Previous Default',
+}
+
 class CreditRiskPredictor:
     def __init__(self, root):
         self.root = root
@@ -17,6 +41,18 @@ class CreditRiskPredictor:
         # Load the saved model and Box-Cox lambdas
         self.load_model()
         
+        # Prediction log; the old CSV log is imported into it once. With a drift
+        # reference next to the model it also keeps running input histograms
+        self.prediction_store = PredictionStore(drift_reference=load_reference())
+        self.prediction_store.import_legacy_csv()
+        self.flush_prediction_log()
+        
+        # Scoring and exports run on worker threads; applications are scored in the order they were queued
+        self.scoring_tasks = BackgroundTasks(self.root, max_workers=1, name="scoring")
+        self.export_tasks = BackgroundTasks(self.root, max_workers=1, name="export")
+        self.export_task = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Define features and categories
         self.numeric_features = ['person_age', 'person_income', 'person_emp_length', 'loan_amnt', 
                                 'loan_int_rate', 'loan_percent_income', 'cb_person_cred_hist_length']
@@ -42,12 +78,22 @@ class CreditRiskPredictor:
             if not os.path.exists("lambdas.pkl"):
                 raise FileNotFoundError("lambdas.pkl not found")
                 
-            unknown_types = sio.get_untrusted_types(file="model.skops")
-            self.model = sio.load("model.skops", trusted=unknown_types)
-            
-            # Load Box-Cox transformation parameters
-            self.lambdas = joblib.load('lambdas.pkl')
+            # Compiled model and Box-Cox parameters come from the fast-start cache,
+            # which is built from model.skops and lambdas.pkl on the first launch
+            artifacts = load_model_artifacts("model.skops", "lambdas.pkl")
+            self.model = artifacts['model']
+            self.lambdas = artifacts['lambdas']
             self.boxcox_features = list(self.lambdas.keys())
+            self.feature_transform = FeatureTransform(self.lambdas)
+            
+            # Scoring runs the compiled ensemble once and applies the stored decision threshold;
+            # applications scored before with the same model version come from the result cache
+            self.scorer = CreditRiskScorer(self.model,
+                                           self.feature_transform,
+                                           load_threshold(threshold_path_for("model.skops")),
+                                           artifacts['explainer'],
+                                           cache=shared_cache(),
+                                           model_key=artifacts['key'])
             
         except FileNotFoundError as e:
             messagebox.showerror("File Error", 
@@ -84,6 +130,20 @@ class CreditRiskPredictor:
         self.stats_label = ttk.Label(stats_frame, text="Saved Predictions: 0", font=("Arial", 10))
         self.stats_label.pack(side=tk.LEFT, padx=(10, 20))
         
+        self.task_label = ttk.Label(stats_frame, text="Queued Applications: 0", font=("Arial", 10))
+        self.task_label.pack(side=tk.LEFT, padx=(0, 20))
+        
+        # Export progress and cancellation
+        self.progress_bar = ttk.Progressbar(stats_frame, length=150, mode='determinate')
+        self.progress_bar.pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.export_label = ttk.Label(stats_frame, text="", font=("Arial", 9))
+        self.export_label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.cancel_export_btn = ttk.Button(stats_frame, text="Cancel Export",
+                                            command=self.cancel_export, state=tk.DISABLED, width=12)
+        self.cancel_export_btn.pack(side=tk.LEFT)
+        
         # Instructions
         instructions = ttk.Label(scrollable_frame, 
                                 text="Fill in the loan application details below:",
@@ -104,6 +164,8 @@ class CreditRiskPredictor:
             frame.grid(row=row, column=col, padx=5, pady=5, sticky="w")
             
             label_text = feature.replace('_', ' ').title()
+            if feature in self.optional_features():
+                label_text += " (optional)"
             ttk.Label(frame, text=label_text, font=("Arial", 9)).pack(anchor="w")
             
             self.entries[feature] = ttk.Entry(frame, width=15)
@@ -203,12 +265,9 @@ class CreditRiskPredictor:
     def update_prediction_count(self):
         """Update the prediction count display"""
         try:
-            if os.path.exists('loan_predictions.csv'):
-                df = pd.read_csv('loan_predictions.csv')
-                count = len(df)
-                self.stats_label.config(text=f"Saved Predictions: {count}")
-            else:
-                self.stats_label.config(text="Saved Predictions: 0")
+            with stage('gui.update_prediction_count'):
+                count = self.prediction_store.count()
+            self.stats_label.config(text=f"Saved Predictions: {count}")
         except Exception as e:
             self.stats_label.config(text="Saved Predictions: Unknown")
     
@@ -248,10 +307,16 @@ class CreditRiskPredictor:
         self.result_text.delete(1.0, tk.END)
         self.result_text.config(state=tk.DISABLED)
     
+    def optional_features(self):
+        """Numeric fields that may be left blank: imputed by the model or filled like in training"""
+        return self.scorer.transform.optional_features
+    
     def validate_inputs(self):
         """Validate all input fields"""
         # Validate numeric fields
         for feature in self.numeric_features:
+            if feature in self.optional_features() and not self.entries[feature].get().strip():
+                continue
             try:
                 value = float(self.entries[feature].get())
                 if value < 0:
@@ -277,18 +342,19 @@ class CreditRiskPredictor:
                 raise ValueError(f"Please select a value for {feature.replace('_', ' ').title()}")
     
     def predict_loan_status(self):
-        """Main prediction function"""
+        """Validate the form and queue the application for scoring"""
         try:
             # Validate inputs
-            self.validate_inputs()
+            with stage('gui.validate_inputs'):
+                self.validate_inputs()
             
             # Collect inputs
             data = {}
             
-            # Collect numeric features
+            # Collect numeric features; blank optional fields are filled by the transform or the model's imputer
             for feature in self.numeric_features:
-                value = float(self.entries[feature].get())
-                data[feature] = value
+                text = self.entries[feature].get().strip()
+                data[feature] = float(text) if text else np.nan
             
             # Collect categorical features
             for feature in self.categorical_features:
@@ -298,51 +364,98 @@ class CreditRiskPredictor:
             data['cb_person_default_on_file'] = 1 if self.default_var.get() else 0
             
             # Create DataFrame
-            input_df = pd.DataFrame([data])
-            
-            # Store original values for saving
-            original_values = input_df.copy()
-            
-            # Apply log transformation to person_income (as in training)
-            input_df['person_income'] = np.log(input_df['person_income'] + 1e-10)
-            
-            # Handle loan_grade (replace F,G with Other as in training)
-            input_df['loan_grade'] = input_df['loan_grade'].replace(['F', 'G'], 'Other')
-            
-            # Apply Box-Cox transformations
-            for col in self.boxcox_features:
-                if col in input_df.columns:
-                    lambda_, shift = self.lambdas[col]
-                    value = input_df[col].values[0]
-                    shifted_value = value + shift
-                    if shifted_value <= 0:
-                        raise ValueError(f"Value for {col} after shift is non-positive: {shifted_value}")
-                    transformed = stats.boxcox(shifted_value, lmbda=lambda_)
-                    input_df[col] = transformed
-            
-            # Make prediction
-            prediction = self.model.predict(input_df)[0]
-            proba = self.model.predict_proba(input_df)[0][1]
-            
-            # Format results
-            risk_level = "High Risk (Default Likely)" if prediction == 1 else "Low Risk (Default Unlikely)"
-            probability = f"{proba:.2%}"
-            
-            # Display results
-            self.display_results(original_values, prediction, proba, risk_level, probability)
-            
-            # Save prediction
-            self.save_prediction(original_values, prediction, proba)
-            
-            # Update prediction count
-            self.update_prediction_count()
+            with stage('gui.build_frame'):
+                input_df = pd.DataFrame([data])
             
         except ValueError as ve:
             messagebox.showerror("Input Error", str(ve))
+            return
+        
+        # Scoring runs on the worker; the form can be edited and submitted again meanwhile
+        self.scoring_tasks.submit(self.score_application, input_df, name="Scoring",
+                                  on_done=self.on_prediction_done, on_error=self.on_prediction_error)
+        self.update_task_status()
+    
+    def score_application(self, task, input_df):
+        """Score and log one application (runs on the scoring worker, no widget access)"""
+        # Apply log, loan_grade mapping and Box-Cox (as in training) and score in one pass
+        with stage('gui.score'):
+            probas, predictions, _ = self.scorer.score(input_df, strict=True)
+        prediction = int(predictions[0])
+        proba = float(probas[0])
+        
+        # Feature contributions for the result panel; the prediction stands without them
+        try:
+            with stage('gui.explain'):
+                contributions, _ = self.scorer.explain(input_df)
+                factors = top_factors(contributions.iloc[0], TOP_FACTORS)
+        except Exception:
+            factors = None
+        
+        # Save prediction; a failed save is reported but does not hide the result
+        save_error = None
+        try:
+            with stage('gui.save_prediction'):
+                application = input_df.to_dict(orient='records')[0]
+                self.prediction_store.append(make_record(application, prediction, proba))
         except Exception as e:
-            messagebox.showerror("Prediction Error", f"An error occurred during prediction: {e}")
+            save_error = e
+        return input_df, prediction, proba, factors, save_error
+    
+    def on_prediction_done(self, result):
+        """Show a finished prediction (Tk thread)"""
+        input_df, prediction, proba, factors, save_error = result
+        
+        # Format results
+        risk_level = "High Risk (Default Likely)" if prediction == 1 else "Low Risk (Default Unlikely)"
+        probability = f"{proba:.2%}"
+        
+        self.update_task_status()
+        self.update_prediction_count()
+        
+        # Display results
+        self.display_results(input_df, prediction, proba, risk_level, probability, factors)
+        if save_error is not None:
+            messagebox.showerror("Save Error", f"Could not save prediction: {save_error}")
     
-    def display_results(self, input_df, prediction, proba, risk_level, probability):
+    def on_prediction_error(self, error):
+        """Report a failed prediction (Tk thread)"""
+        self.update_task_status()
+        if isinstance(error, ValueError):
+            messagebox.showerror("Input Error", str(error))
+        else:
+            messagebox.showerror("Prediction Error", f"An error occurred during prediction: {error}")
+    
+    def flush_prediction_log(self):
+        """Write buffered predictions once they are flush_interval old, even if no new ones arrive"""
+        self.prediction_store.flush_if_due()
+        self.root.after(max(int(self.prediction_store.flush_interval * 1000), 100), self.flush_prediction_log)
+    
+    def update_task_status(self):
+        """Update the queued applications display"""
+        self.task_label.config(text=f"Queued Applications: {self.scoring_tasks.pending}")
+    
+    def format_interest_rate(self, rate):
+        if pd.isna(rate):
+            return "not given (loan grade median used)"
+        return f"{rate:.2f}%"
+    
+    def format_emp_length(self, years):
+        if pd.isna(years):
+            return "not given (counted as 0 years)"
+        return f"{years:.0f} years"
+    
+    def format_factors(self, factors):
+        """Main factors of a prediction, largest effect on the log-odds of default first"""
+        if not factors:
+            return "Not available for this model\n"
+        lines = []
+        for feature, contribution in factors:
+            direction = "raises risk" if contribution > 0 else "lowers risk"
+            lines.append(f"{FEATURE_LABELS.get(feature, feature):<24} {contribution:+.3f}  ({direction})")
+        return '\n'.join(lines) + '\n'
+    
+    def display_results(self, input_df, prediction, proba, risk_level, probability, factors=None):
         """Display prediction results in the text area"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
@@ -352,13 +465,14 @@ Timestamp: {timestamp}
 
 Risk Assessment: {risk_level}
 Default Probability: {probability}
+Decision Threshold: {self.scorer.threshold:.2%}
 
 === INPUT DATA ===
 Age: {input_df['person_age'].iloc[0]:.0f} years
 Income: ${input_df['person_income'].iloc[0]:,.0f}
-Employment Length: {input_df['person_emp_length'].iloc[0]:.0f} years
+Employment Length: {self.format_emp_length(input_df['person_emp_length'].iloc[0])}
 Loan Amount: ${input_df['loan_amnt'].iloc[0]:,.0f}
-Interest Rate: {input_df['loan_int_rate'].iloc[0]:.2f}%
+Interest Rate: {self.format_interest_rate(input_df['loan_int_rate'].iloc[0])}
 Loan-to-Income Ratio: {input_df['loan_percent_income'].iloc[0]:.2%}
 Credit History Length: {input_df['cb_person_cred_hist_length'].iloc[0]} years
 Home Ownership: {input_df['person_home_ownership'].iloc[0]}
@@ -366,6 +480,8 @@ Loan Purpose: {input_df['loan_intent'].iloc[0]}
 Loan Grade: {input_df['loan_grade'].iloc[0]}
 Previous Default: {'Yes' if input_df['cb_person_default_on_file'].iloc[0] == 1 else 'No'}
 
+=== MAIN FACTORS (log-odds contribution) ===
+{self.format_factors(factors)}
 === RECOMMENDATION ===
 """
         
@@ -384,45 +500,22 @@ Previous Default: {'Yes' if input_df['cb_person_default_on_file'].iloc[0] == 1 e
         messagebox.showinfo("Prediction Complete", 
                            f"Risk Level: {risk_level}\nDefault Probability: {probability}")
     
-    def save_prediction(self, input_df, prediction, proba):
-        """Save prediction to CSV file"""
-        try:
-            # Prepare data for saving
-            save_df = input_df.copy()
-            save_df['predicted_loan_status'] = prediction
-            save_df['default_probability'] = proba
-            save_df['prediction_timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            save_df['risk_level'] = "High Risk" if prediction == 1 else "Low Risk"
-            
-            # Save to CSV
-            file_path = 'loan_predictions.csv'
-            if os.path.exists(file_path):
-                save_df.to_csv(file_path, mode='a', header=False, index=False)
-            else:
-                save_df.to_csv(file_path, mode='w', header=True, index=False)
-            
-        except Exception as e:
-            messagebox.showerror("Save Error", f"Could not save prediction: {e}")
-    
     def export_all_data_csv(self):
-        """Export all saved predictions to CSV"""
+        """Export all saved predictions to CSV or Parquet"""
         try:
-            if not os.path.exists('loan_predictions.csv'):
+            if self.prediction_store.count() == 0:
                 messagebox.showinfo("No Data", "No predictions have been saved yet.")
                 return
             
             # Ask user where to save the file
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+                filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("All files", "*.*")],
                 title="Export Predictions to CSV"
             )
             
             if file_path:
-                # Copy the existing data to new location
-                import shutil
-                shutil.copy('loan_predictions.csv', file_path)
-                messagebox.showinfo("Export Complete", f"Data exported successfully to:\n{file_path}")
+                self.start_export(file_path)
                 
         except Exception as e:
             messagebox.showerror("Export Error", f"Could not export data: {e}")
@@ -432,13 +525,13 @@ Previous Default: {'Yes' if input_df['cb_person_default_on_file'].iloc[0] == 1 e
         try:
             # Check if fpdf2 is installed
             try:
-                from fpdf import FPDF
+                import fpdf
             except ImportError:
                 messagebox.showerror("Import Error", 
                     "PDF export requires 'fpdf2' library.\nPlease install it using: pip install fpdf2")
                 return
             
-            if not os.path.exists('loan_predictions.csv'):
+            if self.prediction_store.count() == 0:
                 messagebox.showinfo("No Data", "No predictions have been saved yet.")
                 return
             
@@ -450,62 +543,63 @@ Previous Default: {'Yes' if input_df['cb_person_default_on_file'].iloc[0] == 1 e
             )
             
             if file_path:
-                # Read the data
-                df = pd.read_csv('loan_predictions.csv')
-                
-                # Create PDF
-                pdf = FPDF()
-                pdf.set_auto_page_break(auto=True, margin=15)
-                pdf.add_page()
-                
-                # Title
-                pdf.set_font("Arial", "B", 16)
-                pdf.cell(0, 10, "Credit Risk Predictions Report", ln=True, align="C")
-                pdf.ln(5)
-                
-                # Timestamp
-                pdf.set_font("Arial", "", 10)
-                pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-                pdf.ln(5)
-                
-                # Total records
-                pdf.cell(0, 10, f"Total Records: {len(df)}", ln=True)
-                pdf.ln(10)
-                
-                # Table headers
-                pdf.set_font("Arial", "B", 8)
-                headers = ['Timestamp', 'Age', 'Income', 'Loan Amount', 'Risk Level', 'Probability']
-                col_width = pdf.w / len(headers) - 5
-                
-                for header in headers:
-                    pdf.cell(col_width, 10, header, border=1, align="C")
-                pdf.ln()
-                
-                # Table data
-                pdf.set_font("Arial", "", 8)
-                for index, row in df.iterrows():
-                    try:
-                        pdf.cell(col_width, 8, str(row.get('prediction_timestamp', 'N/A'))[:15], border=1)
-                        pdf.cell(col_width, 8, str(row.get('person_age', 'N/A')), border=1, align="C")
-                        pdf.cell(col_width, 8, f"${row.get('person_income', 0):,.0f}", border=1, align="R")
-                        pdf.cell(col_width, 8, f"${row.get('loan_amnt', 0):,.0f}", border=1, align="R")
-                        pdf.cell(col_width, 8, str(row.get('risk_level', 'N/A')), border=1, align="C")
-                        pdf.cell(col_width, 8, f"{row.get('default_probability', 0):.1%}", border=1, align="C")
-                        pdf.ln()
-                    except:
-                        continue
-                
-                # Save PDF
-                pdf.output(file_path)
-                messagebox.showinfo("Export Complete", f"Data exported successfully to:\n{file_path}")
+                self.start_export(file_path)
                 
         except Exception as e:
             messagebox.showerror("Export Error", f"Could not export data to PDF: {e}")
     
+    def start_export(self, file_path):
+        """Stream the log to file_path on the export worker"""
+        if self.export_task is not None:
+            messagebox.showinfo("Export Running", "Another export is still running. Wait for it or cancel it first.")
+            return
+        
+        self.export_task = self.export_tasks.submit(
+            self.run_export, file_path, name=f"Export to {os.path.basename(file_path)}",
+            on_done=self.on_export_done, on_error=self.on_export_error,
+            on_progress=self.on_export_progress, on_cancel=self.on_export_cancelled)
+        self.progress_bar.config(value=0, maximum=1)
+        self.export_label.config(text="Exporting...")
+        self.cancel_export_btn.config(state=tk.NORMAL)
+    
+    def run_export(self, task, file_path):
+        """Export worker; task.progress raises once the export is cancelled"""
+        with stage('gui.export'):
+            rows = export_predictions(self.prediction_store, file_path, progress=task.progress)
+        return file_path, rows
+    
+    def cancel_export(self):
+        """Cancel the running export; its partial output file is removed"""
+        if self.export_task is not None:
+            self.export_task.cancel()
+            self.export_label.config(text="Cancelling...")
+    
+    def on_export_progress(self, done, total):
+        self.progress_bar.config(maximum=max(total or 0, 1), value=done)
+        self.export_label.config(text=f"Exporting {done:,} / {total:,} rows")
+    
+    def finish_export(self, status):
+        self.export_task = None
+        self.progress_bar.config(value=0)
+        self.export_label.config(text=status)
+        self.cancel_export_btn.config(state=tk.DISABLED)
+    
+    def on_export_done(self, result):
+        file_path, rows = result
+        self.finish_export(f"Exported {rows:,} rows")
+        messagebox.showinfo("Export Complete", f"Data exported successfully to:\n{file_path}")
+    
+    def on_export_error(self, error):
+        self.finish_export("Export failed")
+        messagebox.showerror("Export Error", f"Could not export data: {error}")
+    
+    def on_export_cancelled(self):
+        self.finish_export("Export cancelled")
+    
     def clear_all_predictions(self):
         """Clear all saved predictions"""
         try:
-            if not os.path.exists('loan_predictions.csv'):
+            if self.prediction_store.count() == 0:
                 messagebox.showinfo("No Data", "No predictions to clear.")
                 return
             
@@ -517,8 +611,8 @@ Previous Default: {'Yes' if input_df['cb_person_default_on_file'].iloc[0] == 1 e
             )
             
             if result:
-                # Delete the file
-                os.remove('loan_predictions.csv')
+                # Delete all logged predictions
+                self.prediction_store.clear()
                 
                 # Update display
                 self.update_prediction_count()
@@ -527,9 +621,26 @@ Previous Default: {'Yes' if input_df['cb_person_default_on_file'].iloc[0] == 1 e
         except Exception as e:
             messagebox.showerror("Error", f"Could not clear predictions: {e}")
 
+    def on_close(self):
+        """Stop background work and close the window once running tasks are done with the prediction log"""
+        queued = self.scoring_tasks.queued
+        if queued and not messagebox.askyesno(
+                "Applications Still Queued",
+                f"{queued} queued application(s) have not been scored yet and will be discarded.\n"
+                "Close anyway?",
+                icon='warning'):
+            return
+        # The running application is scored and logged (a scoring task does not stop halfway) and an
+        # export stops at its next progress report; main() closes the store only after both returned
+        self.scoring_tasks.shutdown(wait=True)
+        self.export_tasks.shutdown(wait=True)
+        self.root.destroy()
+
 def create_lambdas_file():
     """Create a sample lambdas.pkl file if it doesn't exist"""
     if not os.path.exists('lambdas.pkl'):
+        import joblib
+
         # These are example values - replace with your actual Box-Cox parameters
         lambdas = {
             'person_age': (0.5, 0),
@@ -546,9 +657,13 @@ def main():
     # Create lambdas file if it doesn't exist
     create_lambdas_file()
     
+    # Stage timings and profiling are enabled by CREDIT_RISK_METRICS / CREDIT_RISK_PROFILE
+    configure_from_env()
+    
     root = tk.Tk()
     app = CreditRiskPredictor(root)
     root.mainloop()
+    app.prediction_store.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
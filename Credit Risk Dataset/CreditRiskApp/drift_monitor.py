@@ -0,0 +1,281 @@
+"""Input drift of logged predictions against the training data.
+
+A DriftReference holds one compact histogram per input feature, built once
+from the train + val rows the model is fit on: 50 quantile bins for numeric features (plus a
+bin for missing values), one bin per category for categorical ones (plus
+bins for unseen and missing values). Given a reference, the PredictionStore
+adds the bin counts of the rows it writes to a drift_counts table in the
+same transaction as the insert, so the running histograms of the log are
+always current and the log itself is never re-read.
+
+drift_report() compares the two sets of histograms: PSI per feature on
+reference bins merged to at least 10% of the training rows each, and for
+numeric features the KS statistic evaluated at the reference bin edges.
+Both read a few hundred counts from SQLite and take milliseconds whatever
+the size of the log.
+
+Usage:
+    python drift_monitor.py build ../credit_risk_dataset.csv [--all-rows]
+    python drift_monitor.py report
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_transform import BINARY_FEATURE, CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+DRIFT_REFERENCE_FILE = "drift_reference.json"
+REFERENCE_BINS = 50
+# PSI bins are runs of reference bins holding at least this share of the training rows
+PSI_MIN_SHARE = 0.1
+# Zero shares are replaced by this in the PSI logarithm
+PSI_EPSILON = 1e-4
+# Usual PSI reading: below 0.1 stable, 0.1-0.25 moderate shift, above 0.25 drift
+PSI_SHIFT = 0.1
+PSI_DRIFT = 0.25
+MIN_ROWS = 100
+
+MONITORED_FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES + [BINARY_FEATURE]
+# The log stores the default flag as 1/0, the dataset CSV as Y/N
+FLAG_LABELS = {'N': '0', 'Y': '1'}
+
+
+def _label(feature, value):
+    """Category label of one value, or None when it is missing"""
+    if value is None or pd.isna(value):
+        return None
+    if feature == BINARY_FEATURE:
+        # 1, 1.0, True and 'Y' all count as the same flag value
+        return FLAG_LABELS.get(value, str(int(value)) if not isinstance(value, str) else value)
+    return str(value)
+
+
+def _bin_edges(values, bins):
+    """Quantile bin edges placed halfway between neighbouring distinct values.
+
+    Many features take few distinct values (ages, rates on a 0.01 grid), so
+    an edge on a value itself would split ties by float rounding: the
+    float32 dataset cache and the float64 log disagree on 0.1.
+    """
+    distinct = np.unique(values)
+    cuts = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1], method='inverted_cdf'))
+    cuts = cuts[cuts < distinct[-1]]
+    following = distinct[np.searchsorted(distinct, cuts, side='right')]
+    # Rounded so the float32 cache and the CSV give the same reference
+    return [float(f"{edge:.7g}") for edge in (cuts + following) / 2]
+
+
+class DriftReference:
+    """Training histograms of the monitored features.
+
+    features maps each feature to {'kind': 'numeric', 'edges': [...]} or
+    {'kind': 'categorical', 'categories': [...]}, each with the training
+    'counts' per bin. Numeric bins are the intervals between edges
+    followed by a missing-value bin; categorical bins are the categories
+    followed by an unseen-category bin and a missing-value bin.
+    """
+
+    def __init__(self, features):
+        self.features = features
+        self.id = hashlib.sha256(json.dumps(features, sort_keys=True).encode()).hexdigest()[:16]
+        self._category_bins = {feature: {category: i for i, category in enumerate(spec['categories'])}
+                               for feature, spec in features.items() if spec['kind'] == 'categorical'}
+
+    @classmethod
+    def from_frame(cls, df, bins=REFERENCE_BINS):
+        """Build the reference from raw training rows (the dataset CSV layout)"""
+        features = {}
+        for feature in MONITORED_FEATURES:
+            if feature not in df.columns:
+                continue
+            if feature in NUMERIC_FEATURES:
+                values = df[feature].to_numpy(dtype=float)
+                features[feature] = {'kind': 'numeric', 'edges': _bin_edges(values[~np.isnan(values)], bins)}
+            else:
+                labels = {_label(feature, value) for value in df[feature].unique()}
+                features[feature] = {'kind': 'categorical', 'categories': sorted(labels - {None})}
+        counts = cls(features).count(df)
+        for feature, spec in features.items():
+            spec['counts'] = counts[feature].tolist()
+        return cls(features)
+
+    def n_bins(self, feature):
+        spec = self.features[feature]
+        if spec['kind'] == 'numeric':
+            return len(spec['edges']) + 2
+        return len(spec['categories']) + 2
+
+    def bin_index(self, feature, values):
+        """Reference bin of every value.
+
+        Written for the store's usual batch of one row as much as for the
+        whole dataset: plain NumPy and dict lookups, no per-call pandas
+        objects.
+        """
+        spec = self.features[feature]
+        if spec['kind'] == 'numeric':
+            try:
+                values = np.asarray(values, dtype=float)
+            except (TypeError, ValueError):
+                values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+            index = np.searchsorted(spec['edges'], values, side='right')
+            return np.where(np.isnan(values), len(spec['edges']) + 1, index)
+        bins = self._category_bins[feature]
+        unseen, missing = len(bins), len(bins) + 1
+        labels = (_label(feature, value) for value in values)
+        return np.fromiter((missing if label is None else bins.get(label, unseen) for label in labels),
+                           dtype=np.int64, count=len(values))
+
+    def count(self, columns):
+        """Histogram of each monitored feature in columns (a DataFrame or a dict of sequences)"""
+        return {feature: np.bincount(self.bin_index(feature, columns[feature]), minlength=self.n_bins(feature))
+                for feature in self.features if feature in columns}
+
+    def to_dict(self):
+        return {'id': self.id, 'features': self.features}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(json.load(f)['features'])
+
+
+def load_reference(path=DRIFT_REFERENCE_FILE):
+    """The reference stored next to the model, or None when there is none"""
+    return DriftReference.load(path) if os.path.exists(path) else None
+
+
+def _psi_groups(reference_counts):
+    """Split the numeric value bins into runs holding at least PSI_MIN_SHARE of the reference each"""
+    total = reference_counts.sum()
+    groups, start, share = [], 0, 0.0
+    for i, count in enumerate(reference_counts):
+        share += count / total
+        if share >= PSI_MIN_SHARE:
+            groups.append((start, i + 1))
+            start, share = i + 1, 0.0
+    if start < len(reference_counts):
+        if groups:
+            groups[-1] = (groups[-1][0], len(reference_counts))
+        else:
+            groups.append((start, len(reference_counts)))
+    return groups
+
+
+def psi(reference_counts, current_counts):
+    """Population stability index of two histograms over the same bins"""
+    expected = reference_counts / reference_counts.sum()
+    actual = current_counts / current_counts.sum()
+    expected_safe = np.maximum(expected, PSI_EPSILON)
+    actual_safe = np.maximum(actual, PSI_EPSILON)
+    return float(np.sum((actual_safe - expected_safe) * np.log(actual_safe / expected_safe)))
+
+
+def feature_drift(spec, current_counts):
+    """PSI, KS (numeric only) and row counts of one feature"""
+    reference_counts = np.asarray(spec['counts'], dtype=float)
+    current_counts = np.asarray(current_counts, dtype=float)
+    result = {'rows': int(current_counts.sum()), 'psi': None, 'ks': None}
+    if result['rows'] == 0:
+        return result
+    if spec['kind'] == 'numeric':
+        # Value bins merged into PSI bins; the missing-value bin stays on its own
+        groups = _psi_groups(reference_counts[:-1])
+        reference_psi = np.array([reference_counts[a:b].sum() for a, b in groups] + [reference_counts[-1]])
+        current_psi = np.array([current_counts[a:b].sum() for a, b in groups] + [current_counts[-1]])
+        result['psi'] = psi(reference_psi, current_psi)
+        reference_values, current_values = reference_counts[:-1], current_counts[:-1]
+        if current_values.sum() > 0:
+            result['ks'] = float(np.max(np.abs(np.cumsum(reference_values) / reference_values.sum()
+                                               - np.cumsum(current_values) / current_values.sum())))
+        result['missing_share'] = float(current_counts[-1] / result['rows'])
+    else:
+        result['psi'] = psi(reference_counts, current_counts)
+        result['unseen_share'] = float(current_counts[-2] / result['rows'])
+    return result
+
+
+def drift_status(result):
+    if result['rows'] < MIN_ROWS:
+        return 'too few rows'
+    if result['psi'] >= PSI_DRIFT:
+        return 'drift'
+    if result['psi'] >= PSI_SHIFT:
+        return 'shift'
+    return 'stable'
+
+
+def drift_report(reference, current_counts):
+    """Per-feature drift of the running histograms (PredictionStore.drift_counts) against the reference"""
+    report = {}
+    for feature, spec in reference.features.items():
+        counts = current_counts.get(feature, np.zeros(reference.n_bins(feature)))
+        result = feature_drift(spec, counts)
+        result['status'] = drift_status(result)
+        report[feature] = result
+    return report
+
+
+def format_report(report):
+    lines = [f"{'feature':<28} | {'rows':>9} | {'PSI':>7} | {'KS':>6} | status"]
+    for feature, result in report.items():
+        psi_text = f"{result['psi']:7.3f}" if result['psi'] is not None else f"{'-':>7}"
+        ks_text = f"{result['ks']:6.3f}" if result['ks'] is not None else f"{'-':>6}"
+        lines.append(f"{feature:<28} | {result['rows']:>9,} | {psi_text} | {ks_text} | {result['status']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    from prediction_store import PREDICTIONS_DB, PredictionStore
+
+    parser = argparse.ArgumentParser(description="Input drift of the prediction log against the training data")
+    parser.add_argument('--reference', default=DRIFT_REFERENCE_FILE, help="Drift reference JSON")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help="Build the reference from the training dataset")
+    build_parser.add_argument('dataset', help="Training dataset CSV")
+    build_parser.add_argument('--all-rows', action='store_true',
+                              help="Use every row of the CSV, not only the train + val rows the model is fit on")
+    report_parser = subparsers.add_parser('report', help="Print PSI and KS per feature")
+    report_parser.add_argument('--db', default=PREDICTIONS_DB, help="Prediction database")
+    report_parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        from data_loader import load_dataset
+
+        rows = load_dataset(args.dataset)
+        if not args.all_rows:
+            # The same rows as the reference train_pipeline.py puts in its bundles
+            from training_data import clean_dataset, fit_rows, prepare_splits
+
+            rows = fit_rows(rows, prepare_splits(clean_dataset(rows)))
+        reference = DriftReference.from_frame(rows)
+        reference.save(args.reference)
+        print(f"Drift reference {reference.id} for {len(reference.features)} features written to {args.reference}")
+        return
+
+    reference = load_reference(args.reference)
+    if reference is None:
+        parser.error(f"{args.reference} not found; build it with: python drift_monitor.py build <dataset.csv>")
+    with PredictionStore(args.db, drift_reference=reference) as store:
+        start = time.perf_counter()
+        report = drift_report(reference, store.drift_counts())
+        elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+        print(f"Computed in {elapsed * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
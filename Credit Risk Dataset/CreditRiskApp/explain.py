@@ -0,0 +1,250 @@
+"""Per-application feature attributions for the gradient boosting model.
+
+Path-based tree contributions (Saabas): in every tree, each split on a
+row's path moves the node value from the parent to the child, and the
+change is credited to the feature the split tests. Summed over all trees
+this gives, per row, one contribution per input feature and a bias such
+that bias + sum(contributions) is exactly the model's log-odds. Columns
+the ColumnTransformer expands (one-hot categories) are credited back to
+their input feature.
+
+The explainer works on the heap layout of compiled_ensemble.py: the node
+value changes are precomputed per heap position, so explaining a row block
+takes the same level-by-level walk as scoring it, plus one add per level.
+With numba installed larger batches run through a parallel kernel. The
+explainer is built once per model version and kept in the fast-start
+cache next to the compiled model (see model_cache.py).
+
+Usage:
+    python explain.py applications.csv explained.csv
+    python explain.py scored.csv explained.parquet --chunksize 100000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import compiled_ensemble
+from compiled_ensemble import CompiledColumnTransformer, CompiledPipeline
+
+CONTRIBUTION_PREFIX = "contribution_"
+DEFAULT_BLOCK_ROWS = 2048
+
+# Bound to numba.prange when the kernel is compiled
+prange = range
+_kernel = None
+
+
+def _heap_tree_contributions(X, heap_feature, heap_threshold, heap_delta, column_group, depth, block, out):
+    """Path contributions per row and feature group; trees are walked level by level over a row block"""
+    n_rows = X.shape[0]
+    n_groups = out.shape[1]
+    n_blocks = (n_rows + block - 1) // block
+    for b in prange(n_blocks):
+        start = b * block
+        stop = min(start + block, n_rows)
+        pos = np.empty(stop - start, np.int64)
+        acc = np.zeros((stop - start, n_groups))
+        for t in range(heap_feature.shape[0]):
+            feature = heap_feature[t]
+            threshold = heap_threshold[t]
+            delta = heap_delta[t]
+            pos[:] = 0
+            for _ in range(depth):
+                for i in range(stop - start):
+                    p = pos[i]
+                    f = feature[p]
+                    child = 2 * p + 1 + (X[start + i, f] > threshold[p])
+                    acc[i, column_group[f]] += delta[child]
+                    pos[i] = child
+        out[start:stop] = acc
+
+
+def contribution_kernel():
+    """Return the numba-compiled contribution kernel, or None if numba is not installed"""
+    global _kernel, prange
+    if _kernel is None:
+        # The scoring kernel imports numba and sets the threading layer first
+        if compiled_ensemble.numba_kernel() is None:
+            _kernel = False
+        else:
+            import numba
+
+            prange = numba.prange
+            _kernel = numba.njit(parallel=True, nogil=True, cache=True)(_heap_tree_contributions)
+    return _kernel or None
+
+
+def column_features(column_transformer):
+    """Input feature of every output column of a compiled ColumnTransformer, in output order"""
+    features = []
+    for kind, columns, params in column_transformer.steps:
+        if kind == 'onehot':
+            categories, _ = params
+            for col, (index, drop) in zip(columns, categories):
+                features.extend([col] * (len(index) - (drop is not None)))
+        else:
+            features.extend(columns)
+    return features
+
+
+class TreeExplainer:
+    """Saabas contributions of the input features to the log-odds of a CompiledPipeline.
+
+    heap_delta[t, k] is the value of the node at heap position k of tree t
+    minus the value of its parent (zero below a leaf, which is repeated
+    down to the last level); bias is the baseline plus the root values.
+    """
+
+    def __init__(self, model):
+        if not isinstance(model, CompiledPipeline):
+            model = CompiledPipeline.from_pipeline(model)
+        transformers = [step for step in model.preprocessors if isinstance(step, CompiledColumnTransformer)]
+        if len(transformers) != 1:
+            raise TypeError("Only models with one compilable ColumnTransformer can be explained")
+        self.model = model
+        ensemble = model.ensemble
+
+        columns = column_features(transformers[0])
+        if len(columns) != ensemble.n_features:
+            raise ValueError(f"The preprocessor gives {len(columns)} columns, the trees expect {ensemble.n_features}")
+        self.features = list(dict.fromkeys(columns))
+        self.column_group = np.array([self.features.index(col) for col in columns], dtype=np.int64)
+
+        nodes = ensemble.heap_nodes
+        parents = nodes[:, (np.arange(1, nodes.shape[1]) - 1) // 2]
+        self.heap_delta = np.zeros(nodes.shape)
+        self.heap_delta[:, 1:] = ensemble.value[nodes[:, 1:]] - ensemble.value[parents]
+        self.bias = ensemble.baseline + float(ensemble.value[ensemble.roots].sum())
+
+    def contributions(self, X, block_rows=DEFAULT_BLOCK_ROWS):
+        """(n_rows, len(features)) contributions for preprocessed rows (the trees' input matrix)"""
+        ensemble = self.model.ensemble
+        X = ensemble._check_input(X)
+        out = np.zeros((len(X), len(self.features)))
+        kernel = contribution_kernel() if len(X) >= compiled_ensemble.KERNEL_MIN_ROWS else None
+        if kernel is not None:
+            with compiled_ensemble._kernel_lock:
+                kernel(X, ensemble.heap_feature, ensemble.heap_threshold, self.heap_delta, self.column_group,
+                       ensemble.max_depth, compiled_ensemble.KERNEL_BLOCK_ROWS, out)
+            return out
+
+        # NumPy path: all trees advance one level per step, in row blocks as in CompiledEnsemble.apply
+        n_internal = ensemble.heap_feature.shape[1]
+        n_positions = self.heap_delta.shape[1]
+        internal_offset = (np.arange(ensemble.n_trees) * n_internal)[None, :]
+        position_offset = (np.arange(ensemble.n_trees) * n_positions)[None, :]
+        heap_feature = ensemble.heap_feature.ravel()
+        heap_threshold = ensemble.heap_threshold.ravel()
+        heap_delta = self.heap_delta.ravel()
+        n_groups = len(self.features)
+        for start in range(0, len(X), block_rows):
+            block = X[start:start + block_rows]
+            values = block.ravel()
+            row_offset = (np.arange(len(block)) * ensemble.n_features)[:, None]
+            group_offset = (np.arange(len(block)) * n_groups)[:, None]
+            pos = np.zeros((len(block), ensemble.n_trees), dtype=np.int64)
+            acc = np.zeros(len(block) * n_groups)
+            for _ in range(ensemble.max_depth):
+                node = internal_offset + pos
+                feature = heap_feature[node]
+                pos = 2 * pos + 1 + (values[row_offset + feature] > heap_threshold[node])
+                acc += np.bincount((group_offset + self.column_group[feature]).ravel(),
+                                   weights=heap_delta[position_offset + pos].ravel(), minlength=len(acc))
+            out[start:start + len(block)] = acc.reshape(len(block), n_groups)
+        return out
+
+    def explain(self, X):
+        """Contributions for rows as FeatureTransform returns them, as a DataFrame with the input feature names"""
+        return pd.DataFrame(self.contributions(self.model.transform(X)), columns=self.features, index=X.index)
+
+
+def top_factors(contributions, n=5):
+    """The n largest contributions of one row by absolute value: [(feature, contribution)]"""
+    order = np.argsort(-np.abs(contributions.to_numpy()), kind='stable')[:n]
+    return [(contributions.index[i], float(contributions.iloc[i])) for i in order]
+
+
+def explain_chunk(scorer, chunk):
+    """Score one chunk and append the contribution of every input feature and the bias.
+
+    The chunk goes through the feature transform and the model's
+    preprocessing once; the compiled trees score and explain the same
+    matrix, so the probabilities are those the contributions add up to.
+    """
+    from scoring import score_chunk
+
+    X, valid = scorer.transform.transform(chunk)
+    explainer = scorer.explainer
+    proba = np.full(len(chunk), np.nan)
+    contributions = np.full((len(chunk), len(explainer.features)), np.nan)
+    if valid.any():
+        matrix = explainer.model.transform(X[valid])
+        proba[valid] = explainer.model.ensemble.predict_proba(matrix)[:, 1]
+        contributions[valid] = explainer.contributions(matrix)
+    scored, n_valid = score_chunk(scorer, chunk, (proba, valid))
+    for i, feature in enumerate(explainer.features):
+        scored[CONTRIBUTION_PREFIX + feature] = contributions[:, i]
+    scored[CONTRIBUTION_PREFIX + 'bias'] = np.where(valid, explainer.bias, np.nan)
+    return scored, n_valid
+
+
+def explain_file(input_path, output_path, scorer=None, chunksize=None, model_path="model.skops",
+                 lambdas_path="lambdas.pkl", progress=None):
+    """Stream input_path through the model and write scores plus contributions to output_path"""
+    from scoring import DEFAULT_CHUNKSIZE, CreditRiskScorer, ScoredFileWriter, iter_input_chunks
+
+    if scorer is None:
+        scorer = CreditRiskScorer.from_files(model_path, lambdas_path, compiled=True)
+    writer = ScoredFileWriter(output_path)
+    rows = 0
+    scored_rows = 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_input_chunks(input_path, chunksize or DEFAULT_CHUNKSIZE):
+            explained, n_valid = explain_chunk(scorer, chunk)
+            writer.write(explained)
+            rows += len(chunk)
+            scored_rows += n_valid
+            if progress is not None:
+                elapsed = time.perf_counter() - start
+                progress(rows, rows / elapsed if elapsed > 0 else 0.0)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'scored': scored_rows,
+        'invalid': rows - scored_rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    from scoring import DEFAULT_CHUNKSIZE, CreditRiskScorer
+
+    parser = argparse.ArgumentParser(description="Score applications and write the feature contributions of each")
+    parser.add_argument('input', help="CSV or Parquet file shaped like credit_risk_dataset.csv (scored or not)")
+    parser.add_argument('output', help="Output file (.csv or .parquet)")
+    parser.add_argument('--model', default="model.skops", help="Path to model.skops")
+    parser.add_argument('--lambdas', default="lambdas.pkl", help="Path to lambdas.pkl")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument('--quiet', action='store_true', help="Do not print per-chunk progress")
+    args = parser.parse_args(argv)
+
+    def report(rows, rate):
+        print(f"Explained {rows:,} rows ({rate:,.0f} rows/sec)", file=sys.stderr)
+
+    scorer = CreditRiskScorer.from_files(args.model, args.lambdas, compiled=True)
+    # A scored file is explained again from its input columns; the old score columns are replaced
+    summary = explain_file(args.input, args.output, scorer, args.chunksize, progress=None if args.quiet else report)
+    print(f"Done: {summary['rows']:,} rows ({summary['invalid']:,} invalid) in "
+          f"{summary['seconds']:.2f}s, {summary['rows_per_sec']:,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Precompiled training-time feature transform for the credit risk model.
+
+Replaces the per-value ``stats.boxcox`` loop with a single vectorized pass
+over a 2-D block of features. Used by the GUI, batch scoring and the
+training notebook.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+NUMERIC_FEATURES = ['person_age', 'person_income', 'person_emp_length', 'loan_amnt',
+                    'loan_int_rate', 'loan_percent_income', 'cb_person_cred_hist_length']
+CATEGORICAL_FEATURES = ['person_home_ownership', 'loan_intent', 'loan_grade']
+BINARY_FEATURE = 'cb_person_default_on_file'
+INPUT_FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES + [BINARY_FEATURE]
+
+LOG_FEATURE = 'person_income'
+RARE_GRADES = ['F', 'G']
+
+# Missing values filled before cleaning and scoring alike: no employment record means 0 years
+FILL_VALUES = {'person_emp_length': 0.0}
+
+# Values outside these bounds are treated as data errors and set to NaN
+CLEANING_RULES = {
+    'person_age': (0, 120),
+    'person_income': (0, 1e20),
+    'person_emp_length': (0, 100),
+    'loan_amnt': (0, 1e10),
+    'loan_int_rate': (0, 100),
+    'loan_percent_income': (0, 200),
+    'cb_person_cred_hist_length': (0, 100),
+}
+
+
+def accepted_values(col, categories):
+    """Raw values of col that map onto the given model categories (rare grades map to 'Other')"""
+    values = set(categories)
+    if col == 'loan_grade' and 'Other' in values:
+        values.update(RARE_GRADES)
+    return values
+
+
+class FeatureTransform:
+    """Log income + Box-Cox + loan grade mapping built from lambdas.pkl.
+
+    With categories ({column: known categories}, see scoring.known_categories)
+    rows whose value the model's encoders have never seen are invalid, like
+    rows with a missing value, instead of failing the whole batch in the model.
+    """
+
+    def __init__(self, lambdas, impute_features=(), categories=None):
+        unknown = [col for col in impute_features if col not in lambdas]
+        if unknown:
+            raise ValueError(f"Only Box-Cox features can be left for imputation, got {', '.join(unknown)}")
+        self._lambdas_map = lambdas
+        self.impute_features = list(impute_features)
+        self.categories = {col: list(values) for col, values in (categories or {}).items()}
+        self._accepted = {col: pd.Index(sorted(accepted_values(col, values)), dtype=object)
+                          for col, values in self.categories.items()}
+        self.boxcox_features = list(lambdas.keys())
+        self.lambdas = np.array([float(lambda_) for lambda_, _ in lambdas.values()])
+        self.shifts = np.array([float(shift) for _, shift in lambdas.values()])
+
+        # lambda == 0 is the log limit of Box-Cox; divide by 1 there and pick log below
+        self._log_limit = self.lambdas == 0
+        self._divisors = np.where(self._log_limit, 1.0, self.lambdas)
+
+        self._boxcox_idx = np.array([NUMERIC_FEATURES.index(col) for col in self.boxcox_features
+                                     if col in NUMERIC_FEATURES], dtype=np.intp)
+        self._log_idx = NUMERIC_FEATURES.index(LOG_FEATURE)
+        self._fill_idx = np.array([NUMERIC_FEATURES.index(col) for col in FILL_VALUES], dtype=np.intp)
+        self._fill_values = np.array(list(FILL_VALUES.values()))
+        self._allow_missing = np.array([col in self.impute_features for col in self.boxcox_features])
+
+    @classmethod
+    def from_file(cls, lambdas_path="lambdas.pkl"):
+        """Build the transform from a lambdas.pkl file"""
+        import joblib
+
+        if not os.path.exists(lambdas_path):
+            raise FileNotFoundError(f"{lambdas_path} not found")
+        return cls(joblib.load(lambdas_path))
+
+    @property
+    def optional_features(self):
+        """Inputs that may be missing: imputed by the model or filled from FILL_VALUES"""
+        return self.impute_features + [col for col in FILL_VALUES if col not in self.impute_features]
+
+    def with_imputation(self, impute_features):
+        """Same transform, but missing values in impute_features are kept for the model to fill"""
+        if list(impute_features) == self.impute_features:
+            return self
+        return FeatureTransform(self._lambdas_map, impute_features, self.categories)
+
+    def with_categories(self, categories):
+        """Same transform, but values outside categories[col] make a row invalid"""
+        if {col: list(values) for col, values in categories.items()} == self.categories:
+            return self
+        return FeatureTransform(self._lambdas_map, self.impute_features, categories)
+
+    def boxcox_block(self, block, allow_missing=None):
+        """Box-Cox transform a (n_rows, len(boxcox_features)) block in one pass.
+
+        Returns the transformed block and a row mask that is False where any
+        shifted value is non-positive or missing. Those rows get finite
+        placeholder values so the rest of the block is unaffected. Missing
+        values in the columns flagged by allow_missing stay NaN and do not
+        make their row invalid.
+        """
+        shifted = block + self.shifts
+        positive = shifted > 0
+        missing = None
+        if allow_missing is not None and allow_missing.any():
+            missing = np.isnan(shifted) & allow_missing
+            valid = (positive | missing).all(axis=1)
+        else:
+            valid = positive.all(axis=1)
+        log_x = np.log(np.where(positive, shifted, 1.0))
+        out = np.expm1(self.lambdas * log_x) / self._divisors
+        if self._log_limit.any():
+            out = np.where(self._log_limit, log_x, out)
+        if missing is not None:
+            out[missing] = np.nan
+        return out, valid
+
+    def transform_numeric(self, block):
+        """Transform a (n_rows, len(NUMERIC_FEATURES)) block, returning (block, valid)"""
+        block = np.asarray(block, dtype=float)
+        fill = block[:, self._fill_idx]
+        if np.isnan(fill).any():
+            block = block.copy()
+            block[:, self._fill_idx] = np.where(np.isnan(fill), self._fill_values, fill)
+        out = block.copy()
+        income = block[:, self._log_idx]
+        out[:, self._log_idx] = np.log(np.where(income > 0, income, 1.0) + 1e-10)
+        out[:, self._boxcox_idx], valid = self.boxcox_block(block[:, self._boxcox_idx], self._allow_missing)
+        valid &= income > 0
+        return out, valid
+
+    def transform(self, df, strict=False):
+        """Transform raw applications into the frame the model pipeline expects.
+
+        Returns the transformed DataFrame and a boolean mask of valid rows.
+        With strict=True a ValueError is raised if any row is invalid.
+        """
+        missing = [col for col in INPUT_FEATURES if col not in df.columns]
+        if missing:
+            raise ValueError(f"Input is missing required columns: {', '.join(missing)}")
+
+        # Column-wise to_numpy is much cheaper than df[list] for small batches
+        numeric, valid = self.transform_numeric(
+            np.column_stack([df[col].to_numpy(dtype=float) for col in NUMERIC_FEATURES]))
+        categorical = {col: df[col].to_numpy(dtype=object) for col in CATEGORICAL_FEATURES}
+        for col, values in categorical.items():
+            valid &= ~pd.isna(values)
+            if col in self._accepted:
+                valid &= self._accepted[col].get_indexer(values) >= 0
+        grade = categorical['loan_grade']
+        categorical['loan_grade'] = np.where(np.isin(grade, RARE_GRADES), 'Other', grade)
+
+        # Previous default is stored as Y/N in the raw dataset
+        binary = df[BINARY_FEATURE]
+        if pd.api.types.is_numeric_dtype(binary):
+            binary = binary.to_numpy(dtype=float)
+        else:
+            flags = binary.to_numpy(dtype=object)
+            binary = np.where(flags == 'Y', 1.0, np.where(flags == 'N', 0.0, np.nan))
+        valid &= ~np.isnan(binary)
+
+        if strict and not valid.all():
+            raise ValueError(self._describe_invalid(df))
+
+        columns = {col: numeric[:, i] for i, col in enumerate(NUMERIC_FEATURES)}
+        columns.update(categorical)
+        columns[BINARY_FEATURE] = binary
+        return pd.DataFrame(columns, index=df.index), valid
+
+    def transform_boxcox(self, df):
+        """Return a copy of df with only the Box-Cox columns transformed; missing values stay NaN"""
+        transformed, _ = self.boxcox_block(df[self.boxcox_features].to_numpy(dtype=float),
+                                           np.ones(len(self.boxcox_features), dtype=bool))
+        out = df.copy()
+        out[self.boxcox_features] = transformed
+        return out
+
+    def _describe_invalid(self, df):
+        """Build an error message naming the first value that cannot be transformed"""
+        for col in INPUT_FEATURES:
+            if col not in self.impute_features and col not in FILL_VALUES and df[col].isna().any():
+                return f"Missing value for {col}"
+        for col, accepted in self._accepted.items():
+            unknown = df[col][accepted.get_indexer(df[col].to_numpy(dtype=object)) < 0]
+            if len(unknown):
+                return f"Unknown value for {col}: {unknown.iloc[0]!r}"
+        if (df[LOG_FEATURE] <= 0).any():
+            return "Income must be positive"
+        shifted = df[self.boxcox_features].to_numpy(dtype=float) + self.shifts
+        rows, cols = np.nonzero(shifted <= 0)
+        col = self.boxcox_features[cols[0]]
+        return f"Value for {col} after shift is non-positive: {shifted[rows[0], cols[0]]}"
+
+
+def group_codes(groups, values):
+    """Row index into groups for each value, -1 for unknown or missing groups"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Look up the few categories once instead of every row
+        lookup = np.append(groups.get_indexer(values.cat.categories.astype(str)), -1)
+        return lookup[values.cat.codes.to_numpy()]
+    return groups.get_indexer(values)
+
+
+def fill_group_medians(X, group_col, columns, groups, table):
+    """Fill NaNs in columns from table[group row], where the last table row holds the fallback medians"""
+    X = X.copy(deep=False)
+    codes = None
+    for i, col in enumerate(columns):
+        values = X[col].to_numpy(dtype=float)
+        missing = np.isnan(values)
+        if not missing.any():
+            continue
+        if codes is None:
+            codes = group_codes(groups, X[group_col])
+        values = values.copy()
+        # Code -1 (unknown group) picks the last row
+        values[missing] = table[codes[missing], i]
+        X[col] = values
+    return X
@@ -0,0 +1,11 @@
+"""Content hashes of files, shared by the model, dataset and training caches"""
+import hashlib
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,61 @@
+"""Grouped median imputation as a fitted sklearn transformer.
+
+The notebook filled missing loan_int_rate values with
+groupby('loan_grade').transform(lambda x: x.fillna(x.median())), run
+separately on train, validation and test, so each split was filled with
+its own medians. GroupMedianImputer learns the per-group medians once from
+the training data with a single groupby().median() and fills new rows
+with one indexed lookup into the median table. As the first step of the
+model Pipeline it is saved in model.skops, and the GUI and batch scoring
+can accept applications with a missing interest rate.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+
+from feature_transform import fill_group_medians
+
+
+class GroupMedianImputer(TransformerMixin, BaseEstimator):
+    """Fill missing values in `columns` with the training median of their `group_col` group.
+
+    Rows whose group was not seen during fit, or whose group had no
+    observed values, get the overall training median of the column.
+    Works on DataFrames and returns a DataFrame with the same columns.
+    """
+
+    def __init__(self, group_col='loan_grade', columns=('loan_int_rate',)):
+        self.group_col = group_col
+        self.columns = columns
+
+    @property
+    def imputed_features(self):
+        return list(self.columns)
+
+    def fit(self, X, y=None):
+        if not isinstance(X, pd.DataFrame):
+            raise TypeError("GroupMedianImputer expects a DataFrame")
+        columns = list(self.columns)
+        medians = X.groupby(X[self.group_col], observed=True, sort=True)[columns].median()
+        overall = X[columns].median().to_numpy(dtype=float)
+        table = medians.to_numpy(dtype=float)
+
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = X.shape[1]
+        self.groups_ = [str(group) for group in medians.index]
+        self.overall_medians_ = overall
+        self.medians_ = np.where(np.isnan(table), overall, table)
+        return self
+
+    def transform(self, X):
+        check_is_fitted(self, 'medians_')
+        if not isinstance(X, pd.DataFrame):
+            raise TypeError("GroupMedianImputer expects a DataFrame")
+        return fill_group_medians(X, self.group_col, self.columns, pd.Index(self.groups_),
+                                  np.vstack([self.medians_, self.overall_medians_]))
+
+    def get_feature_names_out(self, input_features=None):
+        check_is_fitted(self, 'feature_names_in_')
+        return self.feature_names_in_.copy()
+
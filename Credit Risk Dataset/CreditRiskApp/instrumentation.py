@@ -0,0 +1,305 @@
+"""Per-stage timers, counters and an optional sampling profiler for the scoring path.
+
+The scoring code marks its stages with
+
+    with stage('transform'):
+        ...
+
+and counts events with count('result_cache.hit'). While instrumentation
+is disabled (the default) stage() returns one shared no-op context
+manager and count() returns at once: a hook costs well under a
+microsecond against milliseconds per request and stays in the code. Enabled, every stage keeps
+its call count, total time and a rolling window of its last durations for
+p50/p90/p99.
+
+Enable it with configure() or from the environment (configure_from_env,
+called by the GUI, scoring.py and scoring_server.py):
+
+    CREDIT_RISK_METRICS=metrics.json   record and write the snapshot there every
+                                       CREDIT_RISK_METRICS_INTERVAL seconds (default 60) and at exit
+    CREDIT_RISK_PROFILE=profile.txt    also sample all thread stacks every 5 ms and write
+                                       them in collapsed-stack format (flamegraph.pl, speedscope) at exit
+
+The scoring service adds the snapshot to GET /metrics.
+
+Usage:
+    python instrumentation.py metrics.json
+"""
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+import numpy as np
+
+STAGE_WINDOW = 10000
+DEFAULT_EXPORT_INTERVAL = 60.0
+DEFAULT_SAMPLE_INTERVAL = 0.005
+METRICS_ENV = "CREDIT_RISK_METRICS"
+METRICS_INTERVAL_ENV = "CREDIT_RISK_METRICS_INTERVAL"
+PROFILE_ENV = "CREDIT_RISK_PROFILE"
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageRecorder:
+    """Thread-safe call counts, total time and recent durations per stage, plus event counters"""
+
+    def __init__(self, window=STAGE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = Counter()
+        self.started = time.time()
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = {'count': 0, 'total': 0.0, 'recent': deque(maxlen=self.window)}
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['recent'].append(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """Per-stage count, total and mean plus percentiles of the recent window, in milliseconds"""
+        with self._lock:
+            stages = {name: (stats['count'], stats['total'], np.array(stats['recent']) * 1e3)
+                      for name, stats in self._stages.items()}
+            counters = dict(self._counters)
+        result = {}
+        for name, (count, total, recent) in sorted(stages.items()):
+            p50, p90, p99 = np.percentile(recent, [50, 90, 99])
+            result[name] = {'count': count, 'total_ms': total * 1e3, 'mean_ms': total * 1e3 / count,
+                            'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': recent.max(),
+                            'window': len(recent)}
+        return {
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'since': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'stages': result,
+            'counters': counters,
+        }
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads every interval seconds from a daemon thread.
+
+    Stacks are aggregated as 'module:function;...;module:function' -> samples,
+    the collapsed format flamegraph.pl and speedscope read. Threads whose
+    ident is in ignore (the metrics exporter) are not sampled.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.ignore = set()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or thread_id in self.ignore:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = os.path.basename(code.co_filename)
+                    names.append(f"{module[:-3] if module.endswith('.py') else module}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+
+
+_recorder = StageRecorder()
+_enabled = False
+_profiler = None
+_exporter = None
+_metrics_path = None
+_profile_path = None
+_shutdown_registered = False
+
+
+def stage(name):
+    """Context manager timing one stage; a shared no-op while instrumentation is disabled"""
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(_recorder, name)
+
+
+def count(name, n=1):
+    """Add n to an event counter while instrumentation is enabled"""
+    if _enabled:
+        _recorder.count(name, n)
+
+
+def enabled():
+    return _enabled
+
+
+def snapshot():
+    return _recorder.snapshot()
+
+
+def export(path=None):
+    """Write the current snapshot as JSON (atomically) to path or the configured metrics file"""
+    path = path or _metrics_path
+    if path is None:
+        return None
+    data = snapshot()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _export_loop(stop, interval):
+    while not stop.wait(interval):
+        try:
+            export()
+        except OSError:
+            # An unwritable metrics file must not take the scoring path down
+            pass
+
+
+def _shutdown():
+    if _exporter is not None:
+        _exporter[0].set()
+    if _metrics_path is not None:
+        try:
+            export()
+        except OSError:
+            pass
+    if _profiler is not None and _profile_path is not None:
+        _profiler.stop()
+        _profiler.write_collapsed(_profile_path)
+
+
+def configure(enable=True, metrics_path=None, export_interval=DEFAULT_EXPORT_INTERVAL, profile_path=None,
+              sample_interval=DEFAULT_SAMPLE_INTERVAL):
+    """Turn recording on or off; optionally export to metrics_path periodically and profile to profile_path"""
+    global _enabled, _profiler, _exporter, _metrics_path, _profile_path, _shutdown_registered
+    _enabled = enable
+    if not enable:
+        return
+    _metrics_path = metrics_path
+    if metrics_path is not None and _exporter is None:
+        stop = threading.Event()
+        thread = threading.Thread(target=_export_loop, args=(stop, export_interval), name="metrics-export",
+                                  daemon=True)
+        thread.start()
+        _exporter = (stop, thread)
+    if profile_path is not None and _profiler is None:
+        _profiler = SamplingProfiler(sample_interval)
+        if _exporter is not None:
+            _profiler.ignore.add(_exporter[1].ident)
+        _profiler.start()
+    if profile_path is not None:
+        _profile_path = profile_path
+    if (metrics_path is not None or profile_path is not None) and not _shutdown_registered:
+        # Once per process: a second configure() must not export and write the profile twice at exit
+        atexit.register(_shutdown)
+        _shutdown_registered = True
+
+
+def configure_from_env(environ=None):
+    """Enable instrumentation if CREDIT_RISK_METRICS or CREDIT_RISK_PROFILE is set"""
+    environ = os.environ if environ is None else environ
+    metrics_path = environ.get(METRICS_ENV) or None
+    profile_path = environ.get(PROFILE_ENV) or None
+    if metrics_path is None and profile_path is None:
+        return False
+    interval = float(environ.get(METRICS_INTERVAL_ENV) or DEFAULT_EXPORT_INTERVAL)
+    configure(True, metrics_path, interval, profile_path)
+    return True
+
+
+def format_snapshot(data):
+    lines = [f"{'stage':<32} | {'calls':>9} | {'total s':>8} | {'mean ms':>8} | {'p50 ms':>8} | "
+             f"{'p99 ms':>8} | {'max ms':>8}"]
+    for name, stats in data['stages'].items():
+        lines.append(f"{name:<32} | {stats['count']:>9,} | {stats['total_ms'] / 1e3:>8.2f} | "
+                     f"{stats['mean_ms']:>8.3f} | {stats['p50_ms']:>8.3f} | {stats['p99_ms']:>8.3f} | "
+                     f"{stats['max_ms']:>8.3f}")
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f"{name:<32} | {value:>9,}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a stage metrics file written by the instrumentation")
+    parser.add_argument('metrics', help="Metrics JSON (CREDIT_RISK_METRICS)")
+    args = parser.parse_args(argv)
+
+    with open(args.metrics, 'r') as f:
+        data = json.load(f)
+    print(f"pid {data['pid']}, {data['since']} to {data['generated']}")
+    print(format_snapshot(data))
+
+
+if __name__ == "__main__":
+    main()
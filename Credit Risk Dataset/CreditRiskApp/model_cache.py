@@ -0,0 +1,159 @@
+"""Fast-start cache for the credit risk model.
+
+Loading model.skops means importing skops, sklearn and scipy, checking the
+untrusted types and rebuilding the whole pipeline on every launch. The first
+launch does that once, compiles the pipeline (see compiled_ensemble.py),
+checks the compiled pipeline against sklearn on rows of the training dataset
+and pickles the result together with the Box-Cox lambdas and the model's
+TreeExplainer (see explain.py). Later launches only unpickle NumPy arrays
+(and any preprocessing step that could not be compiled, as an sklearn object).
+
+The cache file name is the SHA-256 of model.skops + lambdas.pkl and the
+NumPy, pandas and scikit-learn versions, so replacing either file or
+upgrading a library automatically triggers a rebuild. Cache files are pickles: keep
+the cache directory writable only by the operator account.
+
+Usage:
+    python model_cache.py [--model model.skops] [--lambdas lambdas.pkl]
+"""
+import argparse
+import glob
+import hashlib
+import os
+import pickle
+import time
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+from compiled_ensemble import CompiledPipeline
+from explain import TreeExplainer
+from file_digest import file_digest
+
+CACHE_DIR_NAME = ".model_cache"
+CACHE_FORMAT = 3
+# Dataset rows the compiled pipeline is checked on before the cache is written
+VERIFY_ROWS = 2000
+
+
+def cache_key(model_path, lambdas_path):
+    """Key for the cache artifact: model and lambdas contents plus library versions"""
+    # The installed version, read without importing sklearn on the fast path
+    parts = [str(CACHE_FORMAT), file_digest(model_path), file_digest(lambdas_path),
+             np.__version__, pd.__version__, metadata.version('scikit-learn')]
+    return hashlib.sha256(':'.join(parts).encode()).hexdigest()
+
+
+def default_cache_dir(model_path):
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), CACHE_DIR_NAME)
+
+
+def _check_files(model_path, lambdas_path):
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"{model_path} not found")
+    if not os.path.exists(lambdas_path):
+        raise FileNotFoundError(f"{lambdas_path} not found")
+
+
+def build_cache(model_path="model.skops", lambdas_path="lambdas.pkl", cache_dir=None, key=None):
+    """Convert model.skops + lambdas.pkl into a verified cache artifact and return it"""
+    import joblib
+    import skops.io as sio
+
+    _check_files(model_path, lambdas_path)
+    if cache_dir is None:
+        cache_dir = default_cache_dir(model_path)
+    if key is None:
+        key = cache_key(model_path, lambdas_path)
+
+    unknown_types = sio.get_untrusted_types(file=model_path)
+    pipeline = sio.load(model_path, trusted=unknown_types)
+    lambdas = {col: (float(lambda_), float(shift)) for col, (lambda_, shift) in joblib.load(lambdas_path).items()}
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+    verify_compiled(pipeline, compiled, verification_rows(pipeline, lambdas))
+    try:
+        explainer = TreeExplainer(compiled)
+    except TypeError:
+        # A preprocessor that cannot be compiled; explanations are unavailable for this model
+        explainer = None
+
+    artifact = {'key': key, 'model': compiled, 'lambdas': lambdas, 'explainer': explainer}
+
+    # Write atomically and drop artifacts of previous model versions
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"model-{key}.pkl")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    for old_path in glob.glob(os.path.join(cache_dir, "model-*.pkl")):
+        if old_path != path:
+            os.remove(old_path)
+    return artifact
+
+
+def verification_rows(pipeline, lambdas, dataset_path=None, n_rows=VERIFY_ROWS):
+    """First n_rows applications of the training dataset as the pipeline takes them, or None without it"""
+    from feature_transform import FeatureTransform
+    from training_data import DATASET_PATH
+
+    dataset_path = dataset_path or DATASET_PATH
+    if not os.path.exists(dataset_path):
+        return None
+    imputed = [col for _, step in pipeline.steps[:-1] for col in getattr(step, 'imputed_features', [])]
+    X, valid = FeatureTransform(lambdas).with_imputation(imputed).transform(pd.read_csv(dataset_path, nrows=n_rows))
+    return X[valid]
+
+
+def verify_compiled(pipeline, compiled, X=None, n_probe=512, seed=0):
+    """Check that the compiled model reproduces sklearn's probabilities.
+
+    The trees are probed with random matrices, which reach splits real
+    rows rarely do; with X (transformed applications, see
+    verification_rows) the whole compiled pipeline, preprocessing
+    included, is checked against pipeline.predict_proba as well.
+    """
+    classifier = pipeline[-1]
+    rng = np.random.default_rng(seed)
+    probe = rng.normal(scale=3.0, size=(n_probe, classifier.n_features_in_))
+    if not np.allclose(classifier.predict_proba(probe), compiled.ensemble.predict_proba(probe), rtol=0, atol=1e-9):
+        raise ValueError("Compiled trees do not reproduce the sklearn predictions")
+    if X is not None and len(X):
+        if not np.allclose(pipeline.predict_proba(X), compiled.predict_proba(X), rtol=0, atol=1e-9):
+            raise ValueError("Compiled pipeline does not reproduce the sklearn predictions")
+
+
+def load_model_artifacts(model_path="model.skops", lambdas_path="lambdas.pkl", cache_dir=None):
+    """Return {'key', 'model', 'lambdas', 'explainer'}, building the cache on the first launch"""
+    _check_files(model_path, lambdas_path)
+    if cache_dir is None:
+        cache_dir = default_cache_dir(model_path)
+    key = cache_key(model_path, lambdas_path)
+    path = os.path.join(cache_dir, f"model-{key}.pkl")
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                artifact = pickle.load(f)
+            if artifact.get('key') == key:
+                return artifact
+        except Exception:
+            # A truncated or incompatible artifact is rebuilt below
+            pass
+    return build_cache(model_path, lambdas_path, cache_dir, key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the fast-start cache for the credit risk model")
+    parser.add_argument('--model', default="model.skops", help="Path to model.skops")
+    parser.add_argument('--lambdas', default="lambdas.pkl", help="Path to lambdas.pkl")
+    parser.add_argument('--cache-dir', default=None, help=f"Cache directory (default: {CACHE_DIR_NAME} next to the model)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    artifact = build_cache(args.model, args.lambdas, args.cache_dir)
+    print(f"Built and verified cache {artifact['key'][:16]} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Append-only prediction log for the credit risk GUI.
+
+Replaces loan_predictions.csv with a SQLite database in WAL mode. The row
+count is kept in a meta table and updated in the same transaction as every
+insert, so counting predictions costs the same with ten rows or ten
+million. Appends can be buffered and written in one transaction, and the
+``sync`` setting chooses between an fsync on every commit ('full'), fsync
+at WAL checkpoints only ('normal', survives an application crash) and no
+fsync at all ('off'). Several processes may write to the same file: writes
+take SQLite's write lock with BEGIN IMMEDIATE and wait up to ``timeout``
+seconds for it.
+
+With a drift reference (drift_monitor.py) the store also keeps running
+histograms of the logged inputs: every write transaction adds the bin
+counts of the rows not counted yet (tracked by row id in the meta table)
+to the drift_counts table.
+
+Usage:
+    python prediction_store.py import loan_predictions.csv
+    python prediction_store.py count
+
+Exports (CSV, Parquet, PDF) are done by report_export.py.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from feature_transform import BINARY_FEATURE, INPUT_FEATURES, NUMERIC_FEATURES
+
+PREDICTIONS_DB = "loan_predictions.db"
+LEGACY_CSV = "loan_predictions.csv"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_CHUNKSIZE = 50000
+
+# Same column order as the CSV the GUI used to write
+PREDICTION_COLUMNS = INPUT_FEATURES + ['predicted_loan_status', 'default_probability',
+                                       'prediction_timestamp', 'risk_level']
+COLUMN_TYPES = dict({col: 'REAL' for col in NUMERIC_FEATURES},
+                    person_home_ownership='TEXT', loan_intent='TEXT', loan_grade='TEXT',
+                    cb_person_default_on_file='INTEGER', predicted_loan_status='INTEGER',
+                    default_probability='REAL', prediction_timestamp='TEXT', risk_level='TEXT')
+SYNC_MODES = {'full': 'FULL', 'normal': 'NORMAL', 'off': 'OFF'}
+
+_INSERT_SQL = (f"INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(PREDICTION_COLUMNS))})")
+_ADD_DRIFT_COUNT_SQL = ("INSERT INTO drift_counts VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (reference, feature, bin) DO UPDATE SET count = count + excluded.count")
+
+
+def make_record(application, prediction, proba, timestamp=None):
+    """Build a log record from one raw application and its prediction"""
+    record = {col: application[col] for col in INPUT_FEATURES}
+    # Raw dataset rows store previous default as Y/N, the GUI as 1/0
+    if record[BINARY_FEATURE] in ('Y', 'N'):
+        record[BINARY_FEATURE] = int(record[BINARY_FEATURE] == 'Y')
+    record['predicted_loan_status'] = int(prediction)
+    record['default_probability'] = float(proba)
+    record['prediction_timestamp'] = (timestamp or datetime.now()).strftime(TIMESTAMP_FORMAT)
+    record['risk_level'] = "High Risk" if prediction == 1 else "Low Risk"
+    return record
+
+
+class PredictionStore:
+    """SQLite-backed prediction log with a maintained row count.
+
+    Records are buffered until batch_size of them are pending or
+    flush_interval seconds have passed since the oldest one, then written
+    in one transaction. batch_size=1 writes every record immediately.
+    append_many() only sees the interval when the next record arrives, so
+    a writer that can go quiet calls flush_if_due() from a timer (the GUI
+    does it on its root.after loop).
+
+    drift_reference (a drift_monitor.DriftReference) enables the running
+    input histograms; rows logged without it (before it existed, or by a
+    store opened without it) are counted when the store is opened.
+    """
+
+    def __init__(self, path=PREDICTIONS_DB, batch_size=1, flush_interval=1.0, sync='normal', timeout=30.0,
+                 drift_reference=None):
+        if sync not in SYNC_MODES:
+            raise ValueError(f"sync must be one of {', '.join(SYNC_MODES)}, got {sync!r}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.drift_reference = drift_reference
+        self._buffer = []
+        self._buffer_since = None
+        self._lock = threading.RLock()
+
+        # Autocommit mode: transactions are opened explicitly in _write
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={SYNC_MODES[sync]}")
+        self._create_schema()
+        if drift_reference is not None:
+            with self._transaction() as conn:
+                self._count_new_rows(conn)
+
+    def _create_schema(self):
+        columns = ', '.join(f"{col} {COLUMN_TYPES[col]}" for col in PREDICTION_COLUMNS)
+        with self._transaction() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS predictions (id INTEGER PRIMARY KEY, {columns})")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('row_count', 0)")
+            conn.execute("CREATE TABLE IF NOT EXISTS drift_counts "
+                         "(reference TEXT, feature TEXT, bin INTEGER, count INTEGER, "
+                         "PRIMARY KEY (reference, feature, bin))")
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def append(self, record):
+        """Log one prediction record (see make_record)"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Log several prediction records; they are written once the buffer is full"""
+        with self._lock:
+            if not self._buffer:
+                self._buffer_since = time.monotonic()
+            self._buffer.extend(tuple(record[col] for col in PREDICTION_COLUMNS) for record in records)
+            if len(self._buffer) >= self.batch_size or self._flush_due():
+                self.flush()
+
+    def _flush_due(self):
+        return bool(self._buffer) and time.monotonic() - self._buffer_since >= self.flush_interval
+
+    def flush_if_due(self):
+        """Write the buffer if its oldest record has waited flush_interval seconds; returns True if it did"""
+        with self._lock:
+            if not self._flush_due():
+                return False
+            self.flush()
+            return True
+
+    def flush(self):
+        """Write all buffered records in a single transaction"""
+        with self._lock:
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            self._write(rows)
+
+    def _write(self, rows):
+        with self._transaction() as conn:
+            conn.executemany(_INSERT_SQL, rows)
+            conn.execute("UPDATE meta SET value = value + ? WHERE key = 'row_count'", (len(rows),))
+            self._count_new_rows(conn)
+
+    def _count_new_rows(self, conn):
+        """Add the rows logged since the last count to the drift histograms (inside a transaction)"""
+        if self.drift_reference is None:
+            return
+        reference_id = self.drift_reference.id
+        marker = f"drift:{reference_id}"
+        conn.execute("INSERT OR IGNORE INTO meta VALUES (?, 0)", (marker,))
+        last_id = conn.execute("SELECT value FROM meta WHERE key = ?", (marker,)).fetchone()[0]
+        cursor = conn.execute(f"SELECT id, {', '.join(PREDICTION_COLUMNS)} FROM predictions "
+                              f"WHERE id > ? ORDER BY id", (last_id,))
+        while True:
+            rows = cursor.fetchmany(DEFAULT_CHUNKSIZE)
+            if not rows:
+                break
+            ids, *values = zip(*rows)
+            counts = self.drift_reference.count(dict(zip(PREDICTION_COLUMNS, values)))
+            conn.executemany(_ADD_DRIFT_COUNT_SQL, [
+                (reference_id, feature, int(index), int(feature_counts[index]))
+                for feature, feature_counts in counts.items() for index in np.flatnonzero(feature_counts)
+            ])
+            last_id = ids[-1]
+        conn.execute("UPDATE meta SET value = ? WHERE key = ?", (last_id, marker))
+
+    def drift_counts(self):
+        """Running histogram of every monitored feature (bin counts as arrays) for the drift reference"""
+        self.flush()
+        # Rows appended by other processes without a reference are counted first
+        with self._transaction() as conn:
+            self._count_new_rows(conn)
+        counts = {feature: np.zeros(self.drift_reference.n_bins(feature), dtype=np.int64)
+                  for feature in self.drift_reference.features}
+        with self._lock:
+            rows = self._conn.execute("SELECT feature, bin, count FROM drift_counts WHERE reference = ?",
+                                      (self.drift_reference.id,)).fetchall()
+        for feature, index, count in rows:
+            if feature in counts:
+                counts[feature][index] = count
+        return counts
+
+    def count(self):
+        """Number of logged predictions, including buffered ones"""
+        with self._lock:
+            return int(self._get_meta('row_count')) + len(self._buffer)
+
+    def count_matching(self, where=None, params=()):
+        """Number of logged predictions matching an SQL WHERE clause"""
+        if where is None:
+            return self.count()
+        self.flush()
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM predictions WHERE {where}", params).fetchone()[0]
+
+    def iter_chunks(self, chunksize=DEFAULT_CHUNKSIZE, where=None, params=()):
+        """Yield the log in insertion order as DataFrames of at most chunksize rows.
+
+        where/params optionally restrict the rows with an SQL WHERE clause,
+        evaluated by SQLite while the log is streamed.
+        """
+        self.flush()
+        query = f"SELECT {', '.join(PREDICTION_COLUMNS)} FROM predictions"
+        if where is not None:
+            query += f" WHERE {where}"
+        query += " ORDER BY id"
+        # A separate connection reads a consistent WAL snapshot while the GUI keeps appending
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            yield from pd.read_sql_query(query, conn, params=params, chunksize=chunksize)
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Delete every logged prediction"""
+        with self._lock:
+            self._buffer = []
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM predictions")
+                conn.execute("DELETE FROM drift_counts")
+                # Row ids start over after the delete
+                conn.execute("UPDATE meta SET value = 0 WHERE key = 'row_count' OR key LIKE 'drift:%'")
+
+    def import_legacy_csv(self, csv_path=LEGACY_CSV, chunksize=DEFAULT_CHUNKSIZE):
+        """Import the old loan_predictions.csv once; returns the number of imported rows.
+
+        The import is recorded in the meta table, so later calls are no-ops
+        and the CSV file itself is left untouched.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        marker = f"imported:{os.path.abspath(csv_path)}"
+        with self._lock:
+            if self._get_meta(marker) is not None:
+                return 0
+            self.flush()
+            rows = 0
+            with self._transaction() as conn:
+                for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+                    chunk = chunk.reindex(columns=PREDICTION_COLUMNS).astype(object)
+                    values = chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+                    conn.executemany(_INSERT_SQL, values)
+                    rows += len(chunk)
+                conn.execute("UPDATE meta SET value = value + ? WHERE key = 'row_count'", (rows,))
+                conn.execute("INSERT INTO meta VALUES (?, ?)", (marker, rows))
+                self._count_new_rows(conn)
+            return rows
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK under the store's lock"""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self.lock.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the credit risk prediction log")
+    parser.add_argument('--db', default=PREDICTIONS_DB, help="Prediction database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Import a legacy loan_predictions.csv")
+    import_parser.add_argument('csv', nargs='?', default=LEGACY_CSV)
+    subparsers.add_parser('count', help="Print the number of logged predictions")
+    args = parser.parse_args(argv)
+
+    with PredictionStore(args.db) as store:
+        if args.command == 'import':
+            print(f"Imported {store.import_legacy_csv(args.csv):,} rows from {args.csv}")
+        else:
+            print(f"{store.count():,}")
+
+
+if __name__ == "__main__":
+    main()
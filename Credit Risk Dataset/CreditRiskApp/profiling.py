@@ -0,0 +1,406 @@
+"""Single-pass data quality profile of credit risk data.
+
+The notebook's detect_outliers_iqr, nunique/isnull summaries and
+classify_numeric_type each rescan the data column by column with their own
+quantile() calls. DatasetProfiler instead consumes the data chunk by chunk
+and updates every statistic from the same chunk: missing and unparseable
+counts, min/max/mean, a mergeable KLL-style quantile sketch per numeric
+column (quantiles, IQR bounds and estimated outlier share without keeping
+the values), bounded distinct counts and category frequencies. A CSV is
+streamed with read_csv(chunksize=...), so files larger than RAM can be
+profiled in fixed memory.
+
+The resulting ProfileReport is plain JSON-able data. check_profile() turns
+it into errors (input cannot be scored as is) and warnings, optionally
+against the profile of the training data: train_pipeline stores that
+profile in the model bundle and scoring.py --check compares input files
+with it before scoring.
+
+Usage:
+    python profiling.py ../credit_risk_dataset.csv
+    python profiling.py applications.csv --reference data_profile.json --json profile.json
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_transform import (BINARY_FEATURE, CATEGORICAL_FEATURES, CLEANING_RULES, INPUT_FEATURES, NUMERIC_FEATURES,
+                               accepted_values)
+
+DATA_PROFILE_FILE = "data_profile.json"
+DEFAULT_CHUNKSIZE = 100000
+# Sketch accuracy: rank error is roughly 1.7 / SKETCH_K of the row count
+SKETCH_K = 200
+# Distinct values are counted exactly up to this many per column
+DISTINCT_CAP = 1000
+# Below this many distinct values a numeric column is 'discrete' (classify_numeric_type)
+DISCRETE_THRESHOLD = 100
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+IQR_FACTOR = 1.5
+TARGET = 'loan_status'
+KNOWN_NUMERIC = set(NUMERIC_FEATURES) | {TARGET}
+KNOWN_CATEGORICAL = set(CATEGORICAL_FEATURES) | {BINARY_FEATURE}
+
+# check_profile thresholds
+MAX_MISSING = 0.5
+MAX_OUT_OF_RANGE = 0.01
+MISSING_TOLERANCE = 0.05
+MIN_CLASS_SHARE = 0.05
+
+
+class QuantileSketch:
+    """Mergeable streaming quantile sketch in the style of KLL.
+
+    Values are kept in levels of compactors; an item on level h stands for
+    2**h input values. When a level outgrows its capacity it is sorted and
+    every other item (random offset) is promoted to the next level, so the
+    sketch keeps about 3 * k items whatever the input size. Updates take
+    whole NumPy arrays.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays on this level so the total weight is preserved
+                keep, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # A new level shrinks the capacity of the ones below; start over
+                level = 0
+                continue
+            level += 1
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Approximate quantiles; q=0 and q=1 are the exact min and max"""
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        items, cumulative = self._weighted()
+        idx = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        out = items[np.minimum(idx, len(items) - 1)]
+        return np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, out))
+
+    def rank(self, values):
+        """Approximate share of values <= each of values (the CDF)"""
+        values = np.asarray(values, dtype=float)
+        if self.count == 0:
+            return np.full(values.shape, np.nan)
+        items, cumulative = self._weighted()
+        idx = np.searchsorted(items, values, side='right')
+        below = np.where(idx > 0, cumulative[np.maximum(idx - 1, 0)], 0.0)
+        return below / cumulative[-1]
+
+
+class _NumericStats:
+    def __init__(self, rng_seed):
+        self.missing = 0
+        self.invalid = 0
+        self.total = 0.0
+        self.sketch = QuantileSketch(seed=rng_seed)
+        self.distinct = np.empty(0)
+        self.distinct_overflow = False
+
+    def update(self, series):
+        values = pd.to_numeric(series, errors='coerce') if not pd.api.types.is_numeric_dtype(series) else series
+        values = values.to_numpy(dtype=float, na_value=np.nan)
+        nan = np.isnan(values)
+        # Non-empty cells that did not parse as numbers
+        self.invalid += int((nan & series.notna().to_numpy()).sum())
+        self.missing += int(nan.sum())
+        present = values[~nan]
+        self.total += float(present.sum())
+        self.sketch.update(present)
+        if not self.distinct_overflow:
+            self.distinct = np.union1d(self.distinct, present)
+            if len(self.distinct) > DISTINCT_CAP:
+                self.distinct_overflow = True
+                self.distinct = np.empty(0)
+
+    def report(self, rows, valid_range=None):
+        count = self.sketch.count
+        out = {
+            'type': 'numeric',
+            'missing': self.missing,
+            'missing_share': self.missing / rows if rows else 0.0,
+            'invalid': self.invalid,
+            'distinct': None if self.distinct_overflow else int(len(self.distinct)),
+            'kind': 'continuous' if self.distinct_overflow or len(self.distinct) >= DISCRETE_THRESHOLD
+                    else 'discrete',
+        }
+        if count == 0:
+            return out
+        q = dict(zip(QUANTILES, self.sketch.quantiles(QUANTILES)))
+        iqr = q[0.75] - q[0.25]
+        low, high = q[0.25] - IQR_FACTOR * iqr, q[0.75] + IQR_FACTOR * iqr
+        below, at_or_below_high = self.sketch.rank([np.nextafter(low, -np.inf), high])
+        out.update({
+            'min': self.sketch.min,
+            'max': self.sketch.max,
+            'mean': self.total / count,
+            'quantiles': {f"{qs:g}": float(v) for qs, v in q.items()},
+            'iqr_bounds': [float(low), float(high)],
+            'outlier_share': float(below + 1.0 - at_or_below_high),
+        })
+        if valid_range is not None:
+            lo, hi = valid_range
+            below_lo, at_or_below_hi = self.sketch.rank([np.nextafter(lo, -np.inf), hi])
+            out['valid_range'] = [lo, hi]
+            out['out_of_range_share'] = float(below_lo + 1.0 - at_or_below_hi) * count / rows
+        return out
+
+
+class _CategoricalStats:
+    def __init__(self):
+        self.missing = 0
+        self.counts = {}
+        self.overflow = False
+
+    def update(self, series):
+        self.missing += int(series.isna().sum())
+        if self.overflow:
+            return
+        for value, n in series.value_counts(dropna=True, sort=False).items():
+            if not n:
+                continue
+            key = str(value)
+            self.counts[key] = self.counts.get(key, 0) + int(n)
+        if len(self.counts) > DISTINCT_CAP:
+            self.overflow = True
+            self.counts = {}
+
+    def report(self, rows):
+        present = rows - self.missing
+        return {
+            'type': 'categorical',
+            'missing': self.missing,
+            'missing_share': self.missing / rows if rows else 0.0,
+            'distinct': None if self.overflow else len(self.counts),
+            'frequencies': {value: n / present for value, n in sorted(self.counts.items())} if present else {},
+        }
+
+
+class DatasetProfiler:
+    """Accumulates column statistics over any number of DataFrame chunks"""
+
+    def __init__(self, target=TARGET):
+        self.target = target
+        self.rows = 0
+        self.columns = {}
+
+    def _stats_for(self, col, series):
+        if col not in self.columns:
+            numeric = col in KNOWN_NUMERIC or (col not in KNOWN_CATEGORICAL and
+                                               pd.api.types.is_numeric_dtype(series))
+            self.columns[col] = _NumericStats(len(self.columns)) if numeric else _CategoricalStats()
+        return self.columns[col]
+
+    def update(self, df):
+        self.rows += len(df)
+        for col in df.columns:
+            self._stats_for(col, df[col]).update(df[col])
+        return self
+
+    def report(self):
+        columns = {}
+        for col, stats in self.columns.items():
+            if isinstance(stats, _NumericStats):
+                columns[col] = stats.report(self.rows, CLEANING_RULES.get(col))
+            else:
+                columns[col] = stats.report(self.rows)
+        report = {'rows': self.rows, 'columns': columns}
+        if self.target in self.columns:
+            counts = self.columns[self.target].sketch
+            positive = float(1.0 - counts.rank([0.5])[0]) if counts.count else None
+            report['class_balance'] = {'target': self.target, 'positive_share': positive}
+        return ProfileReport(report)
+
+
+class ProfileReport:
+    """Result of a profiling pass; .data is a JSON-compatible dict"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def rows(self):
+        return self.data['rows']
+
+    @property
+    def columns(self):
+        return self.data['columns']
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def summary(self):
+        """Table like the notebook's missing/outlier printouts, as text"""
+        lines = [f"{self.rows:,} rows"]
+        for col, stats in self.columns.items():
+            line = f"{col:28} {stats['missing']:>8,} missing ({stats['missing_share']:6.2%})"
+            if stats['type'] == 'numeric' and 'quantiles' in stats:
+                low, high = stats['iqr_bounds']
+                line += (f" | median {stats['quantiles']['0.5']:>10.4g} | {stats['kind']:<10} "
+                         f"| ~{stats['outlier_share']:6.2%} outside ({low:.4g}, {high:.4g})")
+            elif stats['type'] == 'categorical':
+                line += f" | {stats['distinct']} values"
+            lines.append(line)
+        balance = self.data.get('class_balance')
+        if balance and balance['positive_share'] is not None:
+            lines.append(f"{balance['target']}: {balance['positive_share']:.2%} positive")
+        return '\n'.join(lines)
+
+
+def profile_frame(df, target=TARGET):
+    return DatasetProfiler(target).update(df).report()
+
+
+def profile_csv(path, chunksize=DEFAULT_CHUNKSIZE, target=TARGET):
+    """Profile a CSV in chunks; memory is bounded by the chunk size, not the file size"""
+    profiler = DatasetProfiler(target)
+    header = pd.read_csv(path, nrows=0).columns
+    # Categoricals parse faster than string columns and value_counts them directly
+    dtypes = {col: 'category' for col in header if col in KNOWN_CATEGORICAL}
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=dtypes, low_memory=False):
+        profiler.update(chunk)
+    return profiler.report()
+
+
+def check_profile(report, reference=None, required=INPUT_FEATURES, training=False, categories=None):
+    """Return (errors, warnings) as lists of messages.
+
+    Errors mean the data cannot be used as is: required columns missing,
+    non-numeric values in numeric columns, columns that are mostly empty
+    or values the model's encoders cannot score (categories, as returned
+    by scoring.known_categories). Warnings flag values outside
+    CLEANING_RULES, categories or missing shares not seen in the reference
+    profile and, for training data, a very rare target class.
+    """
+    errors, warnings = [], []
+    columns = report.columns
+    missing_cols = [col for col in required if col not in columns]
+    if missing_cols:
+        errors.append(f"Missing required columns: {', '.join(missing_cols)}")
+
+    ref_columns = reference.columns if reference is not None else {}
+    for col, stats in columns.items():
+        ref = ref_columns.get(col)
+        if stats['missing_share'] > MAX_MISSING:
+            errors.append(f"{col}: {stats['missing_share']:.1%} of values are missing")
+        elif ref is not None and stats['missing_share'] > ref['missing_share'] + MISSING_TOLERANCE:
+            warnings.append(f"{col}: {stats['missing_share']:.1%} missing vs {ref['missing_share']:.1%} in training")
+
+        if stats['type'] == 'numeric':
+            if stats['invalid']:
+                errors.append(f"{col}: {stats['invalid']:,} values are not numbers")
+            if stats.get('out_of_range_share', 0.0) > MAX_OUT_OF_RANGE:
+                low, high = stats['valid_range']
+                warnings.append(f"{col}: ~{stats['out_of_range_share']:.1%} of values outside [{low:g}, {high:g}]")
+            if stats.get('distinct') == 1:
+                warnings.append(f"{col}: constant column")
+        else:
+            if categories and col in categories:
+                unknown = sorted(set(stats['frequencies']) - accepted_values(col, categories[col]))
+                if unknown:
+                    share = sum(stats['frequencies'][value] for value in unknown)
+                    errors.append(f"{col}: ~{share:.2%} of values cannot be scored by the model "
+                                  f"(unknown: {', '.join(unknown[:10])})")
+                    continue
+            if ref is not None and ref['type'] == 'categorical' and ref['distinct'] is not None:
+                unseen = sorted(set(stats['frequencies']) - set(ref['frequencies']))
+                if unseen:
+                    warnings.append(f"{col}: values not seen in training: {', '.join(unseen[:10])}")
+
+    balance = report.data.get('class_balance')
+    if training and balance and balance['positive_share'] is not None:
+        share = balance['positive_share']
+        if min(share, 1.0 - share) < MIN_CLASS_SHARE:
+            warnings.append(f"{balance['target']}: minority class is only {min(share, 1.0 - share):.1%} of rows")
+    return errors, warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile a credit risk CSV in one streaming pass")
+    parser.add_argument('input', help="CSV shaped like credit_risk_dataset.csv")
+    parser.add_argument('--reference', default=None, help=f"Profile to compare with (e.g. {DATA_PROFILE_FILE})")
+    parser.add_argument('--json', default=None, help="Also write the profile as JSON")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows read per chunk")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    report = profile_csv(args.input, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(report.summary())
+    print(f"Profiled in {elapsed:.2f}s")
+    if args.json:
+        report.save(args.json)
+
+    reference = ProfileReport.load(args.reference) if args.reference else None
+    errors, warnings = check_profile(report, reference)
+    for message in warnings:
+        print(f"WARNING: {message}")
+    for message in errors:
+        print(f"ERROR: {message}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Streaming export of the prediction log to CSV, Parquet and PDF.
+
+The log is read from the PredictionStore in chunks, with the filters
+(date range, risk level, probability band) evaluated by SQLite while the
+rows stream. Each chunk is written to the output before the next one is
+read, so input-side memory stays at one chunk whatever the size of the
+history. PDF rows are formatted column-wise per chunk and laid out page by
+page; note that fpdf2 keeps the finished pages in memory until the file is
+written, so very large PDF reports can be capped with max_rows.
+
+Usage:
+    python report_export.py predictions.csv
+    python report_export.py high_risk.parquet --risk-level "High Risk" --from 2025-01-01
+    python report_export.py report.pdf --min-probability 0.8 --max-rows 10000
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from prediction_store import (COLUMN_TYPES, DEFAULT_CHUNKSIZE, PREDICTION_COLUMNS, PREDICTIONS_DB,
+                              PredictionStore)
+
+EXPORT_FORMATS = ('csv', 'parquet', 'pdf')
+# PDF rows are slow to lay out, so progress is reported in smaller steps
+PDF_CHUNKSIZE = 1000
+RISK_LEVELS = ('High Risk', 'Low Risk')
+
+PDF_HEADERS = ['Timestamp', 'Age', 'Income', 'Loan Amount', 'Risk Level', 'Probability']
+PDF_ALIGN = ['L', 'C', 'R', 'R', 'C', 'C']
+
+
+class PredictionFilter:
+    """Row filter for exports, translated into an SQL WHERE clause.
+
+    Dates are inclusive and accept 'YYYY-MM-DD', 'YYYY-MM-DD HH:MM:SS' or
+    datetime objects; the probability band is inclusive on both ends.
+    """
+
+    def __init__(self, start=None, end=None, risk_level=None, min_probability=None, max_probability=None):
+        if risk_level is not None and risk_level not in RISK_LEVELS:
+            raise ValueError(f"risk_level must be one of {', '.join(RISK_LEVELS)}, got {risk_level!r}")
+        for name, value in [('min_probability', min_probability), ('max_probability', max_probability)]:
+            if value is not None and not 0.0 <= value <= 1.0:
+                raise ValueError(f"{name} must be between 0 and 1, got {value}")
+        self.start = _parse_date(start, end_of_day=False)
+        self.end = _parse_date(end, end_of_day=True)
+        self.risk_level = risk_level
+        self.min_probability = min_probability
+        self.max_probability = max_probability
+
+    def to_sql(self):
+        """Return (where, params), or (None, ()) when nothing is filtered"""
+        clauses, params = [], []
+        for clause, value in [("prediction_timestamp >= ?", self.start),
+                              ("prediction_timestamp <= ?", self.end),
+                              ("risk_level = ?", self.risk_level),
+                              ("default_probability >= ?", self.min_probability),
+                              ("default_probability <= ?", self.max_probability)]:
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        if not clauses:
+            return None, ()
+        return ' AND '.join(clauses), tuple(params)
+
+    def describe(self):
+        """Human-readable summary for report headers"""
+        parts = []
+        if self.start or self.end:
+            parts.append(f"dates {self.start or '...'} to {self.end or '...'}")
+        if self.risk_level:
+            parts.append(self.risk_level)
+        if self.min_probability is not None or self.max_probability is not None:
+            low = self.min_probability if self.min_probability is not None else 0.0
+            high = self.max_probability if self.max_probability is not None else 1.0
+            parts.append(f"probability {low:.0%} to {high:.0%}")
+        return ', '.join(parts) if parts else "all predictions"
+
+
+def _parse_date(value, end_of_day):
+    """Normalize a date bound to the stored 'YYYY-MM-DD HH:MM:SS' text format"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    value = str(value).strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d" and end_of_day:
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed.strftime("%Y-%m-%d %H:%M:%S")
+    raise ValueError(f"Dates must look like YYYY-MM-DD or YYYY-MM-DD HH:MM:SS, got {value!r}")
+
+
+def export_format(path):
+    """Export format from the output file extension"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '.{extension}', use one of: .csv, .parquet, .pdf")
+    return extension
+
+
+def _iter_filtered(store, prediction_filter, chunksize, max_rows=None, progress=None):
+    """Yield matching chunks; progress(rows, total) is called once each chunk has been written"""
+    where, params = (prediction_filter or PredictionFilter()).to_sql()
+    total = None
+    if progress is not None:
+        total = store.count_matching(where, params)
+        if max_rows is not None:
+            total = min(total, max_rows)
+        progress(0, total)
+    remaining = max_rows
+    rows = 0
+    for chunk in store.iter_chunks(chunksize, where, params):
+        if remaining is not None:
+            chunk = chunk.iloc[:remaining]
+            remaining -= len(chunk)
+        if len(chunk):
+            yield chunk
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows, total)
+        if remaining == 0:
+            break
+
+
+def export_csv(store, output_path, prediction_filter=None, chunksize=DEFAULT_CHUNKSIZE, max_rows=None,
+               progress=None):
+    """Stream matching predictions to CSV with the loan_predictions.csv layout; returns the row count"""
+    rows = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        f.write(','.join(PREDICTION_COLUMNS) + '\n')
+        for chunk in _iter_filtered(store, prediction_filter, chunksize, max_rows, progress):
+            chunk.to_csv(f, header=False, index=False)
+            rows += len(chunk)
+    return rows
+
+
+def export_parquet(store, output_path, prediction_filter=None, chunksize=DEFAULT_CHUNKSIZE, max_rows=None,
+                   progress=None):
+    """Stream matching predictions to Parquet, one row group per chunk; returns the row count"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires 'pyarrow'. Install it using: pip install pyarrow")
+
+    arrow_types = {'REAL': pa.float64(), 'INTEGER': pa.int64(), 'TEXT': pa.string()}
+    schema = pa.schema([(col, arrow_types[COLUMN_TYPES[col]]) for col in PREDICTION_COLUMNS])
+    rows = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for chunk in _iter_filtered(store, prediction_filter, chunksize, max_rows, progress):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+def _pdf_cells(chunk):
+    """Format one chunk into the six PDF table columns, column by column"""
+    probability = chunk['default_probability'].to_numpy(dtype=float)
+    return zip(
+        chunk['prediction_timestamp'].astype(str).str[:15].tolist(),
+        chunk['person_age'].astype(str).tolist(),
+        [f"${v:,.0f}" for v in np.nan_to_num(chunk['person_income'].to_numpy(dtype=float))],
+        [f"${v:,.0f}" for v in np.nan_to_num(chunk['loan_amnt'].to_numpy(dtype=float))],
+        chunk['risk_level'].astype(str).tolist(),
+        [f"{v:.1%}" for v in np.nan_to_num(probability)],
+    )
+
+
+def export_pdf(store, output_path, prediction_filter=None, chunksize=PDF_CHUNKSIZE, max_rows=None,
+               progress=None):
+    """Render matching predictions into a paginated PDF table; returns the row count"""
+    try:
+        from fpdf import FPDF
+    except ImportError:
+        raise ImportError("PDF export requires 'fpdf2' library. Install it using: pip install fpdf2")
+
+    prediction_filter = prediction_filter or PredictionFilter()
+    total = store.count_matching(*prediction_filter.to_sql())
+    shown = total if max_rows is None else min(total, max_rows)
+    if progress is not None:
+        progress(0, shown)
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    # Title
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Credit Risk Predictions Report", ln=True, align="C")
+    pdf.ln(5)
+
+    # Timestamp, filter and record counts
+    pdf.set_font("Arial", "", 10)
+    pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
+    pdf.cell(0, 10, f"Filter: {prediction_filter.describe()}", ln=True)
+    records = f"Total Records: {total}" if shown == total else f"Total Records: {total} (first {shown} shown)"
+    pdf.cell(0, 10, records, ln=True)
+    pdf.ln(10)
+
+    col_width = pdf.w / len(PDF_HEADERS) - 5
+
+    def table_header():
+        pdf.set_font("Arial", "B", 8)
+        for header in PDF_HEADERS:
+            pdf.cell(col_width, 10, header, border=1, align="C")
+        pdf.ln()
+        pdf.set_font("Arial", "", 8)
+
+    table_header()
+    page = pdf.page
+    rows = 0
+    for chunk in _iter_filtered(store, prediction_filter, chunksize, max_rows):
+        for cells in _pdf_cells(chunk):
+            # Repeat the table header at the top of every new page
+            if pdf.will_page_break(8):
+                pdf.add_page()
+            if pdf.page != page:
+                page = pdf.page
+                table_header()
+            for text, align in zip(cells, PDF_ALIGN):
+                pdf.cell(col_width, 8, text, border=1, align=align)
+            pdf.ln()
+        rows += len(chunk)
+        if progress is not None:
+            progress(rows, shown)
+
+    pdf.output(output_path)
+    return rows
+
+
+EXPORTERS = {'csv': export_csv, 'parquet': export_parquet, 'pdf': export_pdf}
+
+
+def export_predictions(store, output_path, prediction_filter=None, chunksize=None, max_rows=None, progress=None):
+    """Export to the format given by the output extension; returns the row count.
+
+    progress(rows, total) is called as chunks are written; an exception
+    raised from it (e.g. a cancellation) aborts the export, and a partly
+    written output file is removed.
+    """
+    fmt = export_format(output_path)
+    if chunksize is None:
+        chunksize = PDF_CHUNKSIZE if fmt == 'pdf' else DEFAULT_CHUNKSIZE
+    try:
+        return EXPORTERS[fmt](store, output_path, prediction_filter, chunksize, max_rows, progress)
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the credit risk prediction log")
+    parser.add_argument('output', help="Output file (.csv, .parquet or .pdf)")
+    parser.add_argument('--db', default=PREDICTIONS_DB, help="Prediction database")
+    parser.add_argument('--from', dest='start', default=None, help="First date (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument('--to', dest='end', default=None, help="Last date, inclusive")
+    parser.add_argument('--risk-level', choices=RISK_LEVELS, default=None, help="Only this risk level")
+    parser.add_argument('--min-probability', type=float, default=None, help="Lowest default probability")
+    parser.add_argument('--max-probability', type=float, default=None, help="Highest default probability")
+    parser.add_argument('--max-rows', type=int, default=None, help="Stop after this many matching rows")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help=f"Rows read per chunk (default: {DEFAULT_CHUNKSIZE}, {PDF_CHUNKSIZE} for PDF)")
+    args = parser.parse_args(argv)
+
+    try:
+        export_format(args.output)
+        prediction_filter = PredictionFilter(args.start, args.end, args.risk_level,
+                                             args.min_probability, args.max_probability)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    with PredictionStore(args.db) as store:
+        rows = export_predictions(store, args.output, prediction_filter, args.chunksize, args.max_rows)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {rows:,} rows ({prediction_filter.describe()}) to {args.output} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Bounded LRU cache of default probabilities for repeated applications.
+
+Operators re-score the same application again and again (the sample data,
+a resubmission after fixing one field that is then fixed back, the same
+client sent to the service twice). CreditRiskScorer looks small batches
+up here first and only transforms and scores the rows it has not seen.
+
+Keys are the model version (model_cache.cache_key: the contents of
+model.skops and lambdas.pkl) plus the application canonicalized the way
+FeatureTransform reads it, so two inputs share an entry only if the model
+would see the same values. Replacing model.skops or lambdas.pkl changes
+the version: entries of the old version are never returned again and are
+dropped as soon as the new version stores its first result. Only valid
+rows are cached, and only their probability: labels always use the
+current decision threshold.
+
+One cache is shared per process (shared_cache()), by the GUI, the
+scoring service and batch scoring; batches larger than MAX_CACHED_BATCH
+rows (file chunks) bypass it, since looking up every row would cost more
+than scoring it.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from feature_transform import BINARY_FEATURE, CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+DEFAULT_MAX_ENTRIES = 4096
+MAX_CACHED_BATCH = 256
+
+
+def canonical_rows(df):
+    """One hashable tuple per row with the values FeatureTransform.transform would read"""
+    columns = []
+    for col in NUMERIC_FEATURES:
+        values = df[col].to_numpy(dtype=float)
+        # NaN never equals itself; None does
+        columns.append([None if value != value else value for value in values.tolist()])
+    for col in CATEGORICAL_FEATURES:
+        columns.append([None if pd.isna(value) else value for value in df[col].to_numpy(dtype=object)])
+    binary = df[BINARY_FEATURE]
+    if pd.api.types.is_numeric_dtype(binary):
+        flags = binary.to_numpy(dtype=float).tolist()
+    else:
+        flags = [1.0 if flag == 'Y' else 0.0 if flag == 'N' else None for flag in binary.to_numpy(dtype=object)]
+    columns.append([None if flag != flag else flag for flag in flags])
+    return list(zip(*columns))
+
+
+class ResultCache:
+    """Thread-safe LRU of (model version, canonical row) -> default probability"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_key = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, model_key, rows):
+        """Cached probability of every row, None where there is none"""
+        with self._lock:
+            if model_key != self._model_key:
+                self.misses += len(rows)
+                return [None] * len(rows)
+            found = []
+            for row in rows:
+                value = self._entries.get(row)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(row)
+                    self.hits += 1
+                found.append(value)
+            return found
+
+    def put_many(self, model_key, rows, probabilities):
+        """Store the probabilities of rows scored with model_key"""
+        with self._lock:
+            if model_key != self._model_key:
+                # A new model version: everything cached so far is stale
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._model_key = model_key
+            for row, proba in zip(rows, probabilities):
+                self._entries[row] = float(proba)
+                self._entries.move_to_end(row)
+            overflow = len(self._entries) - self.max_entries
+            for _ in range(max(overflow, 0)):
+                self._entries.popitem(last=False)
+            self.evictions += max(overflow, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._model_key = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """The process-wide cache used by every scoring path"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache()
+        return _shared_cache
+
+
+def cached_scores(cache, model_key, df, score):
+    """Default probabilities of df through cache; score(df_subset) -> (proba, valid) runs on the misses only.
+
+    Returns (proba, valid) like CreditRiskScorer.score without the labels.
+    """
+    rows = canonical_rows(df)
+    found = cache.get_many(model_key, rows)
+    missing = [i for i, value in enumerate(found) if value is None]
+    instrumentation.count('result_cache.hit', len(found) - len(missing))
+    instrumentation.count('result_cache.miss', len(missing))
+    proba = np.array([np.nan if value is None else value for value in found])
+    valid = np.ones(len(df), dtype=bool)
+    if missing:
+        missing_proba, missing_valid = score(df.iloc[missing])
+        proba[missing] = missing_proba
+        valid[missing] = missing_valid
+        stored = [i for i, ok in zip(missing, missing_valid) if ok]
+        cache.put_many(model_key, [rows[i] for i in stored], proba[stored])
+    return proba, valid
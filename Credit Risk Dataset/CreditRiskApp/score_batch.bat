@@ -0,0 +1,3 @@
+@echo off
+python scoring.py %*
+pause
\ No newline at end of file
@@ -0,0 +1,403 @@
+"""Headless batch scoring for the credit risk model.
+
+Reads credit_risk_dataset.csv-shaped files (CSV or Parquet) in chunks,
+applies the shared FeatureTransform to whole blocks at once, runs the
+model once per chunk and streams the scored rows to the output file.
+
+Usage:
+    python scoring.py applications.csv scored.csv
+    python scoring.py applications.parquet scored.parquet --chunksize 100000
+    python scoring.py credit_risk_dataset.csv scored.csv --cache
+    python scoring.py applications.csv scored.csv --check
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from compiled_ensemble import CompiledColumnTransformer
+from feature_transform import CATEGORICAL_FEATURES, INPUT_FEATURES, FeatureTransform
+from instrumentation import stage
+from model_cache import cache_key, load_model_artifacts
+from result_cache import MAX_CACHED_BATCH, cached_scores, shared_cache
+
+DEFAULT_CHUNKSIZE = 50000
+# Binary caches of scored inputs (--cache) live with the app, not next to every input file
+INPUT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data_cache")
+DEFAULT_THRESHOLD = 0.5
+THRESHOLD_FILE = "decision_threshold.json"
+
+
+def load_model(model_path="model.skops"):
+    """Load the trained pipeline from a skops file"""
+    import skops.io as sio
+
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"{model_path} not found")
+    unknown_types = sio.get_untrusted_types(file=model_path)
+    return sio.load(model_path, trusted=unknown_types)
+
+
+def data_profile_path_for(model_path):
+    """Return the training data profile stored next to a model file"""
+    from profiling import DATA_PROFILE_FILE
+
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), DATA_PROFILE_FILE)
+
+
+def threshold_path_for(model_path):
+    """Return the decision threshold file stored next to a model file"""
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), THRESHOLD_FILE)
+
+
+def load_threshold(threshold_path):
+    """Load the decision threshold, falling back to 0.5 if the file does not exist"""
+    if not os.path.exists(threshold_path):
+        return DEFAULT_THRESHOLD
+    with open(threshold_path, 'r') as f:
+        threshold = float(json.load(f)['threshold'])
+    if not 0.0 < threshold < 1.0:
+        raise ValueError(f"Decision threshold must be between 0 and 1, got {threshold}")
+    return threshold
+
+
+def save_threshold(threshold_path, threshold):
+    """Store a new decision threshold next to the model"""
+    if not 0.0 < threshold < 1.0:
+        raise ValueError(f"Decision threshold must be between 0 and 1, got {threshold}")
+    with open(threshold_path, 'w') as f:
+        json.dump({'threshold': threshold}, f, indent=4)
+
+
+def imputed_features(model):
+    """Columns whose missing values the model's own preprocessing fills (see imputation.py)"""
+    if hasattr(model, 'preprocessors'):
+        steps = model.preprocessors
+    else:
+        steps = [step for _, step in getattr(model, 'steps', [])[:-1]]
+    return [col for step in steps for col in getattr(step, 'imputed_features', [])]
+
+
+def known_categories(model):
+    """{column: categories} for the model's encoders that reject unseen values.
+
+    One-hot encoders fitted with handle_unknown='ignore' accept any value
+    (an unseen one encodes as all zeros) and are not listed.
+    """
+    if hasattr(model, 'preprocessors'):
+        steps = model.preprocessors
+    else:
+        steps = [step for _, step in getattr(model, 'steps', [])[:-1]]
+    categories = {}
+    for step in steps:
+        if isinstance(step, CompiledColumnTransformer):
+            for kind, columns, params in step.steps:
+                if kind == 'onehot' and not params[1]:
+                    categories.update((col, list(index)) for col, (index, _) in zip(columns, params[0]))
+                elif kind == 'ordinal':
+                    categories.update((col, list(index)) for col, index in zip(columns, params))
+        elif hasattr(step, 'transformers_'):
+            # A fitted sklearn ColumnTransformer
+            for _, transformer, columns in step.transformers_:
+                if getattr(transformer, 'handle_unknown', None) == 'error':
+                    categories.update((col, list(cats)) for col, cats in zip(columns, transformer.categories_))
+    return {col: values for col, values in categories.items() if col in CATEGORICAL_FEATURES}
+
+
+class CreditRiskScorer:
+    """Feature transform, model and decision threshold behind a single scoring call.
+
+    The ensemble is evaluated once per call: the label is derived from the
+    default probability instead of running predict() and predict_proba().
+    Missing values are accepted in the columns the model imputes itself.
+    With a ResultCache (see result_cache.py) and the model_key of the
+    model version, small batches only score the rows not seen before.
+    """
+
+    def __init__(self, model, transform, threshold=DEFAULT_THRESHOLD, explainer=None, cache=None, model_key=None):
+        if cache is not None and model_key is None:
+            raise ValueError("A result cache needs the model_key of the model version")
+        self.model = model
+        self.transform = transform.with_imputation(imputed_features(model)).with_categories(known_categories(model))
+        self.threshold = threshold
+        self._explainer = explainer
+        self.cache = cache
+        self.model_key = model_key
+
+    @classmethod
+    def from_files(cls, model_path="model.skops", lambdas_path="lambdas.pkl", threshold_path=None,
+                   compiled=False, cache=True):
+        """Load the model, lambdas and threshold stored next to the model.
+
+        With compiled=True the model comes from the fast-start cache and the
+        gradient boosting trees are evaluated by CompiledPipeline instead of
+        sklearn's per-stage predict. With cache=True results are kept in the
+        process-wide result cache.
+        """
+        if threshold_path is None:
+            threshold_path = threshold_path_for(model_path)
+        explainer = None
+        if compiled:
+            artifacts = load_model_artifacts(model_path, lambdas_path)
+            model, transform = artifacts['model'], FeatureTransform(artifacts['lambdas'])
+            explainer, model_key = artifacts['explainer'], artifacts['key']
+        else:
+            model, transform = load_model(model_path), FeatureTransform.from_file(lambdas_path)
+            model_key = cache_key(model_path, lambdas_path)
+        return cls(model, transform, load_threshold(threshold_path), explainer,
+                   shared_cache() if cache else None, model_key)
+
+    @property
+    def explainer(self):
+        """TreeExplainer of the model (see explain.py), built on first use if the cache did not provide one"""
+        if self._explainer is None:
+            from explain import TreeExplainer
+
+            self._explainer = TreeExplainer(self.model)
+        return self._explainer
+
+    def predict_proba(self, X):
+        """Default probability for already transformed rows"""
+        return self.model.predict_proba(X)[:, 1]
+
+    def score(self, df, strict=False):
+        """Score raw applications.
+
+        Returns (proba, labels, valid): default probabilities (NaN for rows
+        that could not be transformed), 0/1 labels from the decision
+        threshold and the mask of valid rows.
+        """
+        if self.cache is not None and 0 < len(df) <= MAX_CACHED_BATCH and \
+                all(col in df.columns for col in INPUT_FEATURES):
+            with stage('score.cached'):
+                proba, valid = cached_scores(self.cache, self.model_key, df, lambda rows: self._score(rows, strict))
+        else:
+            proba, valid = self._score(df, strict)
+        labels = (proba >= self.threshold).astype(np.int8)
+        return proba, labels, valid
+
+    def _score(self, df, strict):
+        instrumentation.count('score.rows', len(df))
+        with stage('score.transform'):
+            X, valid = self.transform.transform(df, strict=strict)
+        proba = np.full(len(df), np.nan)
+        with stage('score.model'):
+            if valid.all():
+                proba = self.predict_proba(X)
+            elif valid.any():
+                proba[valid] = self.predict_proba(X[valid])
+        return proba, valid
+
+    def explain(self, df, strict=False):
+        """Feature contributions to the log-odds of raw applications.
+
+        Returns (contributions, valid): a DataFrame with one column per input
+        feature (NaN for invalid rows) and the mask of valid rows. The
+        contributions of a row plus explainer.bias sum to its log-odds.
+        """
+        with stage('explain.transform'):
+            X, valid = self.transform.transform(df, strict=strict)
+        contributions = pd.DataFrame(np.nan, index=df.index, columns=self.explainer.features)
+        with stage('explain.contributions'):
+            if valid.any():
+                contributions[valid] = self.explainer.explain(X[valid])
+        return contributions, valid
+
+
+def iter_input_chunks(input_path, chunksize=DEFAULT_CHUNKSIZE, cached=False):
+    """Yield the input file as DataFrames of at most chunksize rows.
+
+    With cached=True a CSV is read through data_loader, which parses it
+    once into a binary cache in INPUT_CACHE_DIR and on later runs reads it
+    back a chunk at a time.
+    """
+    if cached and not input_path.lower().endswith('.parquet'):
+        from data_loader import iter_cached_chunks
+
+        yield from iter_cached_chunks(input_path, chunksize, INPUT_CACHE_DIR)
+    elif input_path.lower().endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet input requires 'pyarrow'. Install it using: pip install pyarrow")
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunksize)
+
+
+class ScoredFileWriter:
+    """Append scored chunks to a CSV or Parquet file"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.is_parquet = output_path.lower().endswith('.parquet')
+        self._handle = None
+        self._parquet_writer = None
+
+    def write(self, df):
+        if self.is_parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Parquet output requires 'pyarrow'. Install it using: pip install pyarrow")
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            header = self._handle is None
+            if header:
+                self._handle = open(self.output_path, 'w', newline='', encoding='utf-8')
+            df.to_csv(self._handle, header=header, index=False)
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+
+def score_chunk(scorer, chunk, scores=None):
+    """Score one chunk of applications and return it with prediction columns.
+
+    scores=(proba, valid) from a pass that already ran the model over the
+    chunk (explain.explain_chunk) are used instead of scoring it again.
+    """
+    if scores is None:
+        proba, prediction, valid = scorer.score(chunk)
+    else:
+        proba, valid = scores
+        prediction = (proba >= scorer.threshold).astype(np.int8)
+
+    scored = chunk.copy()
+    scored['predicted_loan_status'] = pd.arrays.IntegerArray(prediction.astype(np.int8), ~valid)
+    scored['default_probability'] = proba
+    scored['risk_level'] = np.where(~valid, 'Invalid Input',
+                                    np.where(prediction == 1, 'High Risk', 'Low Risk'))
+    return scored, int(valid.sum())
+
+
+def check_input(input_path, model_path="model.skops", chunksize=DEFAULT_CHUNKSIZE):
+    """Profile the input in one streaming pass and compare it with the training profile and the model.
+
+    Returns (errors, warnings) from profiling.check_profile. Without a
+    data_profile.json next to the model only the reference-free checks run;
+    categories the model cannot encode are checked whenever the model loads.
+    """
+    from profiling import DatasetProfiler, ProfileReport, check_profile, profile_csv
+
+    if input_path.lower().endswith('.parquet'):
+        profiler = DatasetProfiler()
+        for chunk in iter_input_chunks(input_path, chunksize):
+            profiler.update(chunk)
+        report = profiler.report()
+    else:
+        report = profile_csv(input_path, chunksize)
+    profile_path = data_profile_path_for(model_path)
+    reference = ProfileReport.load(profile_path) if os.path.exists(profile_path) else None
+    # The categories come from the fitted encoders; building the compiled cache is left to scoring
+    categories = known_categories(load_model(model_path)) if os.path.exists(model_path) else None
+    return check_profile(report, reference, categories=categories)
+
+
+def score_file(input_path, output_path, scorer=None, chunksize=DEFAULT_CHUNKSIZE,
+               model_path="model.skops", lambdas_path="lambdas.pkl", compiled=False,
+               progress=None, cached=False):
+    """Stream input_path through the model and write the scored rows to output_path.
+
+    Only one chunk is held in memory at a time. Returns a dict with row
+    counts, elapsed seconds and throughput.
+    """
+    if scorer is None:
+        scorer = CreditRiskScorer.from_files(model_path, lambdas_path, compiled=compiled)
+
+    writer = ScoredFileWriter(output_path)
+    rows = 0
+    scored_rows = 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_input_chunks(input_path, chunksize, cached):
+            scored, n_valid = score_chunk(scorer, chunk)
+            with stage('file.write'):
+                writer.write(scored)
+            rows += len(chunk)
+            scored_rows += n_valid
+            if progress is not None:
+                elapsed = time.perf_counter() - start
+                progress(rows, rows / elapsed if elapsed > 0 else 0.0)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'scored': scored_rows,
+        'invalid': rows - scored_rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a file of loan applications with the credit risk model")
+    parser.add_argument('input', help="CSV or Parquet file shaped like credit_risk_dataset.csv")
+    parser.add_argument('output', help="Output file (.csv or .parquet)")
+    parser.add_argument('--model', default="model.skops", help="Path to model.skops")
+    parser.add_argument('--lambdas', default="lambdas.pkl", help="Path to lambdas.pkl")
+    parser.add_argument('--threshold', type=float, default=None,
+                        help=f"Decision threshold (default: {THRESHOLD_FILE} next to the model, else 0.5)")
+    parser.add_argument('--compiled', action='store_true',
+                        help="Evaluate the trees with the compiled ensemble instead of sklearn")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk (bounds memory usage)")
+    parser.add_argument('--cache', action='store_true',
+                        help="Load a CSV input through the binary dataset cache (see data_loader.py)")
+    parser.add_argument('--check', action='store_true',
+                        help="Profile the input first; stop on data errors and print warnings (see profiling.py)")
+    parser.add_argument('--quiet', action='store_true', help="Do not print per-chunk progress")
+    parser.add_argument('--metrics', default=None,
+                        help="Write per-stage timings to this JSON file (see instrumentation.py)")
+    parser.add_argument('--profile', default=None,
+                        help="Sample the stacks while scoring and write them in collapsed format to this file")
+    args = parser.parse_args(argv)
+
+    if args.metrics or args.profile:
+        instrumentation.configure(metrics_path=args.metrics, profile_path=args.profile)
+    else:
+        instrumentation.configure_from_env()
+
+    if args.check:
+        errors, warnings = check_input(args.input, args.model, args.chunksize)
+        for message in warnings:
+            print(f"WARNING: {message}", file=sys.stderr)
+        if errors:
+            sys.exit("Input rejected:\n" + '\n'.join(f"  {message}" for message in errors))
+
+    def report(rows, rate):
+        print(f"Scored {rows:,} rows ({rate:,.0f} rows/sec)", file=sys.stderr)
+
+    scorer = CreditRiskScorer.from_files(args.model, args.lambdas, compiled=args.compiled)
+    if args.threshold is not None:
+        if not 0.0 < args.threshold < 1.0:
+            parser.error("--threshold must be between 0 and 1")
+        scorer.threshold = args.threshold
+
+    summary = score_file(args.input, args.output, scorer=scorer, chunksize=args.chunksize,
+                         progress=None if args.quiet else report, cached=args.cache)
+
+    print(f"Done: {summary['rows']:,} rows ({summary['invalid']:,} invalid) in "
+          f"{summary['seconds']:.2f}s, {summary['rows_per_sec']:,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Local HTTP scoring service for the credit risk model.
+
+Exposes the same FeatureTransform + model pipeline as the GUI over HTTP
+using only the standard library. Concurrent single-row requests are queued
+and coalesced into micro-batches: the batcher waits at most a few
+milliseconds after the first queued request, so the ensemble runs once per
+batch instead of once per request.
+
+Endpoints:
+    POST /score        one application (JSON object with the raw dataset columns)
+    POST /score/batch  {"applications": [...]} or a JSON list, scored in one call
+    GET  /metrics      request counts, latency percentiles, queue depth, batch sizes, result cache
+                       and, with instrumentation enabled, per-stage timings
+    GET  /health       liveness and the active decision threshold
+
+Usage:
+    python scoring_server.py [--port 8080] [--batch-window-ms 5] [--max-batch 256]
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from feature_transform import BINARY_FEATURE, CATEGORICAL_FEATURES, INPUT_FEATURES, NUMERIC_FEATURES
+import instrumentation
+from instrumentation import stage
+from scoring import CreditRiskScorer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_BATCH_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 256
+MAX_BODY_BYTES = 16 * 1024 * 1024
+REQUEST_TIMEOUT = 30.0
+LATENCY_WINDOW = 10000
+
+
+def clean_application(record, optional=()):
+    """Validate one JSON application and coerce it to the dataset's column types.
+
+    Numeric fields listed in optional (FeatureTransform.optional_features)
+    may be missing or null and become NaN.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Each application must be a JSON object")
+    missing = [col for col in INPUT_FEATURES if record.get(col) is None and col not in optional]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    cleaned = {}
+    for col in NUMERIC_FEATURES:
+        if record.get(col) is None:
+            cleaned[col] = float('nan')
+            continue
+        try:
+            cleaned[col] = float(record[col])
+        except (TypeError, ValueError):
+            raise ValueError(f"{col} must be a number, got {record[col]!r}")
+    for col in CATEGORICAL_FEATURES:
+        cleaned[col] = str(record[col])
+
+    # Previous default may be sent as Y/N like the dataset or as a boolean/0/1
+    flag = record[BINARY_FEATURE]
+    if flag in ('Y', 'N'):
+        cleaned[BINARY_FEATURE] = 1.0 if flag == 'Y' else 0.0
+    elif flag in (0, 1):
+        cleaned[BINARY_FEATURE] = float(flag)
+    else:
+        raise ValueError(f"{BINARY_FEATURE} must be 'Y', 'N', 0 or 1, got {flag!r}")
+    return cleaned
+
+
+def score_isolated(score_batch, applications):
+    """score_batch(applications), falling back to one call per application if the batch raises.
+
+    Returns one (result, exception) pair per application, so a row that
+    breaks scoring fails alone instead of taking its batch with it.
+    """
+    try:
+        return [(result, None) for result in score_batch(applications)]
+    except Exception as e:
+        if len(applications) == 1:
+            return [(None, e)]
+    outcomes = []
+    for application in applications:
+        try:
+            outcomes.append((score_batch([application])[0], None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
+
+
+class LatencyStats:
+    """Thread-safe request counters and a rolling window of latencies"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self.counts = {'score': 0, 'batch': 0, 'rows': 0, 'errors': 0}
+        self.batches = 0
+
+    def record_request(self, endpoint, seconds, rows, error=False):
+        with self._lock:
+            self.counts[endpoint] += 1
+            self.counts['rows'] += rows
+            self.counts['errors'] += int(error)
+            self._latencies.append(seconds)
+
+    def record_batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(size)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1e3
+            batch_sizes = np.array(self._batch_sizes)
+            counts = dict(self.counts)
+            batches = self.batches
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            latency = {'p50': p50, 'p95': p95, 'p99': p99, 'max': latencies.max(), 'window': len(latencies)}
+        else:
+            latency = {'p50': None, 'p95': None, 'p99': None, 'max': None, 'window': 0}
+        return {
+            'requests': counts,
+            'latency_ms': latency,
+            'micro_batches': {
+                'count': batches,
+                'mean_size': float(batch_sizes.mean()) if len(batch_sizes) else None,
+                'max_size': int(batch_sizes.max()) if len(batch_sizes) else None,
+            },
+        }
+
+
+class MicroBatcher:
+    """Coalesce single applications into batches for one scoring call.
+
+    The worker blocks for the first queued application, then keeps
+    collecting for at most max_wait seconds or until max_batch applications
+    are queued, and hands the whole batch to score_batch.
+    """
+
+    def __init__(self, score_batch, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_BATCH_WINDOW_MS / 1e3,
+                 stats=None):
+        self.score_batch = score_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = stats
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """Applications waiting to be scored"""
+        return self._queue.qsize()
+
+    def submit(self, application):
+        """Queue one cleaned application; the returned Future resolves to its result dict"""
+        future = Future()
+        self._queue.put((application, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        if self.stats is not None:
+            self.stats.record_batch(len(batch))
+        outcomes = score_isolated(self.score_batch, [application for application, _ in batch])
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+class ScoringService:
+    """CreditRiskScorer plus the micro-batcher and metrics shared by all request threads"""
+
+    def __init__(self, scorer, max_batch=DEFAULT_MAX_BATCH, batch_window_ms=DEFAULT_BATCH_WINDOW_MS):
+        self.scorer = scorer
+        self.stats = LatencyStats()
+        self.batcher = MicroBatcher(self.score_applications, max_batch=max_batch,
+                                    max_wait=batch_window_ms / 1e3, stats=self.stats)
+
+    def score_applications(self, applications):
+        """Score cleaned applications in one call and return one result dict per row"""
+        with stage('server.build_frame'):
+            df = pd.DataFrame.from_records(applications, columns=INPUT_FEATURES)
+        with stage('server.score'):
+            proba, labels, valid = self.scorer.score(df)
+
+        results = []
+        for i in range(len(df)):
+            if valid[i]:
+                results.append({
+                    'predicted_loan_status': int(labels[i]),
+                    'default_probability': float(proba[i]),
+                    'risk_level': 'High Risk' if labels[i] == 1 else 'Low Risk',
+                })
+            else:
+                results.append({'error': self._describe_invalid(df.iloc[[i]])})
+        return results
+
+    def _describe_invalid(self, row):
+        try:
+            self.scorer.transform.transform(row, strict=True)
+        except ValueError as e:
+            return str(e)
+        return "Invalid input"
+
+    def score_one(self, application):
+        """Score a single application through the micro-batcher"""
+        cleaned = clean_application(application, self.scorer.transform.optional_features)
+        return self.batcher.submit(cleaned).result(timeout=REQUEST_TIMEOUT)
+
+    def score_many(self, applications):
+        """Score a list of applications directly; it is already a batch.
+
+        Every application gets its own result: one that fails validation or
+        scoring gets {'error': ...} without affecting the others.
+        """
+        optional = self.scorer.transform.optional_features
+        results = [None] * len(applications)
+        cleaned = []
+        for i, application in enumerate(applications):
+            try:
+                cleaned.append((i, clean_application(application, optional)))
+            except ValueError as e:
+                results[i] = {'error': str(e)}
+        outcomes = score_isolated(self.score_applications, [application for _, application in cleaned]) if cleaned else []
+        for (i, _), (result, error) in zip(cleaned, outcomes):
+            results[i] = result if error is None else {'error': f"Scoring failed: {error}"}
+        return results
+
+    def metrics(self):
+        snapshot = self.stats.snapshot()
+        snapshot['queue_depth'] = self.batcher.depth
+        snapshot['threshold'] = self.scorer.threshold
+        if self.scorer.cache is not None:
+            snapshot['result_cache'] = self.scorer.cache.stats()
+        if instrumentation.enabled():
+            stages = instrumentation.snapshot()
+            snapshot['stages'], snapshot['counters'] = stages['stages'], stages['counters']
+        return snapshot
+
+    def close(self):
+        self.batcher.close()
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "CreditRiskScoring/1.0"
+    # Headers and body are separate writes; with Nagle on, keep-alive clients wait for a delayed ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'threshold': self.service.scorer.threshold})
+        elif self.path == '/metrics':
+            self._send_json(200, self.service.metrics())
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ('/score', '/score/batch'):
+            self._send_json(404, {'error': f"Unknown endpoint {self.path}"})
+            return
+
+        start = time.perf_counter()
+        endpoint = 'score' if self.path == '/score' else 'batch'
+        rows = 0
+        status = 200
+        try:
+            payload = self._read_json()
+            if endpoint == 'score':
+                rows = 1
+                body = self.service.score_one(payload)
+                if 'error' in body:
+                    status = 422
+            else:
+                applications = payload.get('applications') if isinstance(payload, dict) else payload
+                if not isinstance(applications, list):
+                    raise ValueError("Expected a JSON list or {\"applications\": [...]}")
+                rows = len(applications)
+                body = {'results': self.service.score_many(applications)}
+        except ValueError as e:
+            status, body = 400, {'error': str(e)}
+        except Exception as e:
+            status, body = 500, {'error': f"Scoring failed: {e}"}
+
+        self._send_json(status, body)
+        self.service.stats.record_request(endpoint, time.perf_counter() - start, rows, error=status != 200)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"Request body larger than {MAX_BODY_BYTES} bytes")
+        try:
+            return json.loads(self.rfile.read(length) or b'null')
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """Create (but do not start) a threading HTTP server around a ScoringService"""
+    server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the credit risk model over HTTP on localhost")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Interface to bind (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument('--model', default="model.skops", help="Path to model.skops")
+    parser.add_argument('--lambdas', default="lambdas.pkl", help="Path to lambdas.pkl")
+    parser.add_argument('--sklearn', action='store_true',
+                        help="Evaluate the trees with sklearn instead of the compiled ensemble")
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="How long to collect single requests into one batch")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help="Largest micro-batch")
+    parser.add_argument('--no-result-cache', action='store_true',
+                        help="Score repeated applications again instead of answering from the result cache")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    parser.add_argument('--stages', action='store_true',
+                        help="Time the scoring stages and report them under /metrics (see instrumentation.py)")
+    parser.add_argument('--metrics', default=None, help="Also write the stage timings to this JSON file")
+    parser.add_argument('--profile', default=None,
+                        help="Sample the stacks while serving and write them in collapsed format on exit")
+    args = parser.parse_args(argv)
+
+    if args.stages or args.metrics or args.profile:
+        instrumentation.configure(metrics_path=args.metrics, profile_path=args.profile)
+    else:
+        instrumentation.configure_from_env()
+
+    scorer = CreditRiskScorer.from_files(args.model, args.lambdas, compiled=not args.sklearn,
+                                         cache=not args.no_result_cache)
+    service = ScoringService(scorer, max_batch=args.max_batch, batch_window_ms=args.batch_window_ms)
+    server = make_server(service, args.host, args.port, verbose=args.verbose)
+    print(f"Serving credit risk model on http://{args.host}:{server.server_port} "
+          f"(threshold {scorer.threshold:.2f}, batch window {args.batch_window_ms:g} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
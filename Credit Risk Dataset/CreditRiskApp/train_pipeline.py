@@ -0,0 +1,322 @@
+"""Reproducible training of the credit risk model, outside the notebook.
+
+Runs the notebook's training path as five stages:
+
+    profile   one streaming pass of data quality checks over the raw CSV (profiling.py)
+    clean     raw CSV (via data_loader) -> deduplicated, sanity-filtered dataset
+    prepare   train/val/test split, Box-Cox lambdas
+    fit       Pipeline(imputer, preprocessor, GradientBoosting) on train + val
+    evaluate  accuracy and F1 at the decision threshold, ROC-AUC, on the test split
+
+The first four are cached in .train_cache/ under a key built from the
+content of their inputs (dataset bytes, the source of every app module the
+stages import, parameters and library versions), so changing only the model
+parameters skips cleaning and preparation, and an unchanged rerun loads the
+fitted model. Profile
+errors (missing columns, unparseable or mostly empty values) stop the run
+before cleaning; warnings are logged and recorded in the manifest. Cache
+files are pickles: keep the directory writable only by the operator.
+
+The result is written as one versioned bundle, bundles/<version>/, holding
+model.skops, lambdas.pkl, best_xgb_params.json, decision_threshold.json,
+data_profile.json (the reference for scoring.py --check), drift_reference.json
+(histograms of the raw train + val rows the model is fit on, for
+drift_monitor.py) and a manifest.json with hashes, metrics and library
+versions. --install copies the bundle into the app directory.
+
+Usage:
+    python train_pipeline.py
+    python train_pipeline.py --params ../params/best_xgb_params.json --install
+"""
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import platform
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import drift_monitor
+import profiling
+import training_data
+from data_loader import load_dataset
+from drift_monitor import DRIFT_REFERENCE_FILE, DriftReference
+from file_digest import file_digest
+from profiling import DATA_PROFILE_FILE, ProfileReport, check_profile, profile_csv
+from scoring import THRESHOLD_FILE, load_threshold
+from training_data import (DATASET_PATH, PARAMS_PATH, PROJECT_DIR, RANDOM_STATE, clean_dataset, fit_rows,
+                           make_preprocessing_steps, numeric_features, prepare_splits)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(APP_DIR, ".train_cache")
+DEFAULT_BUNDLE_DIR = os.path.join(PROJECT_DIR, "bundles")
+BUNDLE_FILES = ("model.skops", "lambdas.pkl", "best_xgb_params.json", THRESHOLD_FILE, DATA_PROFILE_FILE,
+                DRIFT_REFERENCE_FILE)
+# Files copied into the app directory by --install
+INSTALL_FILES = ("model.skops", "lambdas.pkl", THRESHOLD_FILE, DATA_PROFILE_FILE, DRIFT_REFERENCE_FILE)
+
+
+def _digest(*parts):
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def local_imports(module_name, app_dir=APP_DIR):
+    """Paths of module_name and every app module it imports, directly or indirectly"""
+    paths, pending = set(), [module_name]
+    while pending:
+        path = os.path.join(app_dir, f"{pending.pop()}.py")
+        if path in paths or not os.path.exists(path):
+            continue
+        paths.add(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split('.')[0])
+    return sorted(paths)
+
+
+def code_digest():
+    """Hash of the code the cached stages run, so editing any of it invalidates them.
+
+    Covers every app module training_data imports (loading, cleaning,
+    FeatureTransform, the imputer) and the source of fit_pipeline().
+    """
+    files = local_imports(training_data.__name__)
+    return _digest(*(f"{os.path.basename(path)}:{file_digest(path)}" for path in files),
+                   inspect.getsource(fit_pipeline))
+
+
+class StageCache:
+    """Pickled stage outputs keyed by a hash of everything the stage depends on"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, enabled=True, log=print):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.log = log
+
+    def run(self, stage, key, compute):
+        """Return compute() for this key, loading it from disk when it was cached before"""
+        path = os.path.join(self.cache_dir, f"{stage}-{key[:16]}.pkl")
+        start = time.perf_counter()
+        if self.enabled and os.path.exists(path):
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            self.log(f"{stage:<9} cached   {time.perf_counter() - start:6.2f}s  ({key[:12]})")
+            return value
+
+        value = compute()
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        self.log(f"{stage:<9} computed {time.perf_counter() - start:6.2f}s  ({key[:12]})")
+        return value
+
+
+def load_params(params_path=PARAMS_PATH):
+    with open(params_path, 'r') as f:
+        return json.load(f)
+
+
+def fit_pipeline(data, params):
+    """Fit the final Pipeline (grouped imputer, preprocessor, model) on train + val"""
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.pipeline import Pipeline
+
+    X = pd.concat([data['X_train'], data['X_val']], axis=0)
+    y = pd.concat([data['y_train'], data['y_val']], axis=0)
+    pipeline = Pipeline(make_preprocessing_steps(numeric_features(X)) + [
+        ('model', GradientBoostingClassifier(**params, random_state=RANDOM_STATE)),
+    ])
+    return pipeline.fit(X, y)
+
+
+def evaluate(pipeline, data, threshold=0.5):
+    """Test-split metrics as reported at the end of the notebook; labels use the deployed threshold"""
+    from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+
+    y_test = data['y_test']
+    y_proba = pipeline.predict_proba(data['X_test'])[:, 1]
+    # The same rule as CreditRiskScorer.score, not predict()'s fixed 0.5
+    y_pred = (y_proba >= threshold).astype(int)
+    return {
+        'threshold': threshold,
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'f1': float(f1_score(y_test, y_pred)),
+        'roc_auc': float(roc_auc_score(y_test, y_proba)),
+    }
+
+
+def check_training_data(dataset_path, cache, code, log=print):
+    """Profile the raw dataset; raise ValueError on profile errors and log warnings.
+
+    code is code_digest(); profiling.py is hashed on top of it since
+    training_data does not import it.
+    """
+    profile_key = _digest('profile', file_digest(dataset_path), code, file_digest(profiling.__file__),
+                          np.__version__, pd.__version__)
+    profile = cache.run('profile', profile_key, lambda: profile_csv(dataset_path).data)
+    errors, warnings = check_profile(ProfileReport(profile), required=profiling.INPUT_FEATURES + [profiling.TARGET],
+                                     training=True)
+    for message in warnings:
+        log(f"WARNING: {message}")
+    if errors:
+        raise ValueError(f"{dataset_path} failed the data checks: " + '; '.join(errors))
+    return profile, warnings
+
+
+def train(dataset_path=DATASET_PATH, params=None, cache=None, log=print, threshold=0.5):
+    """Run the stages and return a dict with the pipeline, lambdas, metrics (at threshold) and stage keys"""
+    import sklearn
+
+    cache = cache or StageCache(log=log)
+    params = params if params is not None else load_params()
+    code = code_digest()
+    profile, data_warnings = check_training_data(dataset_path, cache, code, log)
+    clean_key = _digest('clean', file_digest(dataset_path), code, np.__version__, pd.__version__)
+    df = cache.run('clean', clean_key, lambda: clean_dataset(load_dataset(dataset_path)))
+
+    prepare_key = _digest('prepare', clean_key)
+    data = cache.run('prepare', prepare_key, lambda: prepare_splits(df))
+
+    # Raw inputs, as the prediction log stores them, of exactly the rows the model is fit on
+    reference_key = _digest('reference', prepare_key, file_digest(drift_monitor.__file__))
+    drift_reference = cache.run('reference', reference_key,
+                                lambda: DriftReference.from_frame(fit_rows(load_dataset(dataset_path), data)).features)
+
+    fit_key = _digest('fit', prepare_key, json.dumps(params, sort_keys=True), sklearn.__version__)
+    pipeline = cache.run('fit', fit_key, lambda: fit_pipeline(data, params))
+
+    start = time.perf_counter()
+    metrics = evaluate(pipeline, data, threshold)
+    log(f"{'evaluate':<9} computed {time.perf_counter() - start:6.2f}s  "
+        f"(accuracy {metrics['accuracy']:.4f}, F1 {metrics['f1']:.4f} at threshold {threshold:.2f}, "
+        f"ROC-AUC {metrics['roc_auc']:.4f})")
+
+    return {
+        'pipeline': pipeline,
+        'lambdas': data['lambdas'],
+        'params': params,
+        'metrics': metrics,
+        'profile': profile,
+        'drift_reference': drift_reference,
+        'data_warnings': data_warnings,
+        'keys': {'clean': clean_key, 'prepare': prepare_key, 'fit': fit_key},
+        'rows': {split: len(data[f'y_{split}']) for split in ('train', 'val', 'test')},
+        'dataset': {'path': os.path.abspath(dataset_path), 'sha256': file_digest(dataset_path)},
+    }
+
+
+def _library_versions():
+    versions = {'python': platform.python_version()}
+    for name in ('numpy', 'pandas', 'sklearn', 'scipy', 'skops', 'joblib'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    return versions
+
+
+def write_bundle(result, bundle_dir=DEFAULT_BUNDLE_DIR, threshold=0.5):
+    """Write the trained artifacts as bundles/<version>/ and return its path"""
+    import joblib
+    import skops.io as sio
+
+    created = datetime.now()
+    version = f"{created.strftime('%Y%m%d-%H%M%S')}-{result['keys']['fit'][:8]}"
+    path = os.path.join(bundle_dir, version)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    sio.dump(result['pipeline'], os.path.join(tmp_path, "model.skops"))
+    joblib.dump(result['lambdas'], os.path.join(tmp_path, "lambdas.pkl"))
+    with open(os.path.join(tmp_path, "best_xgb_params.json"), 'w') as f:
+        json.dump(result['params'], f, indent=4)
+    with open(os.path.join(tmp_path, THRESHOLD_FILE), 'w') as f:
+        json.dump({'threshold': threshold}, f, indent=4)
+    ProfileReport(result['profile']).save(os.path.join(tmp_path, DATA_PROFILE_FILE))
+    DriftReference(result['drift_reference']).save(os.path.join(tmp_path, DRIFT_REFERENCE_FILE))
+
+    manifest = {
+        'version': version,
+        'created': created.isoformat(timespec='seconds'),
+        'dataset': result['dataset'],
+        'rows': result['rows'],
+        'stage_keys': result['keys'],
+        'params': result['params'],
+        'threshold': threshold,
+        'metrics': result['metrics'],
+        'data_warnings': result['data_warnings'],
+        'files': {name: file_digest(os.path.join(tmp_path, name)) for name in BUNDLE_FILES},
+        'libraries': _library_versions(),
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    os.replace(tmp_path, path)
+    with open(os.path.join(bundle_dir, "LATEST"), 'w') as f:
+        f.write(version + '\n')
+    return path
+
+
+def install_bundle(bundle_path, app_dir=APP_DIR):
+    """Copy a bundle's model, lambdas, threshold and data references into the app directory after checking hashes"""
+    with open(os.path.join(bundle_path, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+    # Older bundles have no data_profile.json or drift_reference.json
+    names = [name for name in INSTALL_FILES if name in manifest['files']]
+    for name in names:
+        if file_digest(os.path.join(bundle_path, name)) != manifest['files'][name]:
+            raise ValueError(f"{name} in {bundle_path} does not match its manifest")
+    for name in names:
+        shutil.copyfile(os.path.join(bundle_path, name), os.path.join(app_dir, name))
+    return manifest['version']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the credit risk model and write a versioned bundle")
+    parser.add_argument('--dataset', default=DATASET_PATH, help="Training dataset CSV")
+    parser.add_argument('--params', default=PARAMS_PATH, help="Model parameters JSON (from tuning.py)")
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="Decision threshold stored in the bundle (default: the app's current one)")
+    parser.add_argument('--bundle-dir', default=DEFAULT_BUNDLE_DIR, help="Where bundles are written")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Stage cache directory")
+    parser.add_argument('--no-cache', action='store_true', help="Recompute every stage")
+    parser.add_argument('--install', nargs='?', const=APP_DIR, default=None, metavar='APP_DIR',
+                        help="Copy the model, lambdas, threshold and data references into the app directory")
+    args = parser.parse_args(argv)
+
+    threshold = args.threshold
+    if threshold is None:
+        threshold = load_threshold(os.path.join(APP_DIR, THRESHOLD_FILE))
+    if not 0.0 < threshold < 1.0:
+        parser.error(f"--threshold must be between 0 and 1, got {threshold}")
+    if args.install and not os.path.isdir(args.install):
+        parser.error(f"--install directory {args.install} does not exist")
+
+    start = time.perf_counter()
+    result = train(args.dataset, load_params(args.params), StageCache(args.cache_dir, enabled=not args.no_cache),
+                   threshold=threshold)
+    bundle_path = write_bundle(result, args.bundle_dir, threshold)
+    print(f"Bundle written to {bundle_path} in {time.perf_counter() - start:.1f}s")
+    if args.install:
+        version = install_bundle(bundle_path, args.install)
+        print(f"Installed bundle {version} into {args.install}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Training data preparation from the notebook, as reusable functions.
+
+Cleans credit_risk_dataset.csv the way the training notebook does, splits
+it 70/15/15 (stratified, random_state=42), fits the Box-Cox lambdas on
+train and applies them with the same FeatureTransform as the app. Missing
+interest rates are left in the splits: the model Pipeline starts with a
+GroupMedianImputer that learns the per-grade medians from train only.
+Used by the tuning and training scripts.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_dataset
+from feature_transform import BINARY_FEATURE, CLEANING_RULES, FILL_VALUES, FeatureTransform, LOG_FEATURE, RARE_GRADES
+from imputation import GroupMedianImputer
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_PATH = os.path.join(PROJECT_DIR, 'credit_risk_dataset.csv')
+PARAMS_PATH = os.path.join(PROJECT_DIR, 'params', 'best_xgb_params.json')
+
+TARGET = 'loan_status'
+RANDOM_STATE = 42
+GRADE_ORDER = ['A', 'B', 'C', 'D', 'E', 'Other']
+ONEHOT_FEATURES = ['person_home_ownership', 'loan_intent']
+ORDINAL_FEATURES = ['loan_grade']
+IMPUTED_FEATURES = ['loan_int_rate']
+BOXCOX_FEATURES = ['person_age', 'person_emp_length', 'loan_amnt', 'loan_int_rate',
+                   'loan_percent_income', 'cb_person_cred_hist_length']
+
+
+def clean_dataset(df):
+    """Deduplicate, encode and sanity-filter the raw dataset"""
+    df = df.drop_duplicates().copy()
+    # data_loader already maps the flag to int8 while parsing
+    if not pd.api.types.is_numeric_dtype(df[BINARY_FEATURE]):
+        df[BINARY_FEATURE] = df[BINARY_FEATURE].map({'N': 0, 'Y': 1})
+    df = df.fillna(FILL_VALUES)
+    for col, (low, high) in CLEANING_RULES.items():
+        df[col] = df[col].where(df[col].isna() | df[col].between(low, high))
+
+    # Employment and credit history cannot be longer than the applicant's age
+    df = df[df['person_emp_length'] <= df['person_age']]
+    df = df[df['cb_person_cred_hist_length'] <= df['person_age']].copy()
+
+    df[LOG_FEATURE] = np.log(df[LOG_FEATURE])
+    df['loan_grade'] = pd.Categorical(df['loan_grade'].astype(str).replace(RARE_GRADES, 'Other'),
+                                      categories=GRADE_ORDER, ordered=True)
+    return df
+
+
+def split_dataset(df):
+    """Stratified 70/15/15 train/validation/test split"""
+    from sklearn.model_selection import train_test_split
+
+    X = df.drop(TARGET, axis=1)
+    y = df[TARGET]
+    X_train, X_temp, y_train, y_temp = train_test_split(
+        X, y, test_size=0.3, random_state=RANDOM_STATE, stratify=y)
+    X_val, X_test, y_val, y_test = train_test_split(
+        X_temp, y_temp, test_size=0.5, random_state=RANDOM_STATE, stratify=y_temp)
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+
+def fit_lambdas(X_train, features=BOXCOX_FEATURES):
+    """Fit Box-Cox lambdas on the observed train values; columns with non-positive values get a shift"""
+    from scipy import stats
+
+    lambdas = {}
+    for col in features:
+        values = X_train[col].dropna()
+        shift = abs(values.min()) + 1 if (values <= 0).any() else 0
+        _, lambda_ = stats.boxcox(values + shift)
+        lambdas[col] = (float(lambda_), float(shift))
+    return lambdas
+
+
+def make_preprocessor(numeric_features):
+    """ColumnTransformer used in front of every model in the notebook"""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, RobustScaler
+
+    return ColumnTransformer([
+        ('num', RobustScaler(), numeric_features),
+        ('onehot', OneHotEncoder(drop='first', handle_unknown='ignore'), ONEHOT_FEATURES),
+        ('ordinal', OrdinalEncoder(categories=[GRADE_ORDER]), ORDINAL_FEATURES),
+    ], remainder='passthrough')
+
+
+def make_preprocessing_steps(numeric_features):
+    """Pipeline steps in front of the model: grouped imputation, then the ColumnTransformer"""
+    return [
+        ('imputer', GroupMedianImputer('loan_grade', IMPUTED_FEATURES)),
+        ('preprocessor', make_preprocessor(numeric_features)),
+    ]
+
+
+def numeric_features(X):
+    return X.select_dtypes(include=[np.number]).columns.tolist()
+
+
+def prepare_splits(df, lambdas=None):
+    """Split a cleaned dataset and apply Box-Cox, keeping missing values as NaN.
+
+    The result is a dict with X_train, X_val, X_test, y_train, y_val,
+    y_test and the lambdas (fitted on train unless given).
+    """
+    X_train, X_val, X_test, y_train, y_val, y_test = split_dataset(df)
+    if lambdas is None:
+        lambdas = fit_lambdas(X_train)
+    transform = FeatureTransform(lambdas)
+    return {
+        'X_train': transform.transform_boxcox(X_train),
+        'X_val': transform.transform_boxcox(X_val),
+        'X_test': transform.transform_boxcox(X_test),
+        'y_train': y_train,
+        'y_val': y_val,
+        'y_test': y_test,
+        'lambdas': lambdas,
+    }
+
+
+def fit_rows(raw, data):
+    """Rows of the raw dataset that ended up in the train and validation splits of prepare_splits()"""
+    return raw.loc[data['X_train'].index.union(data['X_val'].index)]
+
+
+def load_training_data(dataset_path=DATASET_PATH, lambdas=None):
+    """Return the notebook's Box-Cox transformed splits of the dataset file"""
+    return prepare_splits(clean_dataset(load_dataset(dataset_path)), lambdas)
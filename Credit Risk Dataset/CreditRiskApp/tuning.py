@@ -0,0 +1,277 @@
+"""Parallel, resumable hyperparameter search for the GradientBoosting model.
+
+Replaces the notebook's objective(), which refit the whole Pipeline inside
+cross_val_score for every trial. Here the preprocessor is fit once per CV
+fold and the fold matrices are cached on disk as .npy files (keyed by a
+hash of the training data), so every trial in every worker memory-maps the
+same matrices and only fits trees. Trials run in worker processes that
+share one Optuna study in a local journal file, so an interrupted search
+resumes where it stopped. Each trial grows its fold models in steps of
+--stage-step trees (warm_start, which builds exactly the same trees as one
+fit) and reports the mean F1 after each step, letting the median pruner
+stop unpromising trials early. The best parameters are written to
+params/best_xgb_params.json in the format the notebook reads.
+
+Usage:
+    python tuning.py --trials 200 --jobs 4
+    python tuning.py --trials 300 --timeout 900    # resumes the same study
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from training_data import (DATASET_PATH, PARAMS_PATH, RANDOM_STATE, load_training_data, make_preprocessing_steps,
+                           numeric_features)
+
+CACHE_DIR_NAME = ".tuning_cache"
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_DIR_NAME)
+STUDY_NAME = "credit_risk_gb_f1"
+DEFAULT_CV = 3
+DEFAULT_TRIALS = 100
+DEFAULT_TIMEOUT = 900
+STAGE_STEP = 25
+# Bump when the fold preprocessing or the cached file layout changes
+FOLD_CACHE_VERSION = 2
+
+
+def _require_optuna():
+    try:
+        import optuna
+    except ImportError:
+        raise ImportError("Tuning requires 'optuna'. Install it using: pip install optuna")
+    return optuna
+
+
+def suggest_params(trial):
+    """Search space of the notebook's objective()"""
+    return {
+        'n_estimators': trial.suggest_int('n_estimators', 50, 300),
+        'max_depth': trial.suggest_int('max_depth', 3, 8),
+        'learning_rate': trial.suggest_float('learning_rate', 0.05, 0.2),
+        'subsample': trial.suggest_float('subsample', 0.8, 1.0),
+        'min_samples_split': trial.suggest_int('min_samples_split', 2, 5),
+        'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 3),
+    }
+
+
+def fold_cache_key(X, y, cv):
+    import sklearn
+
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(np.asarray(y, dtype=np.int64).tobytes())
+    digest.update(f"{cv}|{RANDOM_STATE}|{sklearn.__version__}|{FOLD_CACHE_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _dense_float32(matrix):
+    if hasattr(matrix, 'toarray'):
+        matrix = matrix.toarray()
+    # GradientBoosting converts X to float32 on every fit; store it that way once
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+
+def build_fold_matrices(X, y, cv=DEFAULT_CV, cache_dir=DEFAULT_CACHE_DIR):
+    """Preprocess each CV fold once and return the directory holding the matrices.
+
+    The folds are those cross_val_score(cv=cv) used in the notebook
+    (StratifiedKFold without shuffling), with the imputer and preprocessor
+    fit on each fold's training part. An existing cache for the same data is reused.
+    """
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.pipeline import Pipeline
+
+    fold_dir = os.path.join(cache_dir, f"folds-{fold_cache_key(X, y, cv)}")
+    if os.path.exists(os.path.join(fold_dir, 'folds.json')):
+        return fold_dir
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = f"{fold_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    y = np.asarray(y, dtype=np.int64)
+    for i, (train_idx, val_idx) in enumerate(StratifiedKFold(n_splits=cv).split(X, y)):
+        preprocessor = Pipeline(make_preprocessing_steps(numeric_features(X))).fit(X.iloc[train_idx])
+        np.save(os.path.join(tmp_dir, f"fold{i}_X_train.npy"), _dense_float32(preprocessor.transform(X.iloc[train_idx])))
+        np.save(os.path.join(tmp_dir, f"fold{i}_X_val.npy"), _dense_float32(preprocessor.transform(X.iloc[val_idx])))
+        np.save(os.path.join(tmp_dir, f"fold{i}_y_train.npy"), y[train_idx])
+        np.save(os.path.join(tmp_dir, f"fold{i}_y_val.npy"), y[val_idx])
+    with open(os.path.join(tmp_dir, 'folds.json'), 'w') as f:
+        json.dump({'cv': cv, 'rows': len(y)}, f)
+    try:
+        os.replace(tmp_dir, fold_dir)
+    except OSError:
+        # Another process finished the same cache first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return fold_dir
+
+
+def load_fold_matrices(fold_dir):
+    """List of (X_train, y_train, X_val, y_val) per fold, memory-mapped read-only"""
+    with open(os.path.join(fold_dir, 'folds.json')) as f:
+        cv = json.load(f)['cv']
+    return [tuple(np.load(os.path.join(fold_dir, f"fold{i}_{name}.npy"), mmap_mode='r')
+                  for name in ('X_train', 'y_train', 'X_val', 'y_val'))
+            for i in range(cv)]
+
+
+def _advance_decision(model, X_val, decision, first_new_stage):
+    """Add the trees fitted since first_new_stage to the running decision function"""
+    if decision is None:
+        return model.decision_function(X_val)
+    for tree in model.estimators_[first_new_stage:, 0]:
+        decision = decision + model.learning_rate * tree.predict(X_val)
+    return decision
+
+
+def staged_cv_f1(params, folds, report=None, stage_step=STAGE_STEP):
+    """Mean F1 across folds, growing every fold model stage_step trees at a time.
+
+    report(score, n_trees) is called after each step and may raise to stop
+    the evaluation early.
+    """
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.metrics import f1_score
+
+    models = [GradientBoostingClassifier(**params, random_state=RANDOM_STATE, warm_start=True) for _ in folds]
+    decisions = [None] * len(folds)
+    n_trees, score = 0, 0.0
+    while n_trees < params['n_estimators']:
+        next_trees = min(n_trees + stage_step, params['n_estimators'])
+        scores = []
+        for i, (model, (X_train, y_train, X_val, y_val)) in enumerate(zip(models, folds)):
+            model.set_params(n_estimators=next_trees).fit(X_train, y_train)
+            decisions[i] = _advance_decision(model, X_val, decisions[i], n_trees)
+            # predict() picks class 1 exactly when the decision function is positive
+            scores.append(f1_score(y_val, (decisions[i] > 0).astype(np.int64)))
+        n_trees, score = next_trees, float(np.mean(scores))
+        if report is not None:
+            report(score, n_trees)
+    return score
+
+
+def make_objective(folds, stage_step=STAGE_STEP):
+    optuna = _require_optuna()
+
+    def objective(trial):
+        def report(score, n_trees):
+            trial.report(score, n_trees)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+
+        return staged_cv_f1(suggest_params(trial), folds, report, stage_step)
+
+    return objective
+
+
+def make_storage(storage_path):
+    """Journal file storage; safe for several local processes and resumable"""
+    optuna = _require_optuna()
+    from optuna.storages.journal import JournalFileBackend
+
+    return optuna.storages.JournalStorage(JournalFileBackend(storage_path))
+
+
+def make_pruner(stage_step=STAGE_STEP):
+    optuna = _require_optuna()
+    return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=2 * stage_step)
+
+
+def run_worker(storage_path, study_name, fold_dir, n_trials, timeout, stage_step, seed):
+    """Run trials in this process until the study holds n_trials finished trials or timeout passes"""
+    optuna = _require_optuna()
+    from optuna.trial import TrialState
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    sampler = optuna.samplers.TPESampler(seed=seed, constant_liar=True)
+    study = optuna.load_study(study_name=study_name, storage=make_storage(storage_path),
+                              sampler=sampler, pruner=make_pruner(stage_step))
+    finished = (TrialState.COMPLETE, TrialState.PRUNED, TrialState.FAIL)
+    if len(study.get_trials(deepcopy=False, states=finished)) >= n_trials:
+        return
+    objective = make_objective(load_fold_matrices(fold_dir), stage_step)
+    study.optimize(objective, timeout=timeout, callbacks=[optuna.study.MaxTrialsCallback(n_trials, finished)])
+
+
+def open_study(storage_path, study_name=STUDY_NAME, initial_params_path=None):
+    """Create or resume the study; trials left running by an interrupted search are marked failed"""
+    optuna = _require_optuna()
+    from optuna.trial import TrialState
+
+    os.makedirs(os.path.dirname(os.path.abspath(storage_path)), exist_ok=True)
+    study = optuna.create_study(study_name=study_name, storage=make_storage(storage_path),
+                                direction='maximize', load_if_exists=True)
+    for trial in study.get_trials(deepcopy=False, states=(TrialState.RUNNING,)):
+        study.tell(trial.number, state=TrialState.FAIL)
+    if not study.trials and initial_params_path and os.path.exists(initial_params_path):
+        # Start from the parameters found by the previous search
+        with open(initial_params_path) as f:
+            study.enqueue_trial(json.load(f))
+    return study
+
+
+def tune(dataset_path=DATASET_PATH, n_trials=DEFAULT_TRIALS, timeout=DEFAULT_TIMEOUT, n_jobs=None,
+         cv=DEFAULT_CV, storage_path=None, study_name=STUDY_NAME, cache_dir=DEFAULT_CACHE_DIR,
+         stage_step=STAGE_STEP, seed=RANDOM_STATE, initial_params_path=PARAMS_PATH):
+    """Tune on the notebook's training split and return the study"""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    storage_path = storage_path or os.path.join(cache_dir, f"{study_name}.journal")
+
+    data = load_training_data(dataset_path)
+    fold_dir = build_fold_matrices(data['X_train'], data['y_train'], cv, cache_dir)
+    open_study(storage_path, study_name, initial_params_path)
+
+    worker_args = (storage_path, study_name, fold_dir, n_trials, timeout, stage_step)
+    if n_jobs == 1:
+        run_worker(*worker_args, seed)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(run_worker, *worker_args, seed + i) for i in range(n_jobs)]
+            for future in futures:
+                future.result()
+
+    optuna = _require_optuna()
+    return optuna.load_study(study_name=study_name, storage=make_storage(storage_path))
+
+
+def save_best_params(study, output_path=PARAMS_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(study.best_params, f, indent=4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the credit risk GradientBoosting model with Optuna")
+    parser.add_argument('--dataset', default=DATASET_PATH, help="Training dataset CSV")
+    parser.add_argument('--trials', type=int, default=DEFAULT_TRIALS,
+                        help="Finished trials the study should hold; a resumed study runs the rest")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Time budget in seconds")
+    parser.add_argument('--jobs', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--cv', type=int, default=DEFAULT_CV, help="Cross-validation folds")
+    parser.add_argument('--stage-step', type=int, default=STAGE_STEP, help="Trees added between pruning checks")
+    parser.add_argument('--study-name', default=STUDY_NAME, help="Study to create or resume")
+    parser.add_argument('--storage', default=None, help="Journal file of the study")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Fold matrix cache directory")
+    parser.add_argument('--output', default=PARAMS_PATH, help="Where to write the best parameters")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    study = tune(args.dataset, args.trials, args.timeout, args.jobs, args.cv, args.storage, args.study_name,
+                 args.cache_dir, args.stage_step, initial_params_path=args.output)
+    states = pd.Series([trial.state.name for trial in study.trials]).value_counts().to_dict()
+    summary = ', '.join(f"{count} {state.lower()}" for state, count in states.items())
+    print(f"{len(study.trials)} trials ({summary}) in {time.perf_counter() - start:.0f}s")
+    print(f"Best F1: {study.best_value:.4f}")
+    save_best_params(study, args.output)
+    print(f"Best parameters saved to {args.output}: {study.best_params}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Shared helpers for the credit risk benchmarks"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(PROJECT_DIR, 'CreditRiskApp')
+DATASET_PATH = os.path.join(PROJECT_DIR, 'credit_risk_dataset.csv')
+LAMBDAS_PATH = os.path.join(PROJECT_DIR, 'lambdas.pkl')
+MODEL_PATH = os.path.join(APP_DIR, 'model.skops')
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+def load_applications(n_rows, seed=42):
+    """Return n_rows complete applications resampled from credit_risk_dataset.csv"""
+    df = pd.read_csv(DATASET_PATH).dropna()
+    df = df[(df['person_age'] <= 120) & (df['person_emp_length'] <= 100)]
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(df), size=n_rows)
+    return df.iloc[idx].reset_index(drop=True)
+
+
+def best_time(func, repeat=5, min_time=0.2):
+    """Best wall time of one call to func over several timed runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or elapsed * (calls + 1) / calls > 10 * min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
@@ -0,0 +1,57 @@
+"""sklearn pipeline vs compiled ensemble at batch sizes 1, 100 and 100k.
+
+Reports the time of the tree ensemble alone and of the full pipeline
+(ColumnTransformer + trees), and checks that the compiled probabilities
+match predict_proba.
+
+Usage:
+    python bench_compiled_ensemble.py [--model path/to/model.skops]
+"""
+import argparse
+
+import numpy as np
+
+from _common import LAMBDAS_PATH, MODEL_PATH, best_time, load_applications
+import compiled_ensemble
+from compiled_ensemble import CompiledPipeline
+from feature_transform import FeatureTransform
+from scoring import load_model
+
+BATCH_SIZES = [1, 100, 100000]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=MODEL_PATH, help="Path to model.skops")
+    parser.add_argument('--lambdas', default=LAMBDAS_PATH, help="Path to lambdas.pkl")
+    args = parser.parse_args()
+
+    pipeline = load_model(args.model)
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+    transform = FeatureTransform.from_file(args.lambdas)
+    backend = 'numba' if compiled_ensemble.numba_kernel() is not None else 'numpy'
+
+    print(f"{compiled.ensemble.n_trees} trees, max depth {compiled.ensemble.max_depth}, "
+          f"kernel for >= {compiled_ensemble.KERNEL_MIN_ROWS} rows: {backend}")
+    print(f"{'batch':>7} | {'stage':>8} | {'sklearn ms':>10} | {'compiled ms':>11} | {'speedup':>7} | max |diff|")
+    for n_rows in BATCH_SIZES:
+        X, valid = transform.transform(load_applications(n_rows))
+        X = X[valid]
+        Xt = pipeline[:-1].transform(X)
+        classifier = pipeline[-1]
+
+        diff = np.abs(compiled.predict_proba(X) - pipeline.predict_proba(X)).max()
+        np.testing.assert_allclose(compiled.predict_proba(X), pipeline.predict_proba(X), atol=1e-9)
+
+        repeat = 3 if n_rows > 1000 else 5
+        for stage, sk_func, fast_func in [
+            ('trees', lambda: classifier.predict_proba(Xt), lambda: compiled.ensemble.predict_proba(Xt)),
+            ('pipeline', lambda: pipeline.predict_proba(X), lambda: compiled.predict_proba(X)),
+        ]:
+            slow = best_time(sk_func, repeat=repeat) * 1e3
+            fast = best_time(fast_func, repeat=repeat) * 1e3
+            print(f"{n_rows:>7,} | {stage:>8} | {slow:>10.3f} | {fast:>11.3f} | {slow / fast:>6.1f}x | {diff:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Load time and memory of the dataset: default read_csv vs the schema loader and its binary cache.
+
+The dataset is replicated --scale times into a temporary CSV. Each load
+runs in a fresh interpreter so its peak RSS is measured on its own (read
+from /proc, so Linux only). "frame MiB" is memory_usage(deep=True) of the
+loaded DataFrame; memory-mapped cache columns count there but are backed
+by the page cache rather than private memory.
+
+Usage:
+    python bench_data_loader.py [--scale 1 100]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from _common import APP_DIR, DATASET_PATH
+
+LOAD_SCRIPT = """
+import json, sys, time
+import pandas as pd
+from data_loader import load_dataset
+path, mode, cache_dir = sys.argv[1], sys.argv[2], sys.argv[3]
+start = time.perf_counter()
+if mode == 'read_csv':
+    df = pd.read_csv(path)
+else:
+    df = load_dataset(path, cache_dir=cache_dir)
+seconds = time.perf_counter() - start
+frame_mb = df.memory_usage(deep=True).sum() / 2**20
+with open('/proc/self/status') as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+print(json.dumps({'seconds': seconds, 'frame_mb': frame_mb, 'peak_mb': peak_kb / 1024}))
+"""
+
+MODES = [('read_csv', 'read_csv defaults'), ('first', 'schema, build cache'), ('cached', 'schema, cached')]
+
+
+def run_load(path, mode, cache_dir):
+    result = subprocess.run([sys.executable, '-c', LOAD_SCRIPT, path, mode, cache_dir],
+                            cwd=APP_DIR, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 100], help="Copies of the dataset to load")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='data_loader_')
+    source = pd.read_csv(DATASET_PATH)
+    print(f"{'rows':>10} | {'load':<20} | {'seconds':>7} | {'frame MiB':>9} | {'peak MiB':>8}")
+    try:
+        for scale in sorted(args.scale):
+            path = os.path.join(work_dir, f'dataset_x{scale}.csv')
+            pd.concat([source] * scale, ignore_index=True).to_csv(path, index=False)
+            cache_dir = os.path.join(work_dir, f'cache_x{scale}')
+            for mode, label in MODES:
+                result = run_load(path, mode, cache_dir)
+                print(f"{len(source) * scale:>10,} | {label:<20} | {result['seconds']:>7.3f} | "
+                      f"{result['frame_mb']:>9.1f} | {result['peak_mb']:>8.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
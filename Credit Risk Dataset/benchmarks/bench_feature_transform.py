@@ -0,0 +1,53 @@
+"""Per-row cost of the feature transform at batch sizes 1, 1k and 1M.
+
+Compares the old GUI code path (pandas column assignment plus one
+stats.boxcox call per value) with the vectorized FeatureTransform.
+
+Usage:
+    python bench_feature_transform.py
+"""
+import numpy as np
+from scipy import stats
+
+from _common import LAMBDAS_PATH, best_time, load_applications
+from feature_transform import FeatureTransform
+
+BATCH_SIZES = [1, 1000, 1000000]
+# The per-value loop needs minutes at 1M rows, so it is only timed up to this size
+LEGACY_MAX_ROWS = 1000
+
+
+def legacy_transform(df, lambdas):
+    """The original predict_loan_status preprocessing, applied row by row"""
+    out = df.copy()
+    out['person_income'] = np.log(out['person_income'] + 1e-10)
+    out['loan_grade'] = out['loan_grade'].replace(['F', 'G'], 'Other')
+    for col, (lambda_, shift) in lambdas.items():
+        values = out[col].to_numpy(dtype=float)
+        transformed = np.empty_like(values)
+        for i, value in enumerate(values):
+            shifted_value = value + shift
+            if shifted_value <= 0:
+                raise ValueError(f"Value for {col} after shift is non-positive: {shifted_value}")
+            transformed[i] = stats.boxcox(shifted_value, lmbda=lambda_)
+        out[col] = transformed
+    return out
+
+
+def main():
+    transform = FeatureTransform.from_file(LAMBDAS_PATH)
+    lambdas = dict(zip(transform.boxcox_features, zip(transform.lambdas, transform.shifts)))
+
+    print(f"{'batch':>9} | {'legacy us/row':>14} | {'vectorized us/row':>18} | {'speedup':>8}")
+    for n_rows in BATCH_SIZES:
+        df = load_applications(n_rows)
+        fast = best_time(lambda: transform.transform(df), repeat=3) / n_rows * 1e6
+        if n_rows <= LEGACY_MAX_ROWS:
+            slow = best_time(lambda: legacy_transform(df, lambdas), repeat=3) / n_rows * 1e6
+            print(f"{n_rows:>9,} | {slow:>14.2f} | {fast:>18.3f} | {slow / fast:>7.1f}x")
+        else:
+            print(f"{n_rows:>9,} | {'n/a':>14} | {fast:>18.3f} | {'':>8}")
+
+
+if __name__ == "__main__":
+    main()
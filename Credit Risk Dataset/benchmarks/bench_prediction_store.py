@@ -0,0 +1,97 @@
+"""Per-prediction cost of the prediction log as it grows: SQLite store vs legacy CSV.
+
+One "prediction" is what the GUI does after every click: append one record
+and refresh the saved-predictions counter. The SQLite store is measured as
+configured in the GUI (one commit per record, synchronous=NORMAL, drift
+counts against the app's drift_reference.json); the legacy path appends with to_csv and counts with read_csv.
+
+Usage:
+    python bench_prediction_store.py [--max-rows 2000000] [--csv-max-rows 100000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from _common import APP_DIR, load_applications
+from drift_monitor import DRIFT_REFERENCE_FILE, load_reference
+from prediction_store import PREDICTION_COLUMNS, PredictionStore, make_record
+
+LOG_SIZES = [1000, 10000, 100000, 1000000, 2000000, 5000000]
+
+
+def make_records(n_rows, seed=0):
+    """n_rows prediction records built from resampled applications"""
+    df = load_applications(n_rows, seed=seed)
+    rng = np.random.default_rng(seed)
+    proba = rng.random(n_rows)
+    return [make_record(app, int(p >= 0.5), p) for app, p in zip(df.to_dict(orient='records'), proba)]
+
+
+def gui_drift_reference():
+    """The drift reference the GUI's store updates its counts against"""
+    return load_reference(os.path.join(APP_DIR, DRIFT_REFERENCE_FILE))
+
+
+def time_store_predictions(db_path, records, drift_reference=None):
+    with PredictionStore(db_path, batch_size=1, sync='normal', drift_reference=drift_reference) as store:
+        start = time.perf_counter()
+        for record in records:
+            store.append(record)
+            store.count()
+        return (time.perf_counter() - start) / len(records)
+
+
+def time_csv_predictions(csv_path, records):
+    start = time.perf_counter()
+    for record in records:
+        pd.DataFrame([record]).to_csv(csv_path, mode='a', header=False, index=False)
+        len(pd.read_csv(csv_path))
+    return (time.perf_counter() - start) / len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-rows', type=int, default=2000000, help="Largest log size for the store")
+    parser.add_argument('--csv-max-rows', type=int, default=100000,
+                        help="Largest log size for the CSV (at most 100000)")
+    parser.add_argument('--predictions', type=int, default=200, help="Timed predictions per log size")
+    args = parser.parse_args()
+
+    sizes = [n for n in LOG_SIZES if n <= args.max_rows]
+    timed = make_records(args.predictions, seed=1)
+    filler = make_records(100000)
+    reference = gui_drift_reference()
+    work_dir = tempfile.mkdtemp(prefix='prediction_store_')
+    db_path = os.path.join(work_dir, 'predictions.db')
+    csv_path = os.path.join(work_dir, 'predictions.csv')
+    pd.DataFrame(columns=PREDICTION_COLUMNS).to_csv(csv_path, index=False)
+
+    print(f"{'log rows':>10} | {'store ms/pred':>13} | {'csv ms/pred':>11}")
+    try:
+        # Bulk-fill both logs up to each size, then time GUI-style predictions
+        with PredictionStore(db_path, batch_size=len(filler), sync='off') as bulk_store:
+            for n_rows in sizes:
+                while bulk_store.count() < n_rows:
+                    bulk_store.append_many(filler[:n_rows - bulk_store.count()])
+                bulk_store.flush()
+                if n_rows <= args.csv_max_rows:
+                    missing = n_rows - len(pd.read_csv(csv_path))
+                    pd.DataFrame(filler[:missing]).to_csv(csv_path, mode='a', header=False, index=False)
+
+                store_ms = time_store_predictions(db_path, timed, reference) * 1e3
+                csv_ms = '-'
+                if n_rows <= args.csv_max_rows:
+                    n_csv = max(5, args.predictions // 20)
+                    csv_ms = f"{time_csv_predictions(csv_path, timed[:n_csv]) * 1e3:.2f}"
+                print(f"{n_rows:>10,} | {store_ms:>13.3f} | {csv_ms:>11}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
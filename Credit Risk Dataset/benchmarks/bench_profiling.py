@@ -0,0 +1,80 @@
+"""Data quality profile of the dataset: notebook-style per-column pandas calls vs one streaming pass.
+
+The notebook approach reads the whole CSV and computes isnull, nunique
+and the IQR outlier share column by column, each with its own quantile()
+calls. profiling.profile_csv reads the file in chunks and updates every
+statistic, including the quantile sketches, from each chunk. The dataset is
+replicated --scale times into a temporary CSV and each run happens in a
+fresh interpreter, so its peak RSS (read from /proc, Linux only) is its own.
+
+Usage:
+    python bench_profiling.py [--scale 1 100]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from _common import APP_DIR, DATASET_PATH
+
+PROFILE_SCRIPT = """
+import json, sys, time
+import pandas as pd
+from profiling import profile_csv
+path, mode = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if mode == 'pandas':
+    df = pd.read_csv(path)
+    summary = {}
+    for col in df.columns:
+        summary[col] = {'missing': int(df[col].isnull().sum()), 'distinct': int(df[col].nunique())}
+        if pd.api.types.is_numeric_dtype(df[col]):
+            q1, q3 = df[col].quantile(0.25), df[col].quantile(0.75)
+            iqr = q3 - q1
+            outliers = (df[col] < q1 - 1.5 * iqr) | (df[col] > q3 + 1.5 * iqr)
+            summary[col]['outlier_share'] = float(outliers.mean())
+            summary[col]['quantiles'] = df[col].quantile([0.01, 0.05, 0.5, 0.95, 0.99]).tolist()
+else:
+    profile_csv(path)
+seconds = time.perf_counter() - start
+with open('/proc/self/status') as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+print(json.dumps({'seconds': seconds, 'peak_mb': peak_kb / 1024}))
+"""
+
+MODES = [('pandas', 'per-column pandas'), ('streaming', 'profile_csv')]
+
+
+def run_profile(path, mode):
+    result = subprocess.run([sys.executable, '-c', PROFILE_SCRIPT, path, mode],
+                            cwd=APP_DIR, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 100], help="Copies of the dataset to profile")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='profiling_')
+    source = pd.read_csv(DATASET_PATH)
+    print(f"{'rows':>10} | {'profile':<18} | {'seconds':>7} | {'peak MiB':>8}")
+    try:
+        for scale in sorted(args.scale):
+            path = os.path.join(work_dir, f'dataset_x{scale}.csv')
+            pd.concat([source] * scale, ignore_index=True).to_csv(path, index=False)
+            for mode, label in MODES:
+                result = run_profile(path, mode)
+                print(f"{len(source) * scale:>10,} | {label:<18} | {result['seconds']:>7.3f} | "
+                      f"{result['peak_mb']:>8.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
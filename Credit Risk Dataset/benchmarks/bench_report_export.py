@@ -0,0 +1,75 @@
+"""Export time and peak memory vs prediction log size for CSV, Parquet and PDF.
+
+Every export runs in a fresh interpreter so its peak RSS is measured on its
+own (read from /proc, so Linux only). PDF exports are capped at --pdf-rows
+rows, since the rendered pages stay in memory until the file is written.
+
+Usage:
+    python bench_report_export.py [--sizes 100000 1000000] [--pdf-rows 5000]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from _common import APP_DIR
+from bench_prediction_store import make_records
+from prediction_store import PredictionStore
+
+EXPORT_SCRIPT = """
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+from prediction_store import PredictionStore
+from report_export import PredictionFilter, export_predictions
+db_path, output_path, max_rows = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+start = time.perf_counter()
+with PredictionStore(db_path) as store:
+    rows = export_predictions(store, output_path, PredictionFilter(min_probability=0.1), max_rows=max_rows)
+# VmHWM starts fresh at exec; ru_maxrss would inherit the benchmark process' peak
+with open('/proc/self/status') as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+print(json.dumps({'rows': rows, 'seconds': time.perf_counter() - start, 'peak_mb': peak_kb / 1024}))
+"""
+
+
+def run_export(db_path, output_path, max_rows):
+    result = subprocess.run([sys.executable, '-c', EXPORT_SCRIPT, db_path, output_path, json.dumps(max_rows)],
+                            cwd=APP_DIR, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000], help="Log sizes to test")
+    parser.add_argument('--pdf-rows', type=int, default=5000, help="Row cap for PDF exports")
+    args = parser.parse_args()
+
+    filler = make_records(100000)
+    work_dir = tempfile.mkdtemp(prefix='report_export_')
+    db_path = os.path.join(work_dir, 'predictions.db')
+    print(f"{'log rows':>10} | {'format':>7} | {'exported':>9} | {'seconds':>7} | {'us/row':>6} | {'peak MB':>7}")
+    try:
+        for n_rows in sorted(args.sizes):
+            with PredictionStore(db_path, batch_size=len(filler), sync='off') as store:
+                while store.count() < n_rows:
+                    store.append_many(filler[:n_rows - store.count()])
+
+            for fmt in ('csv', 'parquet', 'pdf'):
+                output_path = os.path.join(work_dir, f'export.{fmt}')
+                try:
+                    result = run_export(db_path, output_path, args.pdf_rows if fmt == 'pdf' else None)
+                except subprocess.CalledProcessError as e:
+                    print(f"{n_rows:>10,} | {fmt:>7} | skipped: {e.stderr.strip().splitlines()[-1]}")
+                    continue
+                per_row = result['seconds'] / max(result['rows'], 1) * 1e6
+                print(f"{n_rows:>10,} | {fmt:>7} | {result['rows']:>9,} | {result['seconds']:>7.2f} | "
+                      f"{per_row:>6.1f} | {result['peak_mb']:>7.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Model startup time: skops load vs fast-start cache (cold build and warm load).
+
+Each variant runs in a fresh interpreter so import time is included, the
+way the GUI and scoring.py pay it on launch.
+
+Usage:
+    python bench_startup.py [--model path/to/model.skops] [--repeat 3]
+"""
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import APP_DIR, LAMBDAS_PATH, MODEL_PATH
+
+SKOPS_LOAD = """
+import joblib, skops.io as sio
+from compiled_ensemble import CompiledPipeline
+model = sio.load({model!r}, trusted=sio.get_untrusted_types(file={model!r}))
+lambdas = joblib.load({lambdas!r})
+CompiledPipeline.from_pipeline(model)
+"""
+
+CACHE_LOAD = """
+from model_cache import load_model_artifacts
+load_model_artifacts({model!r}, {lambdas!r}, cache_dir={cache_dir!r})
+"""
+
+
+def run(code):
+    """Wall time of running code in a new interpreter started in the app directory"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=MODEL_PATH, help="Path to model.skops")
+    parser.add_argument('--lambdas', default=LAMBDAS_PATH, help="Path to lambdas.pkl")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='model_cache_')
+    try:
+        params = dict(model=args.model, lambdas=args.lambdas, cache_dir=cache_dir)
+        cold = []
+        for _ in range(args.repeat):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.append(run(CACHE_LOAD.format(**params)))
+        results = [
+            ('skops load', min(run(SKOPS_LOAD.format(**params)) for _ in range(args.repeat))),
+            ('cache build (cold)', min(cold)),
+            ('cache load (warm)', min(run(CACHE_LOAD.format(**params)) for _ in range(args.repeat))),
+        ]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    baseline = results[0][1]
+    print(f"{'variant':>18} | {'seconds':>7} | {'speedup':>7}")
+    for name, seconds in results:
+        print(f"{name:>18} | {seconds:>7.2f} | {baseline / seconds:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Load test for scoring_server.py on localhost.
+
+Runs concurrent clients that each send single-application POST /score
+requests over a keep-alive connection, then one bulk request, and prints
+client-side throughput and latency percentiles next to the server's
+/metrics. Without --url an in-process server is started on a free port.
+
+Usage:
+    python load_test_server.py [--clients 16] [--requests 200] [--url http://127.0.0.1:8080]
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from _common import LAMBDAS_PATH, MODEL_PATH, load_applications
+from feature_transform import INPUT_FEATURES
+from scoring import CreditRiskScorer
+from scoring_server import ScoringService, make_server
+
+
+def request(conn, method, path, body=None):
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    conn.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def client(host, port, applications, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        for application in applications:
+            start = time.perf_counter()
+            status, _ = request(conn, 'POST', '/score', application)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        conn.close()
+
+
+def start_local_server(args):
+    scorer = CreditRiskScorer.from_files(args.model, args.lambdas, compiled=True)
+    service = ScoringService(scorer, max_batch=args.max_batch, batch_window_ms=args.batch_window_ms)
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=None, help="Running server to test (default: start one in-process)")
+    parser.add_argument('--model', default=MODEL_PATH, help="Path to model.skops")
+    parser.add_argument('--lambdas', default=LAMBDAS_PATH, help="Path to lambdas.pkl")
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent client connections")
+    parser.add_argument('--requests', type=int, default=200, help="Single-row requests per client")
+    parser.add_argument('--bulk-rows', type=int, default=10000, help="Rows in the bulk request")
+    parser.add_argument('--batch-window-ms', type=float, default=5.0, help="In-process server batch window")
+    parser.add_argument('--max-batch', type=int, default=256, help="In-process server largest micro-batch")
+    args = parser.parse_args()
+
+    server = service = None
+    if args.url is None:
+        server, service = start_local_server(args)
+        host, port = '127.0.0.1', server.server_port
+    else:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+
+    df = load_applications(args.clients * args.requests + args.bulk_rows)[INPUT_FEATURES]
+    records = df.to_dict(orient='records')
+    singles, bulk = records[:args.clients * args.requests], records[args.clients * args.requests:]
+
+    try:
+        latencies, errors = [], []
+        threads = [threading.Thread(target=client, args=(host, port, singles[i::args.clients], latencies, errors))
+                   for i in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies_ms = np.array(latencies) * 1e3
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        print(f"POST /score: {len(latencies):,} requests from {args.clients} clients in {elapsed:.2f}s "
+              f"({len(latencies) / elapsed:,.0f} req/s, {len(errors)} errors)")
+        print(f"  client latency ms: p50 {p50:.2f} | p95 {p95:.2f} | p99 {p99:.2f} | max {latencies_ms.max():.2f}")
+
+        conn = http.client.HTTPConnection(host, port, timeout=300)
+        start = time.perf_counter()
+        status, body = request(conn, 'POST', '/score/batch', {'applications': bulk})
+        elapsed = time.perf_counter() - start
+        print(f"POST /score/batch: {len(bulk):,} rows in {elapsed:.2f}s ({len(bulk) / elapsed:,.0f} rows/s, "
+              f"status {status})")
+
+        _, metrics = request(conn, 'GET', '/metrics')
+        conn.close()
+        latency = metrics['latency_ms']
+        batches = metrics['micro_batches']
+        print(f"server latency ms: p50 {latency['p50']:.2f} | p95 {latency['p95']:.2f} | p99 {latency['p99']:.2f}")
+        print(f"micro-batches: {batches['count']:,}, mean size {batches['mean_size']:.1f}, "
+              f"max size {batches['max_size']}, queue depth {metrics['queue_depth']}")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
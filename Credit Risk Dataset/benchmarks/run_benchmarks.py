@@ -0,0 +1,286 @@
+"""Benchmark suite for the scoring and training paths, with machine-readable results and a regression gate.
+
+Runs offline against credit_risk_dataset.csv and synthetic copies of it
+scaled --scales times. A copy keeps the original rows and adds scale - 1
+resampled versions with person_income jittered by a few percent (and
+loan_percent_income recomputed), so the training path's deduplication does
+not collapse it back to the original. Per scale it measures:
+
+    model_load      fresh interpreter: skops load vs warm fast-start cache (scale independent)
+    single_row      CreditRiskScorer.score on one application, result cache off: p50/p99
+    batch           score_file over the scaled CSV: rows/sec
+    prediction_log  GUI-style append + count, drift counts included, with the log at the scaled size:
+                    ms/prediction (best run)
+    export          CSV and Parquet export of that log (fresh interpreter): seconds
+    retrain         train_pipeline.train without the stage cache (--retrain-scales only): seconds
+
+Seeds are fixed. Results go to --output as JSON together with the library
+versions, CPU count and git commit. With --baseline (an earlier results
+file) every gated metric that is worse than the baseline by more than
+--tolerance (relative) is reported and the run exits with status 1.
+Tail latencies and the retrained model's ROC-AUC are recorded but not
+gated.
+
+Usage:
+    python run_benchmarks.py --output baseline.json
+    python run_benchmarks.py --baseline baseline.json --tolerance 0.2
+    python run_benchmarks.py --scales 1 10 100 --retrain-scales 1 10 --benchmarks batch retrain
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from _common import APP_DIR, DATASET_PATH, LAMBDAS_PATH, MODEL_PATH, load_applications
+from bench_prediction_store import gui_drift_reference, make_records, time_store_predictions
+from bench_report_export import run_export
+from bench_startup import CACHE_LOAD, SKOPS_LOAD, run
+from prediction_store import PredictionStore
+
+BENCHMARKS = ('model_load', 'single_row', 'batch', 'prediction_log', 'export', 'retrain')
+DEFAULT_TOLERANCE = 0.25
+INCOME_JITTER = 0.03
+SINGLE_ROW_CALLS = 500
+TIMED_PREDICTIONS = 200
+EXPORT_FORMATS = ('csv', 'parquet')
+
+
+def scaled_dataset(source, scale, path, seed=0):
+    """Write scale copies of the dataset to path: the original rows plus jittered resamples"""
+    parts = [source]
+    rng = np.random.default_rng(seed)
+    for _ in range(scale - 1):
+        copy = source.iloc[rng.integers(0, len(source), size=len(source))].reset_index(drop=True)
+        income = copy['person_income'] * (1 + INCOME_JITTER * rng.standard_normal(len(copy)))
+        copy['person_income'] = income.round().clip(lower=1).astype(int)
+        copy['loan_percent_income'] = (copy['loan_amnt'] / copy['person_income']).round(2)
+        parts.append(copy)
+    pd.concat(parts, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+class Results:
+    """Named measurements: value, unit, whether lower is better and whether the gate checks it"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, lower_is_better=True, gated=True):
+        self.metrics[name] = {'value': float(value), 'unit': unit, 'lower_is_better': lower_is_better,
+                              'gated': gated}
+        print(f"{name:<36} {value:>12,.4f} {unit}", flush=True)
+
+
+def bench_model_load(results, model_path, lambdas_path, repeat):
+    cache_dir = tempfile.mkdtemp(prefix='model_cache_')
+    try:
+        params = dict(model=model_path, lambdas=lambdas_path, cache_dir=cache_dir)
+        results.add('model_load.skops', min(run(SKOPS_LOAD.format(**params)) for _ in range(repeat)), 's')
+        # The first load builds the cache; the GUI pays this once per model version
+        results.add('model_load.cache_build', run(CACHE_LOAD.format(**params)), 's')
+        results.add('model_load.cache_warm', min(run(CACHE_LOAD.format(**params)) for _ in range(repeat)), 's')
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def bench_single_row(results, scorer):
+    rows = load_applications(SINGLE_ROW_CALLS, seed=7)
+    frames = [rows.iloc[[i]] for i in range(len(rows))]
+    for frame in frames[:20]:
+        scorer.score(frame, strict=True)
+    seconds = []
+    for frame in frames:
+        start = time.perf_counter()
+        scorer.score(frame, strict=True)
+        seconds.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(np.array(seconds) * 1e3, [50, 99])
+    results.add('single_row.p50', p50, 'ms')
+    results.add('single_row.p99', p99, 'ms', gated=False)
+
+
+def bench_batch(results, scorer, dataset_path, scale, work_dir):
+    from scoring import score_file
+
+    summary = score_file(dataset_path, os.path.join(work_dir, 'scored.csv'), scorer=scorer)
+    results.add(f'batch.x{scale}', summary['rows_per_sec'], 'rows/s', lower_is_better=False)
+
+
+def fill_log(db_path, n_rows, filler):
+    """Grow the prediction log at db_path to n_rows records"""
+    with PredictionStore(db_path, batch_size=len(filler), sync='off') as store:
+        while store.count() < n_rows:
+            store.append_many(filler[:n_rows - store.count()])
+
+
+def bench_prediction_log(results, db_path, scale, repeat):
+    timed = make_records(TIMED_PREDICTIONS, seed=1)
+    reference = gui_drift_reference()
+    # A few hundred commits are at the mercy of the disk; the best run is the stable figure
+    seconds = min(time_store_predictions(db_path, timed, reference) for _ in range(repeat))
+    results.add(f'prediction_log.x{scale}', seconds * 1e3, 'ms/prediction')
+
+
+def bench_export(results, db_path, scale, work_dir):
+    for fmt in EXPORT_FORMATS:
+        result = run_export(db_path, os.path.join(work_dir, f'export.{fmt}'), None)
+        results.add(f'export.{fmt}.x{scale}', result['seconds'], 's')
+
+
+def bench_retrain(results, dataset_path, scale):
+    from train_pipeline import StageCache, train
+
+    start = time.perf_counter()
+    result = train(dataset_path, cache=StageCache(enabled=False, log=lambda message: None), log=lambda message: None)
+    results.add(f'retrain.x{scale}', time.perf_counter() - start, 's')
+    results.add(f'retrain.x{scale}.roc_auc', result['metrics']['roc_auc'], '', lower_is_better=False, gated=False)
+
+
+def environment():
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=APP_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def run_suite(benchmarks, scales, retrain_scales, model_path, lambdas_path, repeat=3):
+    """Run the selected benchmarks and return a Results"""
+    from scoring import CreditRiskScorer
+
+    results = Results()
+    needs_model = {'model_load', 'single_row', 'batch'} & set(benchmarks)
+    if needs_model and not os.path.exists(model_path):
+        raise FileNotFoundError(f"{model_path} not found; train one with train_pipeline.py or pass --model")
+    if 'model_load' in benchmarks:
+        bench_model_load(results, model_path, lambdas_path, repeat)
+
+    scorer = None
+    if {'single_row', 'batch'} & set(benchmarks):
+        # The result cache would answer repeated rows without scoring them
+        scorer = CreditRiskScorer.from_files(model_path, lambdas_path, compiled=True, cache=False)
+    if 'single_row' in benchmarks:
+        bench_single_row(results, scorer)
+
+    source = pd.read_csv(DATASET_PATH)
+    work_dir = tempfile.mkdtemp(prefix='benchmarks_')
+    try:
+        filler = make_records(100000) if {'prediction_log', 'export'} & set(benchmarks) else None
+        db_path = os.path.join(work_dir, 'predictions.db')
+        for scale in sorted(set(scales) | set(retrain_scales if 'retrain' in benchmarks else ())):
+            dataset_path = scaled_dataset(source, scale, os.path.join(work_dir, f'dataset_x{scale}.csv'))
+            if scale in scales:
+                if 'batch' in benchmarks:
+                    bench_batch(results, scorer, dataset_path, scale, work_dir)
+                if filler is not None:
+                    # The log holds one prediction per row of the scaled dataset
+                    fill_log(db_path, len(source) * scale, filler)
+                    if 'prediction_log' in benchmarks:
+                        bench_prediction_log(results, db_path, scale, repeat)
+                    if 'export' in benchmarks:
+                        bench_export(results, db_path, scale, work_dir)
+            if 'retrain' in benchmarks and scale in retrain_scales:
+                bench_retrain(results, dataset_path, scale)
+            os.remove(dataset_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Lines comparing current with baseline metrics and the names of the gated ones that regressed"""
+    lines = [f"{'metric':<36} | {'baseline':>12} | {'current':>12} | {'change':>7} | status"]
+    regressions = []
+    for name, metric in current.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['value'], metric['value']
+        # How much worse the current value is: > 1 is slower or lower throughput
+        if metric['lower_is_better']:
+            worse = new / old if old > 0 else 1.0
+        else:
+            worse = old / new if new > 0 else float('inf')
+        status = 'ok'
+        if not metric['gated']:
+            status = 'not gated'
+        elif worse > 1 + tolerance:
+            status = 'REGRESSION'
+            regressions.append(name)
+        change = (new - old) / old * 100 if old else 0.0
+        lines.append(f"{name:<36} | {old:>12,.4f} | {new:>12,.4f} | {change:>+6.1f}% | {status}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS),
+                        help="Benchmarks to run (default: all)")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help="Dataset copies to measure")
+    parser.add_argument('--retrain-scales', type=int, nargs='+', default=[1],
+                        help="Dataset copies to retrain on (a retrain at x10 takes minutes)")
+    parser.add_argument('--model', default=MODEL_PATH, help="Path to model.skops")
+    parser.add_argument('--lambdas', default=LAMBDAS_PATH, help="Path to lambdas.pkl")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Runs of the model load and prediction log benchmarks (best is reported)")
+    parser.add_argument('--output', default='benchmark_results.json', help="Results JSON")
+    parser.add_argument('--baseline', default=None, help="Earlier results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown of a gated metric before the run fails")
+    args = parser.parse_args()
+    if any(scale < 1 for scale in args.scales + args.retrain_scales):
+        parser.error("scales must be positive")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    start = time.perf_counter()
+    try:
+        results = run_suite(args.benchmarks, args.scales, args.retrain_scales, args.model, args.lambdas,
+                            args.repeat)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'seconds': time.perf_counter() - start,
+        'environment': environment(),
+        'config': {'benchmarks': args.benchmarks, 'scales': args.scales, 'retrain_scales': args.retrain_scales,
+                   'model': os.path.abspath(args.model), 'dataset_rows': len(pd.read_csv(DATASET_PATH))},
+        'metrics': results.metrics,
+    }
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {len(results.metrics)} metrics to {args.output} ({report['seconds']:.0f}s)")
+
+    if baseline is not None:
+        lines, regressions = compare(results.metrics, baseline['metrics'], args.tolerance)
+        print('\n'.join(lines))
+        if regressions:
+            sys.exit(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: "
+                     + ', '.join(regressions))
+
+
+if __name__ == "__main__":
+    main()
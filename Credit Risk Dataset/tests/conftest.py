@@ -0,0 +1,56 @@
+"""Shared fixtures: small models trained on the dataset with the app's own training code"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(TESTS_DIR)
+APP_DIR = os.path.join(PROJECT_DIR, 'CreditRiskApp')
+DATASET_PATH = os.path.join(PROJECT_DIR, 'credit_risk_dataset.csv')
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+@pytest.fixture(scope='session')
+def training_data():
+    from training_data import load_training_data
+
+    return load_training_data(DATASET_PATH)
+
+
+@pytest.fixture(scope='session')
+def pipeline(training_data):
+    """Pipeline(imputer, preprocessor, GradientBoosting) as train_pipeline.py fits it, with fewer trees"""
+    from train_pipeline import fit_pipeline
+
+    return fit_pipeline(training_data, {'n_estimators': 20, 'max_depth': 3})
+
+
+@pytest.fixture(scope='session')
+def other_pipeline(training_data):
+    """A second model version with different predictions"""
+    from train_pipeline import fit_pipeline
+
+    return fit_pipeline(training_data, {'n_estimators': 5, 'max_depth': 2})
+
+
+@pytest.fixture(scope='session')
+def transform(training_data):
+    from feature_transform import FeatureTransform
+
+    return FeatureTransform(training_data['lambdas'])
+
+
+@pytest.fixture
+def applications():
+    """Raw applications in the dataset CSV layout, missing interest rates included"""
+    return pd.read_csv(DATASET_PATH, nrows=1000).drop(columns='loan_status')
+
+
+@pytest.fixture
+def complete_applications(applications):
+    """Applications without missing values, in a fresh index"""
+    return applications.dropna().head(20).reset_index(drop=True)
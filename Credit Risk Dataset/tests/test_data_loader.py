@@ -0,0 +1,77 @@
+"""Schema parsing and the binary dataset cache"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATASET_PATH
+from data_loader import iter_cached_chunks, load_dataset, parse_csv
+from feature_transform import FeatureTransform
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'applications.csv'
+    pd.read_csv(DATASET_PATH, nrows=200).to_csv(path, index=False)
+    return str(path)
+
+
+def test_cache_matches_parsed_csv(csv_path, tmp_path):
+    parsed = parse_csv(csv_path)
+    cache_dir = tmp_path / 'cache'
+
+    pd.testing.assert_frame_equal(load_dataset(csv_path, cache_dir), parsed)
+    # The second load reads the cache written by the first
+    pd.testing.assert_frame_equal(load_dataset(csv_path, cache_dir), parsed)
+    assert parsed['person_age'].dtype == np.int16
+
+
+def test_cached_frame_is_writable_without_changing_the_cache(csv_path, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    load_dataset(csv_path, cache_dir)
+    df = load_dataset(csv_path, cache_dir)
+    original = df.copy()
+
+    df.loc[0, 'person_age'] = 5
+    df.iloc[1, 0] = 7
+    df.loc[2, 'loan_grade'] = 'A'
+    assert df['person_age'].iloc[:2].tolist() == [5, 7]
+
+    pd.testing.assert_frame_equal(load_dataset(csv_path, cache_dir), original)
+
+
+def test_cached_chunks_cover_the_file(csv_path, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    chunks = list(iter_cached_chunks(csv_path, 64, cache_dir))
+
+    assert [len(chunk) for chunk in chunks] == [64, 64, 64, 8]
+    pd.testing.assert_frame_equal(pd.concat(chunks), load_dataset(csv_path, cache_dir))
+
+
+def test_integer_columns_with_missing_values_read_as_float(tmp_path):
+    df = pd.read_csv(DATASET_PATH, nrows=20)
+    df['person_age'] = df['person_age'].astype(float)
+    df.loc[3, 'person_age'] = np.nan
+    path = tmp_path / 'gaps.csv'
+    df.to_csv(path, index=False)
+
+    parsed = parse_csv(path)
+    assert parsed['person_age'].dtype == np.float64
+    assert parsed['person_age'].isna().tolist() == df['person_age'].isna().tolist()
+    assert parsed['loan_amnt'].dtype == np.int32
+
+
+def test_unknown_default_flags_invalidate_their_rows_only(tmp_path):
+    df = pd.read_csv(DATASET_PATH, nrows=20).dropna().reset_index(drop=True)
+    df.loc[0, 'cb_person_default_on_file'] = 'y'
+    df.loc[1, 'cb_person_default_on_file'] = np.nan
+    path = tmp_path / 'flags.csv'
+    df.to_csv(path, index=False)
+
+    flags = load_dataset(path, tmp_path / 'cache')['cb_person_default_on_file']
+    assert flags.isna().tolist()[:3] == [True, True, False]
+
+    transform = FeatureTransform.from_file()
+    _, cached_valid = transform.transform(load_dataset(path, tmp_path / 'cache'))
+    _, plain_valid = transform.transform(pd.read_csv(path))
+    assert cached_valid.tolist() == plain_valid.tolist()
+    assert cached_valid.tolist()[:3] == [False, False, True]
@@ -0,0 +1,58 @@
+"""Drift reference, the store's running drift counts and the PSI report"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATASET_PATH
+from drift_monitor import DriftReference, drift_report
+from prediction_store import PredictionStore, make_record
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    # Shuffled: the CSV is not in random order
+    return pd.read_csv(DATASET_PATH).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def reference(dataset):
+    return DriftReference.from_frame(dataset.iloc[:20000])
+
+
+def log_records(applications):
+    return [make_record(application, 0, 0.1) for application in applications.to_dict('records')]
+
+
+def test_reference_counts_every_row(reference):
+    for feature, spec in reference.features.items():
+        assert sum(spec['counts']) == 20000, feature
+    assert reference.features['cb_person_default_on_file']['categories'] == ['0', '1']
+
+
+def test_store_drift_counts_match_a_full_recount(tmp_path, dataset, reference):
+    records = log_records(dataset.iloc[20000:20300])
+    path = tmp_path / 'log.db'
+    with PredictionStore(path, drift_reference=reference) as store:
+        store.append_many(records[:200])
+    # Rows logged without the reference are counted when a store with it opens
+    with PredictionStore(path) as store:
+        store.append_many(records[200:])
+    with PredictionStore(path, drift_reference=reference) as store:
+        counts = store.drift_counts()
+        expected = reference.count(pd.concat(store.iter_chunks()))
+
+    assert counts.keys() == expected.keys()
+    for feature in expected:
+        np.testing.assert_array_equal(counts[feature], expected[feature])
+    assert counts['loan_grade'].sum() == len(records)
+
+
+def test_report_flags_shifted_features_only(dataset, reference):
+    current = dataset.iloc[20000:].copy()
+    stable = drift_report(reference, reference.count(current))
+    current['person_income'] *= 3
+    shifted = drift_report(reference, reference.count(current))
+
+    assert all(result['status'] == 'stable' for result in stable.values())
+    assert shifted['person_income']['status'] == 'drift'
+    assert shifted['loan_grade']['status'] == 'stable'
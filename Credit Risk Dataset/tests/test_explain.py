@@ -0,0 +1,53 @@
+"""Tree contributions: they add up to the model's log-odds"""
+import numpy as np
+import pytest
+
+from compiled_ensemble import CompiledPipeline
+from explain import CONTRIBUTION_PREFIX, TreeExplainer, explain_chunk, top_factors
+from scoring import CreditRiskScorer, imputed_features, score_chunk
+
+
+@pytest.fixture(scope='module')
+def explainer(pipeline):
+    return TreeExplainer(pipeline)
+
+
+def log_odds(proba):
+    return np.log(proba / (1 - proba))
+
+
+def test_contributions_add_up_to_the_log_odds(pipeline, explainer, transform, applications):
+    X, valid = transform.with_imputation(imputed_features(pipeline)).transform(applications)
+    X = X[valid]
+    contributions = explainer.explain(X)
+
+    assert list(contributions.columns) == explainer.features
+    np.testing.assert_allclose(explainer.bias + contributions.sum(axis=1),
+                               log_odds(pipeline.predict_proba(X)[:, 1]), atol=1e-9)
+    # The numba kernel (large batches, when installed) and the NumPy path agree
+    np.testing.assert_allclose(explainer.explain(X.iloc[:3]), contributions.iloc[:3], atol=1e-12)
+
+
+def test_explain_chunk_matches_scoring(pipeline, explainer, transform, applications):
+    scorer = CreditRiskScorer(CompiledPipeline.from_pipeline(pipeline), transform, explainer=explainer)
+    chunk = applications.head(300).copy()
+    chunk.loc[0, 'person_age'] = np.nan
+
+    explained, n_valid = explain_chunk(scorer, chunk)
+    scored, expected_valid = score_chunk(scorer, chunk)
+
+    assert n_valid == expected_valid == len(chunk) - 1
+    np.testing.assert_allclose(explained['default_probability'], scored['default_probability'], atol=1e-12)
+    assert explained['risk_level'].tolist() == scored['risk_level'].tolist()
+    columns = [CONTRIBUTION_PREFIX + feature for feature in explainer.features] + [CONTRIBUTION_PREFIX + 'bias']
+    total = explained[columns].sum(axis=1, skipna=False)
+    np.testing.assert_allclose(total[1:], log_odds(explained['default_probability'][1:]), atol=1e-9)
+    assert np.isnan(total[0])
+
+
+def test_top_factors_orders_by_absolute_effect(pipeline, explainer, transform, applications):
+    X, valid = transform.with_imputation(imputed_features(pipeline)).transform(applications.head(5))
+    row = explainer.explain(X[valid]).iloc[0]
+
+    factors = top_factors(row, 3)
+    assert [abs(value) for _, value in factors] == sorted(np.abs(row.to_numpy()), reverse=True)[:3]
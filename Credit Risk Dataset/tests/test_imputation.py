@@ -0,0 +1,40 @@
+"""GroupMedianImputer: training medians per loan grade, looked up for new rows"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from imputation import GroupMedianImputer
+
+
+@pytest.fixture
+def train():
+    return pd.DataFrame({
+        'loan_grade': ['A', 'A', 'A', 'B', 'B', 'C'],
+        'loan_int_rate': [7.0, 8.0, np.nan, 11.0, 13.0, np.nan],
+        'loan_amnt': [1000, 2000, 3000, 4000, 5000, 6000],
+    })
+
+
+def test_missing_values_get_their_group_median(train):
+    imputer = GroupMedianImputer('loan_grade', ['loan_int_rate']).fit(train)
+    new = pd.DataFrame({'loan_grade': ['A', 'B', 'C', 'Z', 'B'],
+                        'loan_int_rate': [np.nan, np.nan, np.nan, np.nan, 9.5],
+                        'loan_amnt': [1, 2, 3, 4, 5]})
+
+    filled = imputer.transform(new)
+
+    # C had no observed rate and Z was never seen: both get the overall median
+    overall = np.nanmedian(train['loan_int_rate'])
+    assert filled['loan_int_rate'].tolist() == [7.5, 12.0, overall, overall, 9.5]
+    pd.testing.assert_series_equal(filled['loan_amnt'], new['loan_amnt'])
+    assert new['loan_int_rate'].isna().sum() == 4
+
+
+def test_matches_groupby_transform_on_the_training_data(training_data):
+    X = training_data['X_train']
+    imputer = GroupMedianImputer().fit(X)
+    expected = X['loan_int_rate'].fillna(
+        X.groupby('loan_grade', observed=True)['loan_int_rate'].transform('median'))
+
+    np.testing.assert_allclose(imputer.transform(X)['loan_int_rate'], expected)
+    assert imputer.imputed_features == ['loan_int_rate']
@@ -0,0 +1,75 @@
+"""Stage timers, event counters and configure()"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import instrumentation
+from conftest import DATASET_PATH
+from result_cache import ResultCache, cached_scores
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    """Instrumentation enabled with a fresh recorder, restored afterwards"""
+    recorder = instrumentation.StageRecorder()
+    monkeypatch.setattr(instrumentation, '_recorder', recorder)
+    monkeypatch.setattr(instrumentation, '_enabled', True)
+    return recorder
+
+
+def test_disabled_hooks_record_nothing(monkeypatch):
+    monkeypatch.setattr(instrumentation, '_recorder', instrumentation.StageRecorder())
+    monkeypatch.setattr(instrumentation, '_enabled', False)
+    with instrumentation.stage('score.model'):
+        instrumentation.count('score.rows', 3)
+
+    assert instrumentation.stage('score.model') is instrumentation._NULL_STAGE
+    snapshot = instrumentation.snapshot()
+    assert snapshot['stages'] == {} and snapshot['counters'] == {}
+
+
+def test_stages_and_counters_are_recorded(recording):
+    for _ in range(3):
+        with instrumentation.stage('score.model'):
+            pass
+    instrumentation.count('score.rows', 5)
+
+    snapshot = instrumentation.snapshot()
+    assert snapshot['stages']['score.model']['count'] == 3
+    assert snapshot['counters'] == {'score.rows': 5}
+
+
+def test_result_cache_counts_hits_and_misses(recording):
+    df = pd.read_csv(DATASET_PATH, nrows=4).drop(columns='loan_status')
+    cache = ResultCache()
+
+    def score(rows):
+        return np.full(len(rows), 0.5), np.ones(len(rows), dtype=bool)
+
+    cached_scores(cache, 'v1', df.iloc[:2], score)
+    cached_scores(cache, 'v1', df, score)
+    assert recording.snapshot()['counters'] == {'result_cache.hit': 2, 'result_cache.miss': 4}
+
+
+def test_configure_registers_the_exit_hook_once(monkeypatch, tmp_path):
+    registered = []
+    monkeypatch.setattr(instrumentation.atexit, 'register', lambda func, *args: registered.append(func))
+    # Setting the module state through monkeypatch restores it after the test
+    for name in ('_enabled', '_profiler', '_metrics_path', '_profile_path'):
+        monkeypatch.setattr(instrumentation, name, getattr(instrumentation, name))
+    monkeypatch.setattr(instrumentation, '_shutdown_registered', False)
+    monkeypatch.setattr(instrumentation, '_exporter', None)
+    metrics_path = tmp_path / 'metrics.json'
+
+    try:
+        instrumentation.configure(True, str(metrics_path), export_interval=60)
+        instrumentation.configure(True, str(metrics_path), export_interval=60)
+        assert registered == [instrumentation._shutdown]
+
+        instrumentation._shutdown()
+        assert 'stages' in json.loads(metrics_path.read_text())
+    finally:
+        if instrumentation._exporter is not None:
+            instrumentation._exporter[0].set()
@@ -0,0 +1,37 @@
+"""Fast-start cache: its key and the check of the compiled pipeline"""
+import pytest
+
+import model_cache
+from compiled_ensemble import CompiledPipeline
+from conftest import DATASET_PATH
+from model_cache import cache_key, verification_rows, verify_compiled
+
+
+def test_cache_key_follows_the_sklearn_version(tmp_path, monkeypatch):
+    model_path, lambdas_path = tmp_path / 'model.skops', tmp_path / 'lambdas.pkl'
+    model_path.write_bytes(b'model')
+    lambdas_path.write_bytes(b'lambdas')
+    key = cache_key(model_path, lambdas_path)
+
+    monkeypatch.setattr(model_cache.metadata, 'version', lambda name: '0.0.0')
+    assert cache_key(model_path, lambdas_path) != key
+
+
+def test_verification_rows_are_transformed_applications(pipeline, training_data):
+    X = verification_rows(pipeline, training_data['lambdas'], DATASET_PATH, n_rows=500)
+
+    assert 0 < len(X) <= 500
+    # Missing rates are left for the model's imputer, so the check covers it too
+    assert X['loan_int_rate'].isna().any()
+
+
+def test_verify_compiled_checks_the_preprocessing(pipeline, training_data):
+    X = verification_rows(pipeline, training_data['lambdas'], DATASET_PATH)
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+    verify_compiled(pipeline, compiled, X)
+
+    # Wrong imputation medians leave the trees intact: only the full pipeline check notices
+    compiled.preprocessors[0].table = compiled.preprocessors[0].table + 5.0
+    verify_compiled(pipeline, compiled)
+    with pytest.raises(ValueError, match="Compiled pipeline"):
+        verify_compiled(pipeline, compiled, X)
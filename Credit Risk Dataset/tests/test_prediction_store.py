@@ -0,0 +1,65 @@
+"""Prediction log: buffering, the maintained row count and the legacy import"""
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import DATASET_PATH
+from prediction_store import PREDICTION_COLUMNS, PredictionStore, make_record
+
+
+@pytest.fixture
+def records():
+    applications = pd.read_csv(DATASET_PATH, nrows=50).drop(columns='loan_status')
+    return [make_record(application, i % 2, i / 100) for i, application in
+            enumerate(applications.to_dict('records'))]
+
+
+def stored_rows(store):
+    return sum(len(chunk) for chunk in store.iter_chunks())
+
+
+def test_records_are_buffered_until_the_batch_is_full(tmp_path, records):
+    with PredictionStore(tmp_path / 'log.db', batch_size=10, flush_interval=60) as store:
+        store.append_many(records[:9])
+        assert store.count() == 9
+        assert int(store._get_meta('row_count')) == 0
+
+        store.append(records[9])
+        assert int(store._get_meta('row_count')) == 10
+        assert stored_rows(store) == 10
+
+
+def test_flush_if_due_writes_after_the_interval(tmp_path, records):
+    with PredictionStore(tmp_path / 'log.db', batch_size=100, flush_interval=0.05) as store:
+        store.append(records[0])
+        assert not store.flush_if_due()
+        time.sleep(0.06)
+        assert store.flush_if_due()
+        assert int(store._get_meta('row_count')) == 1
+        assert not store.flush_if_due()
+
+
+def test_row_count_is_shared_and_survives_reopening(tmp_path, records):
+    path = tmp_path / 'log.db'
+    with PredictionStore(path) as first, PredictionStore(path) as second:
+        first.append_many(records[:5])
+        second.append_many(records[5:8])
+        assert first.count() == second.count() == 8
+    with PredictionStore(path) as store:
+        assert store.count() == stored_rows(store) == 8
+        store.clear()
+        assert store.count() == stored_rows(store) == 0
+
+
+def test_legacy_csv_is_imported_once(tmp_path, records):
+    csv_path = tmp_path / 'loan_predictions.csv'
+    pd.DataFrame(records, columns=PREDICTION_COLUMNS).to_csv(csv_path, index=False)
+
+    with PredictionStore(tmp_path / 'log.db') as store:
+        assert store.import_legacy_csv(csv_path) == len(records)
+        assert store.import_legacy_csv(csv_path) == 0
+        assert store.count() == stored_rows(store) == len(records)
+        logged = pd.concat(store.iter_chunks())
+    assert logged['risk_level'].tolist() == [record['risk_level'] for record in records]
+
@@ -0,0 +1,69 @@
+"""Streaming profile: the quantile sketch, chunked profiling and the profile checks"""
+import numpy as np
+import pandas as pd
+import skops.io as sio
+
+from conftest import DATASET_PATH
+import scoring
+from profiling import QuantileSketch, check_profile, profile_csv, profile_frame
+
+
+def test_sketch_quantiles_are_close_to_exact():
+    values = np.random.default_rng(1).lognormal(size=200_000)
+    sketch = QuantileSketch().update(values)
+    qs = [0.01, 0.1, 0.5, 0.9, 0.99]
+
+    assert sketch.count == len(values)
+    # Errors are in rank: the estimate's CDF position is within 1% of the requested one
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles(qs)) / len(values)
+    np.testing.assert_allclose(ranks, qs, atol=0.01)
+    assert sketch.quantiles([0, 1]).tolist() == [values.min(), values.max()]
+    assert sum(len(level) for level in sketch.levels) < 2000
+
+
+def test_merged_sketches_match_one_sketch_of_everything():
+    values = np.random.default_rng(2).normal(size=100_000)
+    merged = QuantileSketch(seed=1).update(values[:30_000]).merge(QuantileSketch(seed=2).update(values[30_000:]))
+
+    assert merged.count == len(values)
+    np.testing.assert_allclose(merged.rank([-1.0, 0.0, 1.0]), [0.1587, 0.5, 0.8413], atol=0.01)
+
+
+def test_chunked_profile_matches_the_whole_frame():
+    whole = profile_frame(pd.read_csv(DATASET_PATH)).columns
+    chunked = profile_csv(DATASET_PATH, chunksize=5000).columns
+
+    for col in ('person_age', 'loan_int_rate'):
+        assert chunked[col]['missing'] == whole[col]['missing']
+        assert chunked[col]['min'] == whole[col]['min']
+        assert chunked[col]['max'] == whole[col]['max']
+    assert chunked['loan_grade']['frequencies'] == whole['loan_grade']['frequencies']
+
+
+def test_check_profile_reports_unscorable_categories():
+    df = pd.read_csv(DATASET_PATH, nrows=500)
+    df.loc[:9, 'loan_grade'] = 'Z'
+    reference = profile_frame(pd.read_csv(DATASET_PATH, nrows=500))
+
+    errors, _ = check_profile(profile_frame(df), reference,
+                              categories={'loan_grade': ['A', 'B', 'C', 'D', 'E', 'Other']})
+    assert any(message.startswith("loan_grade:") and "cannot be scored" in message for message in errors)
+
+    df = df.drop(columns='loan_intent')
+    errors, _ = check_profile(profile_frame(df), reference)
+    assert "Missing required columns: loan_intent" in errors
+
+
+def test_check_input_reads_categories_from_the_model(tmp_path, pipeline, monkeypatch):
+    model_path, input_path = tmp_path / 'model.skops', tmp_path / 'input.csv'
+    sio.dump(pipeline, model_path)
+    df = pd.read_csv(DATASET_PATH, nrows=500)
+    df.loc[:9, 'loan_grade'] = 'Z'
+    df.to_csv(input_path, index=False)
+
+    def no_cache(*args, **kwargs):
+        raise AssertionError("check_input built the compiled model cache")
+    monkeypatch.setattr(scoring, 'load_model_artifacts', no_cache)
+
+    errors, _ = scoring.check_input(str(input_path), str(model_path))
+    assert any(message.startswith("loan_grade:") and "cannot be scored" in message for message in errors)
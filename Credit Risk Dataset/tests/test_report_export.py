@@ -0,0 +1,66 @@
+"""Streaming export of the prediction log with SQL-side filters"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from conftest import DATASET_PATH
+from prediction_store import PredictionStore, make_record
+from report_export import PredictionFilter, export_predictions
+
+
+@pytest.fixture
+def store(tmp_path):
+    applications = pd.read_csv(DATASET_PATH, nrows=120).drop(columns='loan_status').to_dict('records')
+    start = datetime(2025, 1, 1)
+    with PredictionStore(tmp_path / 'log.db', batch_size=len(applications)) as store:
+        store.append_many([make_record(application, i % 3 == 0, i / 120, start + timedelta(days=i))
+                           for i, application in enumerate(applications)])
+        yield store
+
+
+def test_csv_export_applies_the_filter_in_chunks(store, tmp_path):
+    path = tmp_path / 'high.csv'
+    chunks = []
+    prediction_filter = PredictionFilter(start='2025-01-11', end='2025-02-09', risk_level='High Risk')
+
+    rows = export_predictions(store, str(path), prediction_filter, chunksize=4,
+                              progress=lambda done, total: chunks.append((done, total)))
+
+    exported = pd.read_csv(path)
+    assert rows == len(exported) == 10
+    assert (exported['risk_level'] == 'High Risk').all()
+    assert exported['prediction_timestamp'].between('2025-01-11', '2025-02-09 23:59:59').all()
+    assert chunks[-1] == (10, 10)
+
+
+def test_parquet_export_matches_csv(store, tmp_path):
+    pytest.importorskip('pyarrow')
+    prediction_filter = PredictionFilter(min_probability=0.5)
+    export_predictions(store, str(tmp_path / 'out.csv'), prediction_filter, chunksize=7)
+    export_predictions(store, str(tmp_path / 'out.parquet'), prediction_filter, chunksize=7)
+
+    csv = pd.read_csv(tmp_path / 'out.csv')
+    parquet = pd.read_parquet(tmp_path / 'out.parquet')
+    assert len(csv) == len(parquet) == 60
+    pd.testing.assert_series_equal(parquet['default_probability'], csv['default_probability'])
+
+
+def test_cancelled_export_removes_the_partial_file(store, tmp_path):
+    path = tmp_path / 'cancelled.csv'
+
+    def cancel(done, total):
+        if done:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        export_predictions(store, str(path), chunksize=10, progress=cancel)
+    assert not path.exists()
+
+
+def test_pdf_export_caps_rows(store, tmp_path):
+    pytest.importorskip('fpdf')
+    path = tmp_path / 'report.pdf'
+
+    assert export_predictions(store, str(path), max_rows=50) == 50
+    assert path.read_bytes().startswith(b'%PDF')
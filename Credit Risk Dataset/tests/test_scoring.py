@@ -0,0 +1,79 @@
+"""Scoring: compiled inference, the validity mask and the result cache"""
+import numpy as np
+import pytest
+
+from compiled_ensemble import CompiledPipeline
+from model_cache import cache_key
+from result_cache import ResultCache
+from scoring import CreditRiskScorer, imputed_features
+
+
+@pytest.fixture(params=['sklearn', 'compiled'])
+def model(request, pipeline):
+    return pipeline if request.param == 'sklearn' else CompiledPipeline.from_pipeline(pipeline)
+
+
+def test_compiled_probabilities_match_sklearn(pipeline, transform, applications):
+    X, valid = transform.with_imputation(imputed_features(pipeline)).transform(applications)
+    X = X[valid]
+    assert X['loan_int_rate'].isna().any()
+
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+    expected = pipeline.predict_proba(X)[:, 1]
+    # Large batches run the numba kernel (when installed), a single row the NumPy path
+    np.testing.assert_allclose(compiled.predict_proba(X)[:, 1], expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(compiled.predict_proba(X.iloc[:1])[:, 1], expected[:1], rtol=0, atol=1e-12)
+
+
+def test_scorer_marks_missing_and_unknown_values_invalid(model, transform, complete_applications):
+    df = complete_applications.head(6).copy()
+    df.loc[0, 'person_age'] = np.nan
+    df.loc[1, 'loan_grade'] = 'Z'
+    df.loc[2, 'loan_int_rate'] = np.nan
+    df.loc[3, 'person_emp_length'] = np.nan
+    df.loc[4, 'loan_grade'] = 'G'
+
+    proba, labels, valid = CreditRiskScorer(model, transform).score(df)
+
+    # The model imputes the rate, emp length is filled with 0 and rare grades map to 'Other'
+    assert valid.tolist() == [False, False, True, True, True, True]
+    assert np.isnan(proba[~valid]).all()
+    assert np.isfinite(proba[valid]).all()
+
+
+def test_strict_scoring_names_the_unknown_category(model, transform, complete_applications):
+    df = complete_applications.head(3).copy()
+    df.loc[1, 'loan_grade'] = 'Z'
+
+    with pytest.raises(ValueError, match="Unknown value for loan_grade: 'Z'"):
+        CreditRiskScorer(model, transform).score(df, strict=True)
+
+
+def test_result_cache_invalidated_by_model_change(pipeline, other_pipeline, transform, complete_applications):
+    cache = ResultCache()
+    first = CreditRiskScorer(pipeline, transform, cache=cache, model_key='v1')
+    second = CreditRiskScorer(other_pipeline, transform, cache=cache, model_key='v2')
+    X, _ = first.transform.transform(complete_applications)
+
+    first_proba = first.score(complete_applications)[0]
+    np.testing.assert_allclose(first.score(complete_applications)[0], first_proba)
+    assert cache.stats()['hits'] == len(complete_applications)
+
+    second_proba = second.score(complete_applications)[0]
+    np.testing.assert_allclose(second_proba, other_pipeline.predict_proba(X)[:, 1])
+    assert not np.allclose(second_proba, first_proba)
+    assert cache.stats()['invalidations'] == len(complete_applications)
+
+    # Switching back rescores with the first model instead of serving the second one's entries
+    np.testing.assert_allclose(first.score(complete_applications)[0], first_proba)
+
+
+def test_cache_key_follows_model_contents(tmp_path):
+    model_path, lambdas_path = tmp_path / 'model.skops', tmp_path / 'lambdas.pkl'
+    model_path.write_bytes(b'model 1')
+    lambdas_path.write_bytes(b'lambdas')
+    key = cache_key(model_path, lambdas_path)
+
+    assert cache_key(model_path, lambdas_path) == key
+    model_path.write_bytes(b'model 2')
+    assert cache_key(model_path, lambdas_path) != key
@@ -0,0 +1,62 @@
+"""Scoring service: errors stay with the application that caused them"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scoring import CreditRiskScorer
+from scoring_server import MicroBatcher, ScoringService, score_isolated
+
+
+def score_names(calls):
+    """A score_batch that fails every batch containing 'bad'"""
+    def score_batch(applications):
+        calls.append(list(applications))
+        if 'bad' in applications:
+            raise ValueError("cannot score 'bad'")
+        return [name.upper() for name in applications]
+    return score_batch
+
+
+def test_score_isolated_falls_back_per_application():
+    calls = []
+    outcomes = score_isolated(score_names(calls), ['a', 'bad', 'c'])
+
+    assert [result for result, _ in outcomes] == ['A', None, 'C']
+    assert isinstance(outcomes[1][1], ValueError)
+    assert calls == [['a', 'bad', 'c'], ['a'], ['bad'], ['c']]
+
+
+def test_micro_batch_failure_only_fails_its_request():
+    calls = []
+    batcher = MicroBatcher(score_names(calls), max_batch=8, max_wait=0.5)
+    try:
+        futures = [batcher.submit(name) for name in ['a', 'bad', 'c']]
+        assert futures[0].result(timeout=5) == 'A'
+        assert futures[2].result(timeout=5) == 'C'
+        with pytest.raises(ValueError, match="cannot score 'bad'"):
+            futures[1].result(timeout=5)
+    finally:
+        batcher.close()
+    # The three requests were coalesced into one batch before the fallback
+    assert calls[0] == ['a', 'bad', 'c']
+
+
+@pytest.fixture
+def service(pipeline, transform):
+    service = ScoringService(CreditRiskScorer(pipeline, transform), batch_window_ms=50)
+    yield service
+    service.close()
+
+
+def test_unknown_category_is_a_per_row_error(service, complete_applications):
+    records = complete_applications.head(4).to_dict('records')
+    records[2]['loan_grade'] = 'Z'
+
+    with ThreadPoolExecutor(len(records)) as pool:
+        single = list(pool.map(service.score_one, records))
+    batch = service.score_many(records + [{'person_age': 30}])
+
+    for results in (single, batch[:4]):
+        assert results[2] == {'error': "Unknown value for loan_grade: 'Z'"}
+        assert all('default_probability' in results[i] for i in (0, 1, 3))
+    assert batch[4]['error'].startswith("Missing required fields")
@@ -0,0 +1,20 @@
+"""Training stages: the stage cache keys follow the code the stages run"""
+import os
+
+from conftest import DATASET_PATH
+from train_pipeline import StageCache, check_training_data, code_digest
+
+
+def test_profile_stage_is_keyed_on_the_app_code(tmp_path):
+    logged = []
+    cache = StageCache(str(tmp_path), log=logged.append)
+    code = code_digest()
+
+    check_training_data(DATASET_PATH, cache, code, log=logged.append)
+    check_training_data(DATASET_PATH, cache, code, log=logged.append)
+    # An edit to feature_transform.py (CLEANING_RULES, the feature lists) changes the digest
+    check_training_data(DATASET_PATH, cache, 'edited ' + code, log=logged.append)
+
+    stages = [line.split()[1] for line in logged if line.startswith('profile')]
+    assert stages == ['computed', 'cached', 'computed']
+    assert len(os.listdir(tmp_path)) == 2
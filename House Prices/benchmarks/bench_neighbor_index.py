@@ -0,0 +1,126 @@
+"""Speed and recall of the neighbour indexes against the notebook's KNN search as the data grows.
+
+train.csv is enlarged --scale times by resampling its rows and jittering
+the numeric columns by a few percent (plain copies would give every query
+exact duplicates as neighbours). For each size the notebook's first fold
+is preprocessed and a KNN regressor does what every notebook cell does:
+fit, then predict the training part and the validation part. The baseline
+is what KNeighborsRegressor runs on the matrix as preprocessed: sklearn's
+brute-force search, sparse for the one-hot variants. Above
+--exact-max-queries queries it is timed on a sample and extrapolated
+(marked with ~). Recall is the share of the exact 5 nearest neighbours an
+index returns, measured on the same sample.
+
+Usage:
+    python bench_neighbor_index.py [--scale 1 10 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from house_data import load_data, make_folds, make_preprocessor, variant_columns  # noqa: E402
+from neighbor_index import make_index  # noqa: E402
+
+N_NEIGHBORS = 5
+# The dense numeric matrix and the wider one-hot matrix (sparse as preprocessed)
+CASES = [('numeric_scaled', ('brute', 'kd_tree', 'ivf')), ('onehot_power', ('brute', 'ivf'))]
+JITTER = 0.03
+# The KD-tree on the 37 numeric columns is already 10x slower than brute force at scale 10
+TREE_MAX_ROWS = 20000
+
+
+def enlarged_data(data, scale, seed=0):
+    """X, y of scale * len(train.csv) rows resampled with jittered numeric columns"""
+    X, y = data['X'], data['y']
+    if scale == 1:
+        return X, y
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(X), size=len(X) * scale)
+    X = X.iloc[rows].reset_index(drop=True)
+    noise = 1 + JITTER * rng.standard_normal((len(X), len(data['num_cols'])))
+    X[data['num_cols']] = X[data['num_cols']].to_numpy(dtype=float) * noise
+    y = pd.Series(y.to_numpy()[rows] * (1 + JITTER * rng.standard_normal(len(rows))), name=y.name)
+    return X, y
+
+
+class NotebookIndex:
+    """KNeighborsRegressor's search: sklearn brute force on the matrix as given"""
+
+    def fit(self, X):
+        from sklearn.neighbors import NearestNeighbors
+
+        self._nn = NearestNeighbors(algorithm='brute').fit(X)
+        return self
+
+    def kneighbors(self, X, n_neighbors):
+        return self._nn.kneighbors(X, n_neighbors)
+
+
+def fit_and_query(index, X_train, queries):
+    start = time.perf_counter()
+    index.fit(X_train)
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    _, indices = index.kneighbors(queries, N_NEIGHBORS)
+    return fit_seconds, time.perf_counter() - start, indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100], help="Copies of train.csv")
+    parser.add_argument('--exact-max-queries', type=int, default=5000,
+                        help="Above this many queries the exact search is timed on a sample")
+    args = parser.parse_args()
+
+    data = load_data()
+    rng = np.random.default_rng(1)
+    print(f"{'train rows':>10} | {'features':<22} | {'index':<10} | {'fit s':>6} | {'query s':>8} | "
+          f"{'exact s':>8} | {'speedup':>7} | {'recall@5':>8}")
+    for scale in sorted(args.scale):
+        X, y = enlarged_data(data, scale)
+        train_idx, val_idx = make_folds(y)[0]
+        for variant, backends in CASES:
+            cols = variant_columns(variant, data['num_cols'], data['cat_cols'])
+            preprocessor = make_preprocessor(variant, data['num_cols'], data['cat_cols'])
+            X_train = preprocessor.fit_transform(X.iloc[train_idx][cols])
+            X_val = preprocessor.transform(X.iloc[val_idx][cols])
+            # The notebook predicts both the training and the validation part of the fold
+            queries = _stack(X_train, X_val)
+            n_queries = queries.shape[0]
+            sample = np.sort(rng.choice(n_queries, min(n_queries, args.exact_max_queries), replace=False))
+
+            exact_fit, exact_query, exact = fit_and_query(NotebookIndex(), X_train, queries[sample])
+            exact_total = exact_fit + exact_query * n_queries / len(sample)
+            approx = '~' if len(sample) < n_queries else ' '
+            shape = f"{variant} ({X_train.shape[1]})"
+            print(f"{X_train.shape[0]:>10,} | {shape:<22} | {'notebook':<10} | {exact_fit:>6.2f} | "
+                  f"{approx}{exact_total - exact_fit:>7.2f} | {approx}{exact_total:>7.2f} | {'1.0x':>7} | {1.0:>8.3f}")
+            for backend in backends:
+                if backend == 'kd_tree' and X_train.shape[0] > TREE_MAX_ROWS:
+                    continue
+                index = make_index(backend, *X_train.shape, hasattr(X_train, 'indptr'))
+                fit_seconds, query_seconds, found = fit_and_query(index, X_train, queries)
+                recall = np.mean([len(set(a) & set(b)) / N_NEIGHBORS for a, b in zip(exact, found[sample])])
+                total = fit_seconds + query_seconds
+                print(f"{X_train.shape[0]:>10,} | {shape:<22} | {backend:<10} | {fit_seconds:>6.2f} | "
+                      f"{query_seconds:>8.2f} | {exact_total:>8.2f} | {exact_total / total:>6.1f}x | {recall:>8.3f}")
+
+
+def _stack(X_train, X_val):
+    if hasattr(X_train, 'indptr'):
+        from scipy import sparse
+
+        return sparse.vstack([X_train, X_val]).tocsr()
+    return np.vstack([X_train, X_val])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Data and preprocessing of the House Prices KNN experiments (the MlAnalyst notebook).
+
+Every notebook cell re-reads train.csv/test.csv, splits the columns into
+numeric and categorical ones, stratifies the folds on price quintiles and
+builds its own ColumnTransformer. This module holds those pieces once:
+load_data() reads and splits the files (cached per process),
+make_folds() gives the notebook's StratifiedKFold splits and
+make_preprocessor() builds any of the notebook's preprocessing variants.
+"""
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(PROJECT_DIR, 'data')
+TARGET = 'SalePrice'
+RANDOM_STATE = 42
+N_SPLITS = 5
+N_STRATA = 5
+
+# Notebook sections: 1 baseline, 2 + scaling, 3 + categorical, 4 + both, 5 + power transform
+PREPROCESSING_VARIANTS = ('numeric', 'numeric_scaled', 'onehot', 'onehot_scaled', 'onehot_power')
+
+
+@lru_cache(maxsize=4)
+def load_data(data_dir=DATA_DIR):
+    """Read train.csv and test.csv once; returns a dict with X, y, X_test and the column lists.
+
+    Numeric columns are every numeric column but the target (Id included,
+    as in the notebook); all other columns are categorical.
+    """
+    train = pd.read_csv(os.path.join(data_dir, 'train.csv'))
+    test = pd.read_csv(os.path.join(data_dir, 'test.csv'))
+    num_cols = [col for col in train.columns if col != TARGET and pd.api.types.is_numeric_dtype(train[col])]
+    cat_cols = [col for col in train.columns if col != TARGET and col not in num_cols]
+    return {
+        'X': train[num_cols + cat_cols],
+        'y': train[TARGET],
+        'X_test': test[num_cols + cat_cols],
+        'test_ids': test['Id'],
+        'num_cols': num_cols,
+        'cat_cols': cat_cols,
+    }
+
+
+def price_strata(y, n_strata=N_STRATA):
+    """Price quintile of every row, the notebook's stratification labels"""
+    return pd.qcut(y, q=n_strata, labels=False)
+
+
+def make_folds(y, n_splits=N_SPLITS, random_state=RANDOM_STATE):
+    """List of (train_idx, val_idx) of StratifiedKFold(shuffle=True) on the price strata"""
+    from sklearn.model_selection import StratifiedKFold
+
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    return list(skf.split(y.to_numpy().reshape(-1, 1), price_strata(y)))
+
+
+def variant_columns(variant, num_cols, cat_cols):
+    """Input columns used by a preprocessing variant"""
+    return list(num_cols) if variant.startswith('numeric') else list(num_cols) + list(cat_cols)
+
+
+def make_preprocessor(variant, num_cols, cat_cols):
+    """Unfitted ColumnTransformer of one of PREPROCESSING_VARIANTS"""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, PowerTransformer, StandardScaler
+
+    if variant not in PREPROCESSING_VARIANTS:
+        raise ValueError(f"variant must be one of {', '.join(PREPROCESSING_VARIANTS)}, got {variant!r}")
+    num_steps = [('imputer', SimpleImputer(strategy='constant', fill_value=0))]
+    if variant == 'onehot_power':
+        num_steps.append(('power_transform', PowerTransformer(method='yeo-johnson')))
+    if variant in ('numeric_scaled', 'onehot_scaled', 'onehot_power'):
+        num_steps.append(('scaler', StandardScaler()))
+    transformers = [('num', Pipeline(num_steps), list(num_cols))]
+    if not variant.startswith('numeric'):
+        transformers.append(('cat', Pipeline([
+            ('imputer', SimpleImputer(strategy='most_frequent')),
+            ('onehot', OneHotEncoder(handle_unknown='ignore')),
+        ]), list(cat_cols)))
+    return ColumnTransformer(transformers)
@@ -0,0 +1,255 @@
+"""Nearest-neighbour indexes for the House Prices KNN regressor.
+
+KNeighborsRegressor on the notebook's sparse one-hot matrices always runs a
+brute-force search on the sparse matrix, and knn.predict(X_train) in every
+fold makes that O(n^2) in the training size. IndexedKNeighborsRegressor is
+a drop-in replacement (Euclidean distance, uniform or distance weights)
+that answers the queries from a pluggable index, in batches of batch_size
+rows:
+
+    brute       exact, sklearn's brute-force search on the densified matrix
+                (the notebook's matrices are a few hundred columns wide, so
+                dense BLAS products beat the sparse ones)
+    kd_tree     exact, sklearn KD-tree; only pays off for dense inputs with
+                a handful of columns
+    ball_tree   exact, sklearn ball tree; same
+    ivf         approximate: an inverted file of k-means lists, each query
+                searches the rows of its n_probe nearest lists
+    auto        kd_tree for dense inputs with at most TREE_MAX_FEATURES
+                columns, brute below IVF_MIN_ROWS training rows, ivf above
+
+Fitted indexes are kept in a small in-process cache keyed by the content of
+the training matrix, so refitting the same fold with other n_neighbors or
+weights reuses the index instead of rebuilding it.
+"""
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.utils.validation import check_is_fitted
+
+INDEX_BACKENDS = ('auto', 'brute', 'kd_tree', 'ball_tree', 'ivf')
+TREE_MAX_FEATURES = 10
+# Below this many training rows brute force is as fast as building the k-means lists
+IVF_MIN_ROWS = 20000
+DEFAULT_BATCH_SIZE = 2048
+# Fitted indexes kept per process: one per fold of the notebook's 5-fold CV
+INDEX_CACHE_SIZE = 5
+
+
+def _dense(X):
+    if hasattr(X, 'toarray'):
+        X = X.toarray()
+    return np.ascontiguousarray(X, dtype=np.float64)
+
+
+def matrix_digest(X):
+    """Content hash of a dense or sparse matrix"""
+    digest = hashlib.sha256(f"{type(X).__name__}|{X.shape}|{X.dtype}".encode())
+    if hasattr(X, 'indptr'):
+        for part in (X.data, X.indices, X.indptr):
+            digest.update(np.ascontiguousarray(part).tobytes())
+    else:
+        digest.update(np.ascontiguousarray(X).tobytes())
+    return digest.hexdigest()
+
+
+class ExactIndex:
+    """sklearn NearestNeighbors with a fixed algorithm on the dense matrix; exact results"""
+
+    def __init__(self, algorithm='kd_tree', leaf_size=30):
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+
+    def fit(self, X):
+        from sklearn.neighbors import NearestNeighbors
+
+        X = _dense(X)
+        self._nn = NearestNeighbors(algorithm=self.algorithm, leaf_size=self.leaf_size).fit(X)
+        return self
+
+    def kneighbors(self, X, n_neighbors, batch_size=DEFAULT_BATCH_SIZE):
+        X = _dense(X)
+        batches = [self._nn.kneighbors(X[start:start + batch_size], n_neighbors)
+                   for start in range(0, X.shape[0], batch_size)]
+        return np.vstack([d for d, _ in batches]), np.vstack([i for _, i in batches])
+
+
+class IvfIndex:
+    """Approximate search over an inverted file: k-means lists, BLAS within the probed lists.
+
+    fit() clusters a sample of at most max_fit_rows rows into n_lists
+    centroids (2 * sqrt(n_rows) by default) and stores the rows grouped by
+    their nearest centroid. A query is compared with the rows of its n_probe
+    nearest lists only; the queries are grouped by list so each list is one
+    matrix product. The search runs in float32 and the distances of the
+    neighbours found are recomputed exactly. Recall grows with n_probe.
+    """
+
+    def __init__(self, n_lists=None, n_probe=4, max_fit_rows=20000, max_iter=10, random_state=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.max_fit_rows = max_fit_rows
+        self.max_iter = max_iter
+        self.random_state = random_state
+
+    def fit(self, X):
+        from sklearn.cluster import KMeans
+
+        X = _dense(X)
+        n_lists = min(self.n_lists or max(1, int(2 * np.sqrt(X.shape[0]))), X.shape[0])
+        rng = np.random.default_rng(self.random_state)
+        sample = X
+        if X.shape[0] > self.max_fit_rows:
+            sample = X[rng.choice(X.shape[0], self.max_fit_rows, replace=False)]
+        kmeans = KMeans(n_lists, n_init=1, max_iter=self.max_iter, random_state=self.random_state).fit(sample)
+        self._centroids = kmeans.cluster_centers_.astype(np.float32)
+        X32 = X.astype(np.float32)
+        lists = np.concatenate([_nearest(X32[start:start + DEFAULT_BATCH_SIZE], self._centroids, 1)[:, 0]
+                                for start in range(0, X.shape[0], DEFAULT_BATCH_SIZE)])
+        # Rows sorted by list: the rows of list l are _rows[_bounds[l]:_bounds[l + 1]]
+        self._order = np.argsort(lists, kind='stable')
+        self._rows = X32[self._order]
+        self._sq_norms = np.einsum('ij,ij->i', self._rows, self._rows)
+        self._bounds = np.searchsorted(lists[self._order], np.arange(n_lists + 1))
+        self._X = X
+        return self
+
+    def kneighbors(self, X, n_neighbors, batch_size=DEFAULT_BATCH_SIZE):
+        if n_neighbors > self._X.shape[0]:
+            raise ValueError(f"n_neighbors={n_neighbors} exceeds the {self._X.shape[0]} indexed rows")
+        X = _dense(X)
+        n_probe = min(self.n_probe, len(self._centroids))
+        distances = np.empty((X.shape[0], n_neighbors))
+        indices = np.empty((X.shape[0], n_neighbors), dtype=np.int64)
+        # Large batches keep the per-list products large; batch_size only bounds the memory of the probes
+        batch_size = max(batch_size, 16 * len(self._centroids))
+        for start in range(0, X.shape[0], batch_size):
+            batch = X[start:start + batch_size]
+            found = self._search(batch.astype(np.float32), n_neighbors, n_probe)
+            # Exact float64 distances of the neighbours found, nearest first
+            exact = np.sqrt(np.column_stack([((self._X[found[:, j]] - batch) ** 2).sum(axis=1)
+                                             for j in range(n_neighbors)]))
+            order = np.argsort(exact, axis=1, kind='stable')
+            distances[start:start + len(batch)] = np.take_along_axis(exact, order, 1)
+            indices[start:start + len(batch)] = np.take_along_axis(found, order, 1)
+        return distances, indices
+
+    def _search(self, queries, n_neighbors, n_probe):
+        probes = _nearest(queries, self._centroids, n_probe)
+        best_dist = np.full((len(queries), n_neighbors), np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), n_neighbors), dtype=np.int64)
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        # (list, query) pairs grouped by list
+        probe_lists = probes.ravel()
+        order = np.argsort(probe_lists, kind='stable')
+        probe_queries = np.repeat(np.arange(len(queries)), n_probe)[order]
+        query_bounds = np.searchsorted(probe_lists[order], np.arange(len(self._centroids) + 1))
+        for lst in range(len(self._centroids)):
+            members = probe_queries[query_bounds[lst]:query_bounds[lst + 1]]
+            first, last = self._bounds[lst], self._bounds[lst + 1]
+            if len(members) == 0 or first == last:
+                continue
+            # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x
+            sq_dist = (query_norms[members, None] + self._sq_norms[None, first:last]
+                       - 2 * queries[members] @ self._rows[first:last].T)
+            rows = np.broadcast_to(np.arange(first, last), sq_dist.shape)
+            if last - first > n_neighbors:
+                nearest = np.argpartition(sq_dist, n_neighbors - 1, axis=1)[:, :n_neighbors]
+                sq_dist, rows = np.take_along_axis(sq_dist, nearest, 1), nearest + first
+            merged_dist = np.concatenate([best_dist[members], sq_dist], axis=1)
+            merged_rows = np.concatenate([best_rows[members], rows], axis=1)
+            keep = np.argpartition(merged_dist, n_neighbors - 1, axis=1)[:, :n_neighbors]
+            best_dist[members] = np.take_along_axis(merged_dist, keep, 1)
+            best_rows[members] = np.take_along_axis(merged_rows, keep, 1)
+        # Probed lists holding fewer than n_neighbors rows in total: search all lists
+        found = self._order[best_rows]
+        short = np.flatnonzero(np.isinf(best_dist).any(axis=1))
+        if len(short):
+            found[short] = self._search(queries[short], n_neighbors, len(self._centroids))
+        return found
+
+
+def _nearest(queries, centroids, n):
+    """Indices of the n nearest centroids of every query (unordered)"""
+    sq_dist = np.einsum('ij,ij->i', centroids, centroids)[None, :] - 2 * queries @ centroids.T
+    if n >= centroids.shape[0]:
+        return np.broadcast_to(np.arange(centroids.shape[0]), sq_dist.shape)
+    return np.argpartition(sq_dist, n - 1, axis=1)[:, :n]
+
+
+def make_index(backend, n_rows, n_features, sparse, **params):
+    """Unfitted index for a backend name; 'auto' picks one from the shape of the data"""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"index must be one of {', '.join(INDEX_BACKENDS)}, got {backend!r}")
+    if backend == 'auto':
+        if not sparse and n_features <= TREE_MAX_FEATURES:
+            backend = 'kd_tree'
+        else:
+            backend = 'ivf' if n_rows >= IVF_MIN_ROWS else 'brute'
+        # Parameters of another backend do not apply to the one picked
+        params = params if backend == 'ivf' else {}
+    if backend == 'ivf':
+        return IvfIndex(**params)
+    return ExactIndex(backend, **params)
+
+
+_index_cache = OrderedDict()
+
+
+def fitted_index(X, backend='auto', params=None, cache=True):
+    """Fitted index over X, reused from the per-process cache when X was indexed before"""
+    params = dict(params or {})
+    key = (backend, tuple(sorted(params.items())), matrix_digest(X)) if cache else None
+    if key is not None and key in _index_cache:
+        _index_cache.move_to_end(key)
+        return _index_cache[key]
+    index = make_index(backend, X.shape[0], X.shape[1], hasattr(X, 'indptr'), **params).fit(X)
+    if key is not None:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def clear_index_cache():
+    _index_cache.clear()
+
+
+class IndexedKNeighborsRegressor(RegressorMixin, BaseEstimator):
+    """KNeighborsRegressor (Euclidean) backed by a pluggable, cached neighbour index"""
+
+    def __init__(self, n_neighbors=5, weights='uniform', index='auto', index_params=None,
+                 batch_size=DEFAULT_BATCH_SIZE, cache=True):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.index = index
+        self.index_params = index_params
+        self.batch_size = batch_size
+        self.cache = cache
+
+    def fit(self, X, y):
+        if self.weights not in ('uniform', 'distance'):
+            raise ValueError(f"weights must be 'uniform' or 'distance', got {self.weights!r}")
+        self.index_ = fitted_index(X, self.index, self.index_params, self.cache)
+        self.y_ = np.asarray(y, dtype=float)
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def kneighbors(self, X, n_neighbors=None):
+        check_is_fitted(self, 'index_')
+        return self.index_.kneighbors(X, n_neighbors or self.n_neighbors, self.batch_size)
+
+    def predict(self, X):
+        distances, indices = self.kneighbors(X)
+        neighbor_y = self.y_[indices]
+        if self.weights == 'uniform':
+            return neighbor_y.mean(axis=1)
+        # As in sklearn: rows with exact matches average those matches only
+        with np.errstate(divide='ignore'):
+            weights = 1.0 / distances
+        exact = distances == 0
+        has_exact = exact.any(axis=1)
+        weights[has_exact] = exact[has_exact]
+        return (weights * neighbor_y).sum(axis=1) / weights.sum(axis=1)
@@ -0,0 +1,205 @@
+"""Parallel K-fold sweep of the notebook's KNN regressors.
+
+The notebook repeats one loop per cell: read the CSVs, build a
+ColumnTransformer, fit it and the KNN regressor on every fold, append MSE
+and MAPE. Here the grid is
+
+    preprocessing variant x outlier filter x target transform x n_neighbors x weights
+
+and one job covers a (variant, outlier filter, fold) triple, the parts
+that change the fitted transformer. A job fits the preprocessor once and
+runs a single neighbour search with the largest n_neighbors of the grid;
+the first k neighbours of that search serve every smaller k, both weights
+and both target transforms (the neighbours do not depend on y). Jobs run
+on a process pool whose workers read train.csv once each.
+
+Usage:
+    python sweep.py
+    python sweep.py --variants onehot_power --neighbors 3 5 --weights distance --jobs 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from house_data import DATA_DIR, PREPROCESSING_VARIANTS, load_data, make_folds, make_preprocessor, variant_columns
+from neighbor_index import INDEX_BACKENDS, fitted_index
+
+NEIGHBORS = (1, 3, 5, 7, 10)
+WEIGHTS = ('uniform', 'distance')
+# Notebook section 6: TransformedTargetRegressor with a Yeo-Johnson PowerTransformer
+TARGET_TRANSFORMS = ('none', 'power')
+# Notebook section 7: training rows outside 1.5 IQR of the price dropped in every fold
+OUTLIER_FILTERS = ('none', 'iqr')
+METRICS = ('train_mse', 'train_mape', 'val_mse', 'val_mape')
+CONFIG_COLUMNS = ['variant', 'outliers', 'target', 'n_neighbors', 'weights']
+
+
+def iqr_mask(y):
+    """Rows with a price within 1.5 IQR of the quartiles"""
+    q1, q3 = y.quantile(0.25), y.quantile(0.75)
+    iqr = q3 - q1
+    return ((y >= q1 - 1.5 * iqr) & (y <= q3 + 1.5 * iqr)).to_numpy()
+
+
+def knn_predict(distances, indices, y, n_neighbors, weights):
+    """KNeighborsRegressor.predict from the first n_neighbors columns of a neighbour search"""
+    distances, neighbor_y = distances[:, :n_neighbors], y[indices[:, :n_neighbors]]
+    if weights == 'uniform':
+        return neighbor_y.mean(axis=1)
+    # As in sklearn: rows with exact matches average those matches only
+    with np.errstate(divide='ignore'):
+        weight = 1.0 / distances
+    exact = distances == 0
+    has_exact = exact.any(axis=1)
+    weight[has_exact] = exact[has_exact]
+    return (weight * neighbor_y).sum(axis=1) / weight.sum(axis=1)
+
+
+def run_job(variant, outliers, fold, neighbors, weights, targets, index='auto', data_dir=DATA_DIR):
+    """Score every (target, n_neighbors, weights) setting on one fold; returns one row per setting"""
+    from sklearn.metrics import mean_absolute_percentage_error, mean_squared_error
+    from sklearn.preprocessing import PowerTransformer
+
+    data = load_data(data_dir)
+    train_idx, val_idx = make_folds(data['y'])[fold]
+    cols = variant_columns(variant, data['num_cols'], data['cat_cols'])
+    X_train, X_val = data['X'].iloc[train_idx][cols], data['X'].iloc[val_idx][cols]
+    y_train, y_val = data['y'].iloc[train_idx], data['y'].iloc[val_idx]
+    if outliers == 'iqr':
+        mask = iqr_mask(y_train)
+        X_train, y_train = X_train[mask], y_train[mask]
+
+    start = time.perf_counter()
+    preprocessor = make_preprocessor(variant, data['num_cols'], data['cat_cols'])
+    X_train = preprocessor.fit_transform(X_train)
+    X_val = preprocessor.transform(X_val)
+    preprocess_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    k = min(max(neighbors), X_train.shape[0])
+    # The index is cached per process: a fold indexed before is reused
+    search = fitted_index(X_train, index)
+    train_neighbors = search.kneighbors(X_train, k)
+    val_neighbors = search.kneighbors(X_val, k)
+    search_seconds = time.perf_counter() - start
+
+    y_train_values, y_val_values = y_train.to_numpy(dtype=float), y_val.to_numpy(dtype=float)
+    rows = []
+    for target in targets:
+        fitted_y = y_train_values
+        if target == 'power':
+            transformer = PowerTransformer(method='yeo-johnson').fit(y_train_values.reshape(-1, 1))
+            fitted_y = transformer.transform(y_train_values.reshape(-1, 1)).ravel()
+        for n_neighbors in neighbors:
+            for weight in weights:
+                start = time.perf_counter()
+                train_pred, val_pred = (knn_predict(*found, fitted_y, n_neighbors, weight)
+                                        for found in (train_neighbors, val_neighbors))
+                if target == 'power':
+                    train_pred, val_pred = (transformer.inverse_transform(pred.reshape(-1, 1)).ravel()
+                                            for pred in (train_pred, val_pred))
+                rows.append({
+                    'variant': variant, 'outliers': outliers, 'target': target,
+                    'n_neighbors': n_neighbors, 'weights': weight, 'fold': fold,
+                    'train_mse': mean_squared_error(y_train_values, train_pred),
+                    'train_mape': mean_absolute_percentage_error(y_train_values, train_pred),
+                    'val_mse': mean_squared_error(y_val_values, val_pred),
+                    'val_mape': mean_absolute_percentage_error(y_val_values, val_pred),
+                    'predict_seconds': time.perf_counter() - start,
+                    'preprocess_seconds': preprocess_seconds,
+                    'search_seconds': search_seconds,
+                })
+    return rows
+
+
+def run_sweep(variants=PREPROCESSING_VARIANTS, neighbors=NEIGHBORS, weights=WEIGHTS, targets=TARGET_TRANSFORMS,
+              outliers=OUTLIER_FILTERS, index='auto', n_jobs=None, data_dir=DATA_DIR, progress=None):
+    """Cross-validate the grid; returns one row per setting x fold"""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    n_folds = len(make_folds(load_data(data_dir)['y']))
+    # One-hot variants first: their jobs are the slowest
+    jobs = [(variant, outlier, fold)
+            for variant in sorted(variants, key=lambda v: v.startswith('numeric'))
+            for outlier in outliers for fold in range(n_folds)]
+    args = (sorted(neighbors), list(weights), list(targets), index, data_dir)
+    results = []
+    if n_jobs == 1:
+        for job in jobs:
+            results.extend(run_job(*job, *args))
+            if progress is not None:
+                progress(len(results), len(jobs) * len(neighbors) * len(weights) * len(targets))
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(jobs))) as pool:
+            futures = [pool.submit(run_job, *job, *args) for job in jobs]
+            for future in futures:
+                results.extend(future.result())
+                if progress is not None:
+                    progress(len(results), len(jobs) * len(neighbors) * len(weights) * len(targets))
+    return pd.DataFrame(results)
+
+
+def summarize(results):
+    """One row per setting: mean and median of each metric over the folds, mean seconds per fold.
+
+    The search and preprocessing times are those of the job, shared by all
+    settings of the same variant and outlier filter.
+    """
+    grouped = results.groupby(CONFIG_COLUMNS, sort=False)
+    table = pd.DataFrame(index=grouped.size().index)
+    for metric in METRICS:
+        table[f'{metric}_mean'] = grouped[metric].mean()
+        table[f'{metric}_median'] = grouped[metric].median()
+    for column in ('preprocess_seconds', 'search_seconds', 'predict_seconds'):
+        table[column] = grouped[column].mean()
+    return table.sort_values('val_mape_mean').reset_index()
+
+
+def format_table(table, top=None):
+    rows = table if top is None else table.head(top)
+    header = (f"{'variant':<15} | {'outliers':<8} | {'target':<6} | {'k':>3} | {'weights':<8} | "
+              f"{'val MAPE':>8} | {'val RMSE':>9} | {'train MAPE':>10} | {'prep s':>6} | {'search s':>8}")
+    lines = [header, '-' * len(header)]
+    for _, row in rows.iterrows():
+        lines.append(f"{row['variant']:<15} | {row['outliers']:<8} | {row['target']:<6} | {row['n_neighbors']:>3} | "
+                     f"{row['weights']:<8} | {row['val_mape_mean']:>8.4f} | {np.sqrt(row['val_mse_mean']):>9,.0f} | "
+                     f"{row['train_mape_mean']:>10.4f} | {row['preprocess_seconds']:>6.3f} | "
+                     f"{row['search_seconds']:>8.3f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validate a grid of the notebook's KNN regressors")
+    parser.add_argument('--variants', nargs='+', choices=PREPROCESSING_VARIANTS, default=list(PREPROCESSING_VARIANTS),
+                        help="Preprocessing variants")
+    parser.add_argument('--neighbors', type=int, nargs='+', default=list(NEIGHBORS), help="n_neighbors values")
+    parser.add_argument('--weights', nargs='+', choices=WEIGHTS, default=list(WEIGHTS), help="KNN weights")
+    parser.add_argument('--targets', nargs='+', choices=TARGET_TRANSFORMS, default=list(TARGET_TRANSFORMS),
+                        help="Target transforms")
+    parser.add_argument('--outliers', nargs='+', choices=OUTLIER_FILTERS, default=list(OUTLIER_FILTERS),
+                        help="Training outlier filters")
+    parser.add_argument('--index', choices=INDEX_BACKENDS, default='auto', help="Neighbour index")
+    parser.add_argument('--jobs', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Directory with train.csv and test.csv")
+    parser.add_argument('--top', type=int, default=20, help="Settings to print, best validation MAPE first")
+    parser.add_argument('--output', default=None, help="Also write the full table as CSV")
+    args = parser.parse_args(argv)
+
+    def report(done, total):
+        print(f"\r{done}/{total} setting x fold scores", end='', flush=True)
+
+    start = time.perf_counter()
+    results = run_sweep(args.variants, args.neighbors, args.weights, args.targets, args.outliers, args.index,
+                        args.jobs, args.data_dir, progress=report)
+    print(f"\r{len(results)} setting x fold scores in {time.perf_counter() - start:.1f}s")
+    table = summarize(results)
+    print(format_table(table, args.top))
+    if args.output:
+        table.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()